@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+日志解析基准测试
+在合成的日志文件上对比：
+1. 逐行正则 + groupdict（旧 logview 的做法）
+2. 逐行 parse_line
+3. 向量化 parse_frame（按 8MB 分块）
+4. LogStore 完整入库（含写 SQLite）
+
+用法：
+python benchmarks/bench_log_parsing.py --lines 1000000
+python benchmarks/bench_log_parsing.py --lines 1000000 --format json --traceback-ratio 0.01
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logstore import LINE_PATTERN, READ_CHUNK, LogStore, parse_frame, parse_line
+
+LEVELS = ["INFO"] * 8 + ["WARNING", "ERROR"]
+MODULES = ["llmserver.py", "jianying_stages.py", "pipeline.py", "downloader.py"]
+TRACEBACK = [
+    "Traceback (most recent call last):",
+    '  File "llmserver.py", line 195, in chat_sync',
+    "    content = cached_client.complete(",
+    "openai.APIConnectionError: Connection error.",
+]
+
+
+def make_log(path: str, lines: int, fmt: str, traceback_ratio: float) -> int:
+    """生成合成日志，返回写入的记录数"""
+    rng = random.Random(0)
+    records = 0
+    t0 = 1760972056.0
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        while written < lines:
+            ts = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(t0 + records * 0.05)) + f",{records % 1000:03d}"
+            level, module = rng.choice(LEVELS), rng.choice(MODULES)
+            message = f"请求消息: [{{'role': 'user', 'content': '生成第 {records} 段文案'}}]"
+            tb = level == "ERROR" and rng.random() < traceback_ratio * 10
+            if fmt == "json":
+                data = {"time": ts, "level": level, "module": module, "line": rng.randint(1, 500),
+                        "logger": "chat", "trace_id": f"{records:032x}", "message": message}
+                if tb:
+                    data["exc"] = "\n".join(TRACEBACK)
+                f.write(json.dumps(data, ensure_ascii=False) + "\n")
+                written += 1
+            else:
+                f.write(f"{ts} {level} {module} {rng.randint(1, 500)} [{records:032x}] {message}\n")
+                written += 1
+                if tb:
+                    f.write("\n".join(TRACEBACK) + "\n")
+                    written += len(TRACEBACK)
+            records += 1
+    return records
+
+
+def bench_regex_loop(path: str) -> int:
+    data = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = LINE_PATTERN.search(line)
+            if match:
+                data.append(match.groupdict())
+    df = pd.DataFrame(data)
+    df["time"] = pd.to_datetime(df["time"], errors="coerce")
+    return len(df)
+
+
+def bench_parse_line(path: str) -> int:
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [row for row in map(parse_line, f.read().splitlines()) if row is not None]
+    return len(pd.DataFrame(rows))
+
+
+def bench_parse_frame(path: str) -> int:
+    total = 0
+    with open(path, "rb") as f:
+        rest = b""
+        while True:
+            data = f.read(READ_CHUNK)
+            if not data:
+                break
+            data = rest + data
+            end = data.rfind(b"\n")
+            rest = data[end + 1:]
+            df, _ = parse_frame(data[:end + 1].decode("utf-8"))
+            total += len(df)
+    return total
+
+
+def bench_ingest(path: str, work_dir: str) -> int:
+    store = LogStore(os.path.join(work_dir, "bench.sqlite3"))
+    return store.ingest(path)
+
+
+def timed(name: str, func, *args) -> None:
+    t0 = time.perf_counter()
+    count = func(*args)
+    print(f"{name:<28} {time.perf_counter() - t0:8.2f}s  {count} 条")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日志解析基准测试")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="日志行数")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="日志格式")
+    parser.add_argument("--traceback-ratio", type=float, default=0.01, help="带异常栈的记录比例（近似）")
+    parser.add_argument("--work-dir", help="临时目录，默认系统临时目录")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        path = os.path.join(work_dir, "bench.log")
+        records = make_log(path, args.lines, args.format, args.traceback_ratio)
+        print(f"{args.lines} 行，{records} 条记录，{os.path.getsize(path) / 1024 / 1024:.1f} MB，格式 {args.format}")
+
+        if args.format == "text":
+            timed("逐行正则 + groupdict", bench_regex_loop, path)
+        timed("逐行 parse_line", bench_parse_line, path)
+        timed("向量化 parse_frame", bench_parse_frame, path)
+        timed("LogStore.ingest", bench_ingest, path, work_dir)
+
+
+if __name__ == "__main__":
+    main()
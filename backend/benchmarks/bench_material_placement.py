@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+素材放置基准测试
+对比 shutil.copytree 与各放置策略在大素材集上的耗时
+
+用法：
+python benchmarks/bench_material_placement.py --files 20 --size-mb 200
+python benchmarks/bench_material_placement.py --src "D:\\stock_footage"   # 使用已有素材目录
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyJianYingDraft.material_placement import PlacementMethod, DEFAULT_PLACEMENT, place_tree
+
+
+def make_material_set(folder: str, files: int, size_mb: int) -> int:
+    """生成随机内容的素材文件，返回总字节数"""
+    block = os.urandom(1024 * 1024)
+    for i in range(files):
+        with open(os.path.join(folder, f"clip{i:03d}.mp4"), "wb") as f:
+            for _ in range(size_mb):
+                f.write(block)
+    return files * size_mb * 1024 * 1024
+
+
+def folder_size(folder: str) -> int:
+    total = 0
+    for root, _, names in os.walk(folder):
+        for name in names:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def run_case(name: str, func, src: str, work_dir: str, total: int, repeat: int) -> None:
+    best = float("inf")
+    detail = ""
+    for i in range(repeat):
+        dst = os.path.join(work_dir, f"{name}_{i}")
+        t0 = time.perf_counter()
+        result = func(src, dst)
+        best = min(best, time.perf_counter() - t0)
+        if isinstance(result, dict):
+            detail = ", ".join(f"{m.value}={n}" for m, n in result.items() if n)
+        shutil.rmtree(dst)
+    throughput = total / best / 1024 / 1024 if best > 0 else float("inf")
+    print(f"{name:<12} {best * 1000:>10.1f} ms {throughput:>12.1f} MB/s   {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="素材放置基准测试")
+    parser.add_argument("--src", help="已有素材目录，不指定时自动生成")
+    parser.add_argument("--files", type=int, default=20, help="生成的素材文件数量")
+    parser.add_argument("--size-mb", type=int, default=200, help="每个素材文件大小（MB）")
+    parser.add_argument("--work-dir", help="放置目标所在目录，需与素材位于同一文件系统才能测到链接")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(dir=args.work_dir)
+    try:
+        if args.src:
+            src = args.src
+            total = folder_size(src)
+        else:
+            src = os.path.join(work_dir, "material")
+            os.makedirs(src)
+            total = make_material_set(src, args.files, args.size_mb)
+        print(f"素材集: {src}  共 {total / 1024 / 1024:.0f} MB\n")
+
+        run_case("copytree", shutil.copytree, src, work_dir, total, args.repeat)
+        for method in PlacementMethod:
+            run_case(method.value, lambda s, d, m=method: place_tree(s, d, (m, PlacementMethod.copy)),
+                     src, work_dir, total, args.repeat)
+        run_case("default", lambda s, d: place_tree(s, d, DEFAULT_PLACEMENT), src, work_dir, total, args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+抖音分享页解析基准测试
+在合成的分享页上对比：
+1. 完整解析：DOTALL 正则截取 _ROUTER_DATA 后整体 json.loads
+2. 流式解析：RouterDataExtractor 按块扫描，读到 </script> 即停止，只解码 item_list
+
+用法：
+python benchmarks/bench_router_extract.py --pages 200 --payload-kb 500 --tail-kb 300
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from douyinmcp import STREAM_CHUNK, RouterDataExtractor, parse_router_html
+
+
+def make_page(video_id: str, payload_kb: int, tail_kb: int) -> bytes:
+    """生成与真实分享页结构相同的 HTML：前置脚本 + 路由数据 + 页面尾部"""
+    filler = "x" * (payload_kb * 1024 // 2)
+    router = {"loaderData": {"video_(id)/page": {"videoInfoRes": {"item_list": [{
+        "desc": f"测试视频 {video_id}",
+        "video": {"play_addr": {"url_list": [f"https://example.com/playwm/?video_id={video_id}"]}}}],
+        "filler": filler}}, "other": {"big": filler}}}
+    html = ("<html><head>" + "<script>var a=1;</script>" * 50 + "</head><body><script>window._ROUTER_DATA = "
+            + json.dumps(router, ensure_ascii=False) + "</script>" + "<div>tail</div>" * (tail_kb * 1024 // 15)
+            + "</body></html>")
+    return html.encode("utf-8")
+
+
+def bench_full(page: bytes, pages: int) -> dict:
+    t0 = time.perf_counter()
+    for i in range(pages):
+        parse_router_html(page.decode("utf-8"), str(i))
+    return {"total_ms": (time.perf_counter() - t0) * 1000, "bytes": len(page)}
+
+
+def bench_stream(page: bytes, pages: int) -> dict:
+    stages = {"scan_ms": 0.0, "decode_ms": 0.0}
+    t0 = time.perf_counter()
+    for i in range(pages):
+        extractor = RouterDataExtractor()
+        for start in range(0, len(page), STREAM_CHUNK):
+            if extractor.feed(page[start:start + STREAM_CHUNK]):
+                break
+        if extractor.video_info(str(i)) is None:
+            raise RuntimeError("流式解析失败")
+        timings = extractor.finish()
+        stages["scan_ms"] += timings["scan_ms"]
+        stages["decode_ms"] += timings["decode_ms"]
+    stages["total_ms"] = (time.perf_counter() - t0) * 1000
+    stages["bytes"] = timings["bytes"]
+    return stages
+
+
+def report(name: str, pages: int, result: dict) -> None:
+    detail = "  ".join(f"{k}={v / pages:.3f}" for k, v in result.items() if k.endswith("_ms") and k != "total_ms")
+    print(f"{name:<10} {result['total_ms'] / pages:8.3f} ms/页  读取 {result['bytes'] / 1024:.0f} KB  {detail}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="抖音分享页解析基准测试")
+    parser.add_argument("--pages", type=int, default=200, help="解析次数")
+    parser.add_argument("--payload-kb", type=int, default=500, help="_ROUTER_DATA 大小（KB，近似）")
+    parser.add_argument("--tail-kb", type=int, default=300, help="</script> 之后页面内容大小（KB，近似）")
+    args = parser.parse_args()
+
+    page = make_page("7000000000000000000", args.payload_kb, args.tail_kb)
+    print(f"页面 {len(page) / 1024:.0f} KB，解析 {args.pages} 次")
+    report("完整解析", args.pages, bench_full(page, args.pages))
+    report("流式解析", args.pages, bench_stream(page, args.pages))
+
+
+if __name__ == "__main__":
+    main()
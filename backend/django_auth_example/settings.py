@@ -82,6 +82,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # 写锁被占用时最多等待的秒数，避免并发写入直接报 database is locked
+        'OPTIONS': {'timeout': 20},
+        # 连接在请求之间保留的秒数，省去每个请求重新打开数据库和执行 PRAGMA
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+    }
+}
+
+# 每个新连接执行的 SQLite PRAGMA（见 users/sqlite.py）
+# WAL 下读写互不阻塞；synchronous=NORMAL 在 WAL 下仍然不会损坏数据库
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,  # 约 20MB 页缓存
+    'temp_store': 'MEMORY',
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+# 自动生成草稿（users/jobs.py）：提交需求时带 auto_generate，后台线程调用 llmserver 生成
+DRAFT_SERVICE_URL = os.environ.get('DRAFT_SERVICE_URL', 'http://127.0.0.1:8001/chat_jianying')
+DRAFT_JOB_WORKERS = int(os.environ.get('DRAFT_JOB_WORKERS', 2))
+DRAFT_JOB_TIMEOUT = float(os.environ.get('DRAFT_JOB_TIMEOUT', 1800))  # 单个草稿生成的超时秒数
+
+# 进程内缓存，多 worker 部署时各自一份：角色与需求列表首页只缓存几秒（users/roles.py、users/pagination.py）
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'django-auth-example',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
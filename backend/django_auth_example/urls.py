@@ -26,5 +26,8 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('edit_action/', views.edit_action, name='edit_action'),
+    path('edit_action/bulk/', views.edit_action_bulk, name='edit_action_bulk'),
     path('update_evaluation/', views.update_evaluation, name='update_evaluation'),
+    path('update_evaluation/bulk/', views.update_evaluation_bulk, name='update_evaluation_bulk'),
+    path('edit_requests/', views.edit_requests, name='edit_requests'),
 ]
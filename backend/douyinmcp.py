@@ -4,83 +4,478 @@ Streamable-HTTP MCP Server + Douyin Tools
 """
 
 
+import os
 import re
 import json
-import requests
+import time
+import asyncio
+import shutil
+import logging
 import tempfile
+import threading
+import contextlib
+from collections import OrderedDict
 from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+import requests
 from fastmcp import FastMCP
+from downloader import Downloader, make_session
+from material_store import MaterialStore
 
 # 创建 MCP 服务器实例
 mcp = FastMCP("streamable-http-server")
+logger = logging.getLogger("douyinmcp")
 
 # -------------------- 通用配置 --------------------
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) EdgiOS/121.0.2277.107 Version/17.0 Mobile/15E148 Safari/604.1'
 }
+SHARE_PAGE_URL = os.environ.get("DOUYIN_SHARE_PAGE_URL", "https://www.iesdouyin.com/share/video/{video_id}")
+REQUEST_TIMEOUT = (5, 15)
+POOL_SIZE = int(os.environ.get("DOUYIN_POOL_SIZE", 16))
+LINK_TTL = float(os.environ.get("DOUYIN_LINK_TTL", 7 * 24 * 3600))  # 短链 → video_id 基本不变
+INFO_TTL = float(os.environ.get("DOUYIN_INFO_TTL", 600))  # 播放地址带签名，会过期
+CACHE_SIZE = int(os.environ.get("DOUYIN_CACHE_SIZE", 4096))
+CONCURRENCY = int(os.environ.get("DOUYIN_CONCURRENCY", 8))  # 批量解析的并发上限
+HOST_RATE = float(os.environ.get("DOUYIN_HOST_RATE", 5))  # 每个域名每秒请求数
+BATCH_TIMEOUT = float(os.environ.get("DOUYIN_BATCH_TIMEOUT", 120))
+MATERIAL_STORE_DIR = os.environ.get(
+    "MATERIAL_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "materials"))
+MAX_REDIRECTS = 5
+STREAM_CHUNK = 64 * 1024  # 分享页流式读取的块大小
+VIDEO_PATH_PATTERN = re.compile(r"/(?:video|note)/(\d+)")
+ROUTER_DATA_PATTERN = re.compile(r"window\._ROUTER_DATA\s*=\s*(.*?)</script>", flags=re.DOTALL)
+ITEM_LIST_PATTERN = re.compile(r'"item_list"\s*:\s*')
+ROUTER_MARKER = b"window._ROUTER_DATA"
+SCRIPT_END = b"</script>"
+
+
+def video_id_from_url(url: str) -> str:
+    match = VIDEO_PATH_PATTERN.search(url)
+    if not match:
+        raise ValueError(f"无法从链接中解析视频ID: {url}")
+    return match.group(1)
+
+
+class TTLCache:
+    """线程安全的内存缓存，按 LRU 淘汰，条目超过 ttl 秒后失效"""
+
+    def __init__(self, ttl: float, max_entries: int = CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+def parse_router_html(html: str, video_id: str) -> dict:
+    """从完整的分享页 HTML 中解析视频信息"""
+    find_res = ROUTER_DATA_PATTERN.search(html)
+    if not find_res or not find_res.group(1):
+        raise ValueError("从HTML中解析视频信息失败")
+    json_data = json.loads(find_res.group(1).strip())
+    VIDEO_ID_PAGE_KEY = "video_(id)/page"
+    NOTE_ID_PAGE_KEY = "note_(id)/page"
+    if VIDEO_ID_PAGE_KEY in json_data["loaderData"]:
+        original_video_info = json_data["loaderData"][VIDEO_ID_PAGE_KEY]["videoInfoRes"]
+    elif NOTE_ID_PAGE_KEY in json_data["loaderData"]:
+        original_video_info = json_data["loaderData"][NOTE_ID_PAGE_KEY]["videoInfoRes"]
+    else:
+        raise Exception("无法从JSON中解析视频或图集信息")
+    return _video_info(original_video_info["item_list"], video_id)
+
+
+def _video_info(item_list: list, video_id: str) -> dict:
+    data = item_list[0]
+    video_url = data["video"]["play_addr"]["url_list"][0].replace("playwm", "play")
+    desc = data.get("desc", "").strip() or f"douyin_{video_id}"
+    desc = re.sub(r'[\\/:*?"<>|]', '_', desc)
+    return {"url": video_url, "title": desc, "video_id": video_id}
+
+
+class RouterDataExtractor:
+    """流式分享页解析
+
+    边读边找 window._ROUTER_DATA，读到其后的 </script> 即可停止读取；
+    只对 item_list 子树做 JSON 解码，不解析整个路由数据。
+    timings 记录各阶段耗时（毫秒）和读取的字节数。
+    """
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self):
+        self.found = False
+        self.done = False
+        self.timings: Dict[str, Any] = {"method": "stream", "bytes": 0}
+        self._buf = bytearray()
+        self._t0 = time.perf_counter()
+        self._scan = 0.0
+
+    def feed(self, chunk: bytes) -> bool:
+        """送入一块数据，返回 True 表示已拿到所需内容"""
+        if self.done:
+            return True
+        t = time.perf_counter()
+        if not self.timings["bytes"]:
+            self.timings["first_byte_ms"] = round((t - self._t0) * 1000, 2)
+        self.timings["bytes"] += len(chunk)
+        buf = self._buf
+        # 标记可能跨块，从上一块末尾重叠的位置开始查找
+        scan_from = max(0, len(buf) - len(SCRIPT_END if self.found else ROUTER_MARKER) + 1)
+        buf += chunk
+        if not self.found:
+            idx = buf.find(ROUTER_MARKER, scan_from)
+            if idx < 0:
+                del buf[:max(0, len(buf) - len(ROUTER_MARKER) + 1)]
+            else:
+                del buf[:idx + len(ROUTER_MARKER)]
+                self.found = True
+                scan_from = 0
+        if self.found:
+            end = buf.find(SCRIPT_END, scan_from)
+            if end >= 0:
+                del buf[end:]
+                self.done = True
+        self._scan += time.perf_counter() - t
+        return self.done
+
+    def finish(self) -> Dict[str, Any]:
+        self.timings["total_ms"] = round((time.perf_counter() - self._t0) * 1000, 2)
+        return self.timings
+
+    def video_info(self, video_id: str) -> Optional[dict]:
+        """解码 item_list 得到视频信息，结构不符合预期时返回 None，由调用方回退到完整解析"""
+        self.timings["scan_ms"] = round(self._scan * 1000, 2)
+        if not self.found:
+            raise ValueError("从HTML中解析视频信息失败")
+        t = time.perf_counter()
+        try:
+            text = self._buf.decode("utf-8")
+            if not text.lstrip().startswith("="):
+                return None
+            match = ITEM_LIST_PATTERN.search(text, max(0, text.find('"videoInfoRes"')))
+            if match is None:
+                return None
+            item_list, _ = self._decoder.raw_decode(text, match.end())
+            return _video_info(item_list, video_id)
+        except (ValueError, LookupError, TypeError, AttributeError):
+            return None
+        finally:
+            self.timings["decode_ms"] = round((time.perf_counter() - t) * 1000, 2)
+
+
+class HostRateLimiter:
+    """按域名的令牌桶限速（异步）"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._buckets: Dict[str, tuple] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def acquire(self, url: str) -> None:
+        if self.rate <= 0:
+            return
+        host = urlsplit(url).hostname or ""
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            tokens, last = self._buckets.get(host, (self.burst, time.monotonic()))
+            now = time.monotonic()
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                await asyncio.sleep((1 - tokens) / self.rate)
+                now, tokens = time.monotonic(), 1.0
+            self._buckets[host] = (tokens - 1, now)
 
 
 # -------------------- Douyin 工具类 --------------------
 class DouyinProcessor:
-    """抖音视频处理器"""
-    
-    def __init__(self):
-        self.temp_dir = Path(tempfile.mkdtemp())
+    """抖音视频处理器，实例可复用：连接池保持长连接，解析结果按 TTL 缓存"""
+
+    def __init__(self, session: Optional[requests.Session] = None, log: Callable[[str], None] = logger.info):
+        self.session = session or make_session(pool_size=POOL_SIZE, headers=HEADERS)
+        self.log = log
+        self.link_cache = TTLCache(LINK_TTL)  # 分享短链 → video_id
+        self.info_cache = TTLCache(INFO_TTL)  # video_id → 解析结果
+        self._temp_dir: Optional[Path] = None
+        # 异步客户端、并发限制等与事件循环绑定，在所属循环中首次使用时创建
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._limiter: Optional[HostRateLimiter] = None
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+    @property
+    def temp_dir(self) -> Path:
+        """临时目录，首次使用时创建"""
+        if self._temp_dir is None:
+            self._temp_dir = Path(tempfile.mkdtemp())
+        return self._temp_dir
 
-    
     def __del__(self):
-        import shutil
-        if hasattr(self, 'temp_dir') and self.temp_dir.exists():
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
-    
-    def parse_share_url(self, share_text: str) -> dict:
+        if getattr(self, '_temp_dir', None) is not None and self._temp_dir.exists():
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def extract_share_url(share_text: str) -> str:
         urls = re.findall(r'http[s]?://[^\s]+', share_text)
         if not urls:
             raise ValueError("未找到有效的分享链接")
-        share_url = urls[0]
-        resp = requests.get(share_url, headers=HEADERS)
-        video_id = resp.url.split("?")[0].strip("/").split("/")[-1]
-        share_url = f'https://www.iesdouyin.com/share/video/{video_id}'
-        response = requests.get(share_url, headers=HEADERS)
-        response.raise_for_status()
-        pattern = re.compile(r"window\._ROUTER_DATA\s*=\s*(.*?)</script>", flags=re.DOTALL)
-        find_res = pattern.search(response.text)
-        if not find_res or not find_res.group(1):
-            raise ValueError("从HTML中解析视频信息失败")
-        json_data = json.loads(find_res.group(1).strip())
-        VIDEO_ID_PAGE_KEY = "video_(id)/page"
-        NOTE_ID_PAGE_KEY = "note_(id)/page"
-        if VIDEO_ID_PAGE_KEY in json_data["loaderData"]:
-            original_video_info = json_data["loaderData"][VIDEO_ID_PAGE_KEY]["videoInfoRes"]
-        elif NOTE_ID_PAGE_KEY in json_data["loaderData"]:
-            original_video_info = json_data["loaderData"][NOTE_ID_PAGE_KEY]["videoInfoRes"]
-        else:
-            raise Exception("无法从JSON中解析视频或图集信息")
-        data = original_video_info["item_list"][0]
-        video_url = data["video"]["play_addr"]["url_list"][0].replace("playwm", "play")
-        desc = data.get("desc", "").strip() or f"douyin_{video_id}"
-        desc = re.sub(r'[\\/:*?"<>|]', '_', desc)
-        return {"url": video_url, "title": desc, "video_id": video_id}
-    
+        return urls[0]
+
+    def resolve_video_id(self, share_url: str) -> str:
+        """跟随短链跳转得到 video_id
+
+        逐跳处理重定向，跳转地址中已经出现 /video/<id> 时就停止，不再请求分享页本身。
+        最终地址中没有 /video/<id> 或 /note/<id> 时抛出异常，不写入缓存。
+        """
+        video_id = self.link_cache.get(share_url)
+        if video_id is None:
+            url = share_url
+            for _ in range(MAX_REDIRECTS):
+                with self.session.get(url, timeout=REQUEST_TIMEOUT, stream=True, allow_redirects=False) as resp:
+                    if not resp.is_redirect:
+                        resp.raise_for_status()
+                        break
+                    url = urljoin(url, resp.headers["Location"])
+                if VIDEO_PATH_PATTERN.search(url):
+                    break
+            video_id = video_id_from_url(url)
+            self.link_cache.set(share_url, video_id)
+        return video_id
+
+    def fetch_video_info(self, video_id: str) -> dict:
+        info = self.info_cache.get(video_id)
+        if info is not None:
+            return info
+        url = SHARE_PAGE_URL.format(video_id=video_id)
+        extractor = RouterDataExtractor()
+        with self.session.get(url, timeout=REQUEST_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(STREAM_CHUNK):
+                if extractor.feed(chunk):
+                    break
+        info = extractor.video_info(video_id)
+        if info is None:
+            t = time.perf_counter()
+            response = self.session.get(url, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            info = parse_router_html(response.text, video_id)
+            extractor.timings.update(method="full", full_ms=round((time.perf_counter() - t) * 1000, 2))
+        self._report(video_id, extractor)
+        self.info_cache.set(video_id, info)
+        return info
+
+    def _report(self, video_id: str, extractor: RouterDataExtractor) -> None:
+        timings = extractor.finish()
+        self.log(f"分享页解析 {video_id}: " + " ".join(f"{k}={v}" for k, v in timings.items()))
+
+    def parse_share_url(self, share_text: str) -> dict:
+        share_url = self.extract_share_url(share_text)
+        return self.fetch_video_info(self.resolve_video_id(share_url))
+
+    # ---------- 异步 ----------
+    async def _async_state(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            old_client, old_loop = self._aclient, self._loop
+            self._loop = loop
+            self._aclient = httpx.AsyncClient(
+                headers=HEADERS,
+                timeout=httpx.Timeout(REQUEST_TIMEOUT[1], connect=REQUEST_TIMEOUT[0]),
+                limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+                transport=httpx.AsyncHTTPTransport(retries=2),
+            )
+            self._semaphore = asyncio.Semaphore(CONCURRENCY)
+            self._limiter = HostRateLimiter(HOST_RATE)
+            self._inflight = {}
+            if old_client is not None:
+                await self._close_client(old_client, old_loop)
+        return self._aclient
+
+    @staticmethod
+    async def _close_client(client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """关闭换循环前的客户端，释放连接池：原循环仍在运行时交给它关闭，否则在当前循环中尽力关闭"""
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.debug("关闭旧的异步客户端失败：%s", e)
+
+    async def aclose(self) -> None:
+        """关闭异步客户端，应在其所属的事件循环中调用"""
+        if self._aclient is not None:
+            client, self._aclient, self._loop = self._aclient, None, None
+            await client.aclose()
+
+    @contextlib.asynccontextmanager
+    async def _throttled(self, url: str) -> AsyncIterator[httpx.AsyncClient]:
+        """占用一个并发名额并按域名限速"""
+        client = await self._async_state()
+        async with self._semaphore:
+            await self._limiter.acquire(url)
+            yield client
+
+    async def _request(self, url: str, **kwargs) -> httpx.Response:
+        async with self._throttled(url) as client:
+            return await client.get(url, **kwargs)
+
+    async def _once(self, key: tuple, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """相同的请求同时只执行一次，其余等待同一个结果"""
+        await self._async_state()
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def aresolve_video_id(self, share_url: str) -> str:
+        video_id = self.link_cache.get(share_url)
+        if video_id is not None:
+            return video_id
+
+        async def resolve() -> str:
+            url = share_url
+            for _ in range(MAX_REDIRECTS):
+                # 与同步版本一样逐跳流式请求，只看响应头，不下载页面内容
+                async with self._throttled(url) as client:
+                    async with client.stream("GET", url) as resp:
+                        if not resp.is_redirect:
+                            resp.raise_for_status()
+                            break
+                        url = urljoin(url, resp.headers["Location"])
+                if VIDEO_PATH_PATTERN.search(url):
+                    break
+            vid = video_id_from_url(url)
+            self.link_cache.set(share_url, vid)
+            return vid
+        return await self._once(("link", share_url), resolve)
+
+    async def afetch_video_info(self, video_id: str) -> dict:
+        info = self.info_cache.get(video_id)
+        if info is not None:
+            return info
+
+        async def fetch() -> dict:
+            url = SHARE_PAGE_URL.format(video_id=video_id)
+            extractor = RouterDataExtractor()
+            async with self._throttled(url) as client:
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes(STREAM_CHUNK):
+                        if extractor.feed(chunk):
+                            break
+            result = extractor.video_info(video_id)
+            if result is None:
+                t = time.perf_counter()
+                response = await self._request(url)
+                response.raise_for_status()
+                result = parse_router_html(response.text, video_id)
+                extractor.timings.update(method="full", full_ms=round((time.perf_counter() - t) * 1000, 2))
+            self._report(video_id, extractor)
+            self.info_cache.set(video_id, result)
+            return result
+        return await self._once(("info", video_id), fetch)
+
+    async def aparse_share_url(self, share_text: str) -> dict:
+        share_url = self.extract_share_url(share_text)
+        return await self.afetch_video_info(await self.aresolve_video_id(share_url))
+
+
+# 全局复用的处理器
+processor = DouyinProcessor()
+material_store = MaterialStore(MATERIAL_STORE_DIR, Downloader(session=processor.session), log=logger.info)
+
 
 # -------------------- MCP 工具函数 --------------------
-@mcp.tool()
-def get_douyin_download_link(share_link: str) -> str:
+async def _resolve_one(share_text: str) -> dict:
     try:
-        processor = DouyinProcessor()
-        video_info = processor.parse_share_url(share_link)
-        return json.dumps({
+        video_info = await processor.aparse_share_url(share_text)
+        return {
             "status": "success",
             "video_id": video_info["video_id"],
             "title": video_info["title"],
             "download_url": video_info["url"]
-        }, ensure_ascii=False, indent=2)
+        }
     except Exception as e:
-        return json.dumps({"status": "error", "error": str(e)}, ensure_ascii=False, indent=2)
+        return {"status": "error", "error": str(e)}
+
+
+@mcp.tool()
+async def get_douyin_download_link(share_link: str) -> str:
+    return json.dumps(await _resolve_one(share_link), ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+async def get_douyin_download_links(share_texts: List[str], timeout: float = BATCH_TIMEOUT) -> str:
+    """批量解析抖音分享链接，结果与输入一一对应
 
+    单条失败或超时不影响其他结果，整体状态为 success / partial / error。
+    """
+    tasks = [asyncio.ensure_future(_resolve_one(text)) for text in share_texts]
+    done, pending = await asyncio.wait(tasks, timeout=timeout) if tasks else (set(), set())
+    for task in pending:
+        task.cancel()
 
+    results = []
+    for index, (text, task) in enumerate(zip(share_texts, tasks)):
+        item = task.result() if task in done else {"status": "error", "error": "超时"}
+        results.append({"index": index, "share_text": text, **item})
+    succeeded = sum(1 for r in results if r["status"] == "success")
+    status = "success" if succeeded == len(results) else "partial" if succeeded else "error"
+    return json.dumps({
+        "status": status,
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }, ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+async def download_douyin_video(share_link: str) -> str:
+    """解析抖音分享链接并下载到本地素材库，返回可直接用于剪映草稿的素材描述
+
+    同一个 video_id 只下载一次；已入库时不再请求分享页。
+    """
+    try:
+        video_id = await processor.aresolve_video_id(processor.extract_share_url(share_link))
+        descriptor = material_store.lookup(video_id)
+        if descriptor is not None:
+            descriptor["cached"] = True
+        else:
+            video_info = await processor.afetch_video_info(video_id)
+            descriptor = await asyncio.to_thread(
+                material_store.ingest, video_id, video_info["url"], title=video_info["title"])
+        return json.dumps({"status": "success", **descriptor}, ensure_ascii=False, indent=2)
+    except Exception as e:
+        return json.dumps({"status": "error", "error": str(e)}, ensure_ascii=False, indent=2)
 
 
 # -------------------- 启动 MCP --------------------
 if __name__ == "__main__":
-    mcp.run(transport="http", host="0.0.0.0", port=18060)
\ No newline at end of file
+    mcp.run(transport="http", host="0.0.0.0", port=18060)
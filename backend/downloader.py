@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+通用分块下载器
+包含：
+1. 连接池复用的 requests.Session
+2. 大缓冲区流式写盘，大文件按 HTTP Range 并行分段下载
+3. 失败时从已写入的位置断点续传
+4. 大小 / SHA-256 校验
+5. 吞吐量统计
+llmserver.py 与 douyinmcp.py 共用
+"""
+
+import os
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class DownloadError(Exception):
+    """下载失败或校验不通过"""
+
+
+def make_session(pool_size: int = 16, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """创建带连接池和连接级重试的会话"""
+    session = requests.Session()
+    retry = Retry(total=3, connect=3, read=0, backoff_factor=0.5,
+                  status_forcelist=(502, 503, 504), allowed_methods=("HEAD", "GET"))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+@dataclass
+class DownloadStats:
+    url: str
+    path: str
+    bytes: int = 0
+    seconds: float = 0.0
+    segments: int = 1
+    retries: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add_retry(self) -> None:
+        """并行分段在多个线程中累计重试次数"""
+        with self.lock:
+            self.retries += 1
+
+    @property
+    def throughput(self) -> float:
+        """平均吞吐量，单位 字节/秒"""
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class _Metrics:
+    downloads: int = 0
+    failures: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    retries: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class Downloader:
+    """分块下载器，实例可在多线程间共享"""
+
+    def __init__(self, *, session: Optional[requests.Session] = None, chunk_size: int = CHUNK_SIZE,
+                 segment_count: int = 4, parallel_threshold: int = 16 * 1024 * 1024,
+                 retries: int = 3, timeout: Tuple[float, float] = (10, 60),
+                 headers: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            session: 复用的会话，默认新建带连接池的会话
+            chunk_size: 读写缓冲区大小
+            segment_count: 并行分段数
+            parallel_threshold: 文件大于该值且服务端支持 Range 时才并行分段
+            retries: 每个分段失败后的续传次数
+            timeout: (连接超时, 读超时)
+            headers: 默认请求头
+        """
+        self.session = session or make_session(headers=headers)
+        self.chunk_size = chunk_size
+        self.segment_count = max(1, segment_count)
+        self.parallel_threshold = parallel_threshold
+        self.retries = retries
+        self.timeout = timeout
+        self._metrics = _Metrics()
+
+    # ---------- 探测 ----------
+    def _probe(self, url: str) -> Tuple[Optional[int], bool]:
+        """返回 (文件大小, 是否支持 Range)"""
+        try:
+            resp = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            if resp.ok and resp.headers.get("Content-Length"):
+                return int(resp.headers["Content-Length"]), resp.headers.get("Accept-Ranges") == "bytes"
+        except requests.RequestException:
+            pass
+        # 部分服务不支持 HEAD，用 0-0 的 Range 请求探测
+        resp = self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=self.timeout)
+        try:
+            if resp.status_code == 206 and "/" in resp.headers.get("Content-Range", ""):
+                total = resp.headers["Content-Range"].rsplit("/", 1)[1]
+                return (int(total) if total.isdigit() else None), True
+            length = resp.headers.get("Content-Length")
+            return (int(length) if length else None), False
+        finally:
+            resp.close()
+
+    # ---------- 下载 ----------
+    def _fetch_range(self, url: str, path: str, start: int, end: Optional[int], stats: DownloadStats,
+                     ranged: bool = True) -> None:
+        """把 [start, end] 写入文件对应位置，失败时从已写入位置续传；end 为 None 表示到文件末尾
+
+        ranged 为 False（服务端不支持 Range）时不能续传，重试时截断文件从头下载
+        """
+        pos = start
+        attempt = 0
+        while True:
+            if not ranged and pos != start:
+                with open(path, "r+b") as f:
+                    f.truncate(start)
+                pos = start
+            headers = {}
+            if ranged and (pos > 0 or end is not None):
+                headers["Range"] = f"bytes={pos}-{'' if end is None else end}"
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+                    resp.raise_for_status()
+                    if headers and resp.status_code != 206:
+                        raise DownloadError(f"服务端未按 Range 返回: {resp.status_code}")
+                    with open(path, "r+b") as f:
+                        f.seek(pos)
+                        for chunk in resp.iter_content(chunk_size=self.chunk_size):
+                            if end is not None:
+                                chunk = chunk[:end + 1 - pos]
+                            f.write(chunk)
+                            pos += len(chunk)
+                            if end is not None and pos > end:
+                                break
+                if end is None or pos > end:
+                    return
+                raise DownloadError(f"分段提前结束: {pos}/{end + 1}")
+            except (requests.RequestException, DownloadError):
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                stats.add_retry()
+                time.sleep(min(2 ** attempt * 0.5, 8))
+
+    def download(self, url: str, dest: str, *, expected_size: Optional[int] = None,
+                 sha256: Optional[str] = None) -> DownloadStats:
+        """下载到 dest，完成后原子替换目标文件
+
+        Raises:
+            `DownloadError`: 下载失败或大小/哈希校验不通过
+        """
+        stats = DownloadStats(url=url, path=dest)
+        part_path = dest + ".part"
+        resumable = False  # 单连接下载中断时保留 .part，下次从断点继续
+        t0 = time.perf_counter()
+        try:
+            size, ranges = self._probe(url)
+            os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+
+            if size and ranges and size >= self.parallel_threshold and self.segment_count > 1:
+                with open(part_path, "wb") as f:
+                    f.truncate(size)
+                step = -(-size // self.segment_count)
+                bounds = [(s, min(s + step, size) - 1) for s in range(0, size, step)]
+                stats.segments = len(bounds)
+                with ThreadPoolExecutor(max_workers=len(bounds)) as pool:
+                    futures = [pool.submit(self._fetch_range, url, part_path, s, e, stats) for s, e in bounds]
+                    for fut in futures:
+                        fut.result()
+            else:
+                # 单连接；支持 Range 时从已有的 .part 续传
+                resume_from = os.path.getsize(part_path) if ranges and os.path.exists(part_path) else 0
+                if size is not None and resume_from > size:
+                    resume_from = 0
+                with open(part_path, "r+b" if resume_from else "wb") as f:
+                    f.truncate(resume_from)
+                if size is None or resume_from < size:
+                    resumable = ranges
+                    self._fetch_range(url, part_path, resume_from, None, stats, ranged=ranges)
+                    resumable = False
+
+            actual = os.path.getsize(part_path)
+            for want in (size, expected_size):
+                if want is not None and actual != want:
+                    raise DownloadError(f"文件大小不符: {actual} != {want}")
+            if sha256 and _file_sha256(part_path) != sha256.lower():
+                raise DownloadError("SHA-256 校验失败")
+
+            os.replace(part_path, dest)
+            stats.bytes = actual
+        except Exception:
+            with self._metrics.lock:
+                self._metrics.failures += 1
+            # 并行分段的文件已预分配，校验失败的文件也没有续传价值
+            if os.path.exists(part_path) and not resumable:
+                os.remove(part_path)
+            raise
+        finally:
+            stats.seconds = time.perf_counter() - t0
+
+        with self._metrics.lock:
+            self._metrics.downloads += 1
+            self._metrics.bytes += stats.bytes
+            self._metrics.seconds += stats.seconds
+            self._metrics.retries += stats.retries
+        return stats
+
+    def metrics(self) -> Dict[str, float]:
+        """累计统计"""
+        m = self._metrics
+        with m.lock:
+            return {
+                "downloads": m.downloads,
+                "failures": m.failures,
+                "bytes": m.bytes,
+                "seconds": m.seconds,
+                "retries": m.retries,
+                "throughput": m.bytes / m.seconds if m.seconds > 0 else 0.0,
+            }
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for buf in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(buf)
+    return h.hexdigest()
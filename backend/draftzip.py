@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+草稿目录流式 ZIP 打包
+包含：
+1. iter_zip：边读边压边产出字节，已压缩的媒体文件直接存储（STORED）
+2. draft_fingerprint：按草稿内容计算哈希，用作缓存键
+3. ZipCache：把流式输出同时落盘，下次同内容草稿直接返回文件，总大小超限时按最近使用时间淘汰
+"""
+
+import os
+import io
+import uuid
+import threading
+import hashlib
+import zipfile
+from typing import Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+# 这些格式本身已经压缩过，再 deflate 只浪费 CPU
+STORED_EXTENSIONS = {
+    ".mp4", ".mov", ".m4v", ".mkv", ".avi", ".webm", ".flv",
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".zip", ".gz", ".7z", ".rar",
+}
+
+# 指纹中按内容哈希的小文件，其余文件只取大小与修改时间
+CONTENT_HASHED_EXTENSIONS = {".json", ".txt", ".srt"}
+
+
+class _ChunkSink(io.RawIOBase):
+    """不可 seek 的写入端，zipfile 会自动改用数据描述符写法"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _walk(folder: str) -> Iterator[Tuple[str, str, bool]]:
+    """按固定顺序遍历目录，产出 (绝对路径, 包内路径, 是否为空目录)"""
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        rel_root = os.path.relpath(root, folder)
+        if not dirs and not files and rel_root != ".":
+            yield root, rel_root.replace(os.sep, "/") + "/", True
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            arcname = os.path.relpath(path, folder).replace(os.sep, "/")
+            yield path, arcname, False
+
+
+def iter_zip(folder: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """以流的方式打包目录，每读入一块文件数据就产出对应的 ZIP 字节"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as zf:
+        for path, arcname, is_dir in _walk(folder):
+            zinfo = zipfile.ZipInfo.from_file(path, arcname)
+            if is_dir:
+                zf.writestr(zinfo, b"")
+                continue
+            ext = os.path.splitext(arcname)[1].lower()
+            zinfo.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            with open(path, "rb") as src, zf.open(zinfo, "w") as dst:
+                while True:
+                    buf = src.read(chunk_size)
+                    if not buf:
+                        break
+                    dst.write(buf)
+                    data = sink.pop()
+                    if data:
+                        yield data
+            data = sink.pop()
+            if data:
+                yield data
+    # 中央目录
+    data = sink.pop()
+    if data:
+        yield data
+
+
+def draft_fingerprint(folder: str) -> str:
+    """计算草稿内容哈希
+
+    草稿 JSON 等小文件按内容计算，媒体文件按 (路径, 大小, 修改时间) 计算，
+    避免为了算缓存键把几个 GB 的素材再读一遍。
+    """
+    h = hashlib.sha256()
+    for path, arcname, is_dir in _walk(folder):
+        h.update(arcname.encode("utf-8"))
+        if is_dir:
+            continue
+        st = os.stat(path)
+        if os.path.splitext(arcname)[1].lower() in CONTENT_HASHED_EXTENSIONS:
+            with open(path, "rb") as f:
+                for buf in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    h.update(buf)
+        else:
+            h.update(f"{st.st_size}:{st.st_mtime_ns}".encode("ascii"))
+    return h.hexdigest()
+
+
+class ZipCache:
+    """按草稿内容哈希缓存打包结果
+
+    草稿每次修改都会得到新的指纹，旧的打包结果不会再被命中，
+    因此写入新文件后按修改时间（命中时刷新）淘汰，直到总大小不超过 max_bytes。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 5 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.zip")
+
+    def lookup(self, key: str) -> Optional[str]:
+        path = self.path_for(key)
+        try:
+            os.utime(path)  # 记录最近使用时间
+        except OSError:
+            return None
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """按最近使用时间淘汰，直到总大小不超过 max_bytes，返回删除的文件数"""
+        with self._evict_lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".zip"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            return removed
+
+    def tee(self, key: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """把字节流原样转发，同时写入缓存；只有完整传输才会生效"""
+        final_path = self.path_for(key)
+        part_path = f"{final_path}.{uuid.uuid4().hex}.part"
+        completed = False
+        try:
+            with open(part_path, "wb") as f:
+                for data in chunks:
+                    f.write(data)
+                    yield data
+            completed = True
+            os.replace(part_path, final_path)
+            self.evict(keep=final_path)
+        finally:
+            if not completed and os.path.exists(part_path):
+                os.remove(part_path)
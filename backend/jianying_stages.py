@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+剪映草稿生成流水线的阶段实现
+包含：
+1. prompt_texts：大模型根据提示词生成 N 段文本
+2. text_to_video：每段文本并发生成视频并下载（按提示词缓存）
+3. tts：每段文本合成语音
+4. assemble_draft：按样式列表拼装草稿
+
+阶段上下文 ctx 由 llmserver.py 提供：
+cached_client, chat_model, extra_body, api_key, downloader, tts_stage,
+media_cache_dir, fallback_material_dir, draft_folder, workspace, log
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import Timerange, tim
+from pipeline import stage
+import tracing
+
+
+def parse_text_list(content: str) -> List[str]:
+    """解析大模型返回的 JSON 数组，失败时按行拆分"""
+    content = content.strip()
+    # 去掉可能的 ```json 或 ``` 代码块标记
+    if content.startswith("```"):
+        content = "\n".join(content.split("\n")[1:])
+    if content.endswith("```"):
+        content = "\n".join(content.split("\n")[:-1])
+
+    try:
+        texts = json.loads(content)
+    except json.JSONDecodeError:
+        lines = [line.strip() for line in content.split("\n")
+                 if line.strip() and not line.strip().startswith("[") and not line.strip().startswith("]")]
+        texts = [line.rstrip(",").strip().strip('"') for line in lines]
+    return [str(t) for t in texts]
+
+
+def _all_files_exist(output: List[Dict[str, Any]]) -> bool:
+    return all(os.path.exists(item["path"]) for item in output)
+
+
+def _no_fallback(output: List[Dict[str, Any]]) -> bool:
+    """兜底素材不能作为缓存结果，下次应重新尝试生成"""
+    return _all_files_exist(output) and not any(item.get("fallback") for item in output)
+
+
+def _key(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# ========================
+# 文本
+# ========================
+@stage("prompt_texts")
+def prompt_texts(ctx, params) -> List[str]:
+    """params: prompt, count"""
+    count = int(params.get("count", 3))
+    messages = [{"role": "user", "content": params["prompt"]}]
+    ctx["log"](params["prompt"])
+    with tracing.span("llm.complete", model=ctx["chat_model"]):
+        try:
+            content = ctx["cached_client"].complete(
+                ctx["chat_model"], messages, use_cache=ctx.get("use_cache", True), extra_body=ctx.get("extra_body"),
+            )
+        except Exception as e:
+            tracing.record_upstream_error("llm", e)
+            raise
+    texts = parse_text_list(content)
+    ctx["log"](texts)
+    if len(texts) < count:
+        raise ValueError(f"大模型只返回了 {len(texts)} 段文本，需要 {count} 段")
+    return texts[:count]
+
+
+# ========================
+# 视频
+# ========================
+def _generate_video(ctx, params, zclient, idx: int, prompt: str) -> Dict[str, Any]:
+    log = ctx["log"]
+    gen_params = {
+        "model": params.get("model", "CogVideoX-Flash"),
+        "quality": params.get("quality", "quality"),
+        "with_audio": params.get("with_audio", True),
+        "size": params.get("size", "1920x1080"),
+        "fps": params.get("fps", 30),
+        "watermark_enabled": False,
+    }
+    path = os.path.join(ctx["media_cache_dir"], "video", f"{_key({'prompt': prompt, **gen_params})}.mp4")
+    if os.path.exists(path):
+        log(f"第 {idx} 个视频命中缓存: {path}")
+        return {"path": path, "fallback": False}
+
+    log(f"开始生成第 {idx} 个视频，prompt: {prompt}")
+    service = "video"
+    try:
+        with tracing.span("video.submit", index=idx):
+            response = zclient.videos.generations(prompt=prompt, **gen_params)
+        video_id = response.id
+        log(f"视频任务开始 ID: {video_id}")
+
+        timeout, interval, elapsed = params.get("timeout", 300), params.get("interval", 5), 0
+        video_url = None
+        with tracing.span("video.poll", index=idx, task_id=video_id) as attrs:
+            while elapsed < timeout:
+                result = zclient.videos.retrieve_videos_result(id=video_id)
+                status = attrs["status"] = getattr(result, "task_status", None)
+                log(f"任务状态: {status}")
+                if status == "SUCCESS":
+                    video_url = result.video_result[0].url
+                    log(f"视频生成成功: {video_url}")
+                    break
+                elif status in ("FAILURE", "FAILED"):
+                    log(f"视频生成失败, prompt: {prompt}")
+                    break
+                time.sleep(interval)
+                elapsed += interval
+
+        if video_url:
+            service = "download"
+            # 同一提示词的任务可能并发，先下载到本任务独有的临时文件，完成后原子替换到缓存路径
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with tracing.span("video.download", index=idx) as attrs:
+                try:
+                    stats = ctx["downloader"].download(video_url, tmp_path)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                attrs.update(bytes=stats.bytes, segments=stats.segments, retries=stats.retries)
+            log(f"视频保存成功: {path}, {stats.bytes} 字节, {stats.seconds:.2f}s, "
+                f"{stats.throughput / 1024 / 1024:.1f} MB/s, 分段 {stats.segments}, 重试 {stats.retries}")
+            return {"path": path, "fallback": False}
+        tracing.record_upstream_error("video")
+    except Exception as e:
+        tracing.record_upstream_error(service, e)
+        log(f"生成视频出现异常: {e}")
+
+    # 生成失败时使用公共素材目录中的兜底视频
+    fallback = os.path.join(ctx["fallback_material_dir"], f"video{idx}.mp4")
+    if not os.path.exists(fallback):
+        raise FileNotFoundError(f"视频文件不存在: {fallback}")
+    log(f"第 {idx} 个视频使用兜底素材: {fallback}")
+    return {"path": fallback, "fallback": True}
+
+
+@stage("text_to_video", cache_valid=_no_fallback)
+def text_to_video(ctx, params, texts: List[str]) -> List[Dict[str, Any]]:
+    """params: model, quality, size, fps, timeout, interval, concurrency"""
+    from zai import ZhipuAiClient
+    zclient = ZhipuAiClient(api_key=ctx["api_key"])
+
+    with ThreadPoolExecutor(max_workers=params.get("concurrency", 3)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _generate_video, ctx, params, zclient, idx, prompt)
+                   for idx, prompt in enumerate(texts, start=1)]
+        return [fut.result() for fut in futures]
+
+
+# ========================
+# 语音
+# ========================
+@stage("tts", cache_valid=_all_files_exist)
+def tts(ctx, params, texts: List[str]) -> List[Dict[str, Any]]:
+    out_dir = os.path.join(ctx["media_cache_dir"], "tts", _key(texts))
+    # 相同文本的任务可能并发，先合成到本任务独有的临时目录，再逐个文件原子替换到缓存目录
+    tmp_dir = f"{out_dir}.{uuid.uuid4().hex}.tmp"
+    try:
+        results = ctx["tts_stage"].synthesize(texts, tmp_dir)
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {}
+        for r in results:
+            if r.path not in paths:
+                paths[r.path] = os.path.join(out_dir, os.path.basename(r.path))
+                os.replace(r.path, paths[r.path])
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    ctx["log"](f"TTS 完成, 时长(us): {[r.duration for r in results]}")
+    return [{"path": paths[r.path], "duration": r.duration} for r in results]
+
+
+# ========================
+# 拼装草稿
+# ========================
+def _apply_video_style(segment: draft.VideoSegment, style: Dict[str, Any]) -> None:
+    if "background_filling" in style:
+        fill = style["background_filling"]
+        segment.add_background_filling(fill.get("type", "blur"), fill.get("blur", 0.0625),
+                                       fill.get("color", "#00000000"))
+    if "filter" in style:
+        segment.add_filter(draft.FilterType.from_name(style["filter"]["type"]),
+                           intensity=style["filter"].get("intensity", 100.0))
+    if "mask" in style:
+        mask = dict(style["mask"])
+        segment.add_mask(draft.MaskType.from_name(mask.pop("type")), **mask)
+    if "transition" in style:
+        segment.add_transition(draft.TransitionType.from_name(style["transition"]))
+
+
+def _apply_text_style(segment: draft.TextSegment, style: Dict[str, Any]) -> None:
+    # 须先添加出入场动画再添加循环动画
+    if "text_intro" in style:
+        segment.add_animation(draft.TextIntro.from_name(style["text_intro"]["type"]),
+                              duration=style["text_intro"].get("duration"))
+    if "text_outro" in style:
+        segment.add_animation(draft.TextOutro.from_name(style["text_outro"]["type"]),
+                              duration=style["text_outro"].get("duration"))
+    if "text_loop" in style:
+        segment.add_animation(draft.TextLoopAnim.from_name(style["text_loop"]))
+
+
+@stage("assemble_draft")
+def assemble_draft(ctx, params, texts: List[str], videos: List[Dict[str, Any]],
+                   audios: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """params: width, height, fps, segment_duration, volume, text{font, transform_y}, styles[]
+
+    styles 按段循环使用，每项可包含：
+    transition, filter{type, intensity}, mask{type, center_x, ...}, background_filling{type, blur},
+    audio_fade[入, 出], text_intro{type, duration}, text_outro{type, duration}, text_loop
+    """
+    ws = ctx["workspace"]
+    draft_folder: draft.DraftFolder = ctx["draft_folder"]
+
+    script = draft_folder.create_draft(ws.staging_name, params.get("width", 1920), params.get("height", 1080),
+                                       params.get("fps", 30))
+    # 导出时把所有素材路径指向最终草稿内的素材目录，草稿只序列化一次
+    script.path_rewrite = draft.RelocateToDir(os.path.join(ws.final_path, "material"))
+    script.add_track(draft.TrackType.audio).add_track(draft.TrackType.video).add_track(draft.TrackType.text)
+
+    segment_duration = tim(params.get("segment_duration", "5s"))
+    volume = params.get("volume", 0.6)
+    text_params = params.get("text", {})
+    styles = params.get("styles") or [{}]
+
+    start = 0
+    for idx, (text, video, audio) in enumerate(zip(texts, videos, audios), start=1):
+        style = styles[(idx - 1) % len(styles)]
+        # 放置素材（reflink/硬链接优先，失败时才复制）
+        with tracing.span("draft.place_materials", index=idx):
+            video_path = draft_folder.place_material(ws.staging_name, video["path"], dst_name=f"video{idx}.mp4")
+            audio_path = draft_folder.place_material(ws.staging_name, audio["path"], dst_name=f"audio{idx}.mp3")
+
+        video_seg = draft.VideoSegment(video_path, Timerange(start, segment_duration))
+        _apply_video_style(video_seg, style)
+        script.add_segment(video_seg)
+
+        # 音频按真实语音时长，超出对应视频段时截断，避免与下一段重叠
+        audio_seg = draft.AudioSegment(audio_path, Timerange(start, min(audio["duration"], segment_duration)),
+                                       volume=volume)
+        if "audio_fade" in style:
+            audio_seg.add_fade(*style["audio_fade"])
+        script.add_segment(audio_seg)
+
+        text_seg = draft.TextSegment(
+            text,
+            Timerange(start, segment_duration),
+            font=draft.FontType.from_name(text_params.get("font", "文轩体")),
+            clip_settings=draft.ClipSettings(transform_y=text_params.get("transform_y", -0.8)),
+        )
+        _apply_text_style(text_seg, style)
+        script.add_segment(text_seg)
+
+        start = video_seg.end
+
+    with tracing.span("draft.save"):
+        script.save()
+    ctx["log"](f"✅ 草稿已保存: {ws.staging_path}")
+    return {"draft_name": ws.draft_name, "duration": script.duration, "segments": len(texts)}
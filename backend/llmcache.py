@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+大模型响应缓存
+包含：
+1. 精确匹配层：对 model + messages + 参数 做哈希
+2. 语义相似层（可选）：对消息文本做向量相似度匹配，只比较最近访问的若干条
+3. 内存 LRU + TTL，SQLite 持久化（多 worker 共享），内存命中定期回写访问时间
+4. 流式响应录制与回放
+"""
+
+import os
+import json
+import time
+import array
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+EmbedFn = Callable[[str], List[float]]
+
+logger = logging.getLogger("llmcache")
+
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def messages_text(messages: List[Dict[str, Any]]) -> str:
+    """把消息列表拼成用于向量化的纯文本"""
+    parts = []
+    for msg in messages:
+        content = msg.get("content")
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        parts.append(f"{msg.get('role', '')}: {content}")
+    return "\n".join(parts)
+
+
+class ResponseCache:
+    """内存 LRU + SQLite 持久化的响应缓存
+
+    缓存值为 dict: {"content": 完整文本, "chunks": 流式分片列表或 None}
+    """
+
+    def __init__(self, db_path: str, *, ttl: float = 24 * 3600, max_entries: int = 1024,
+                 max_db_entries: int = 100000, embed_fn: Optional[EmbedFn] = None,
+                 similarity_threshold: float = 0.95, max_candidates: int = 2000,
+                 touch_interval: float = 60.0):
+        """
+        Args:
+            db_path: SQLite 文件路径
+            ttl: 缓存有效期（秒）
+            max_entries: 内存 LRU 最大条目数
+            max_db_entries: SQLite 最大条目数，超出后按最近访问时间淘汰
+            embed_fn: 文本向量化函数，为 None 时不启用语义相似层
+            similarity_threshold: 语义命中所需的最小余弦相似度
+            max_candidates: 语义查找时最多比较的条目数，取同一 scope 内最近访问的
+            touch_interval: 内存命中的访问时间攒起来，每隔这么多秒批量写回 SQLite
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_db_entries = max_db_entries
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.max_candidates = max_candidates
+        self.touch_interval = touch_interval
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # 尚未写回的内存命中：key → 访问时间
+        self._touched_at = time.time()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, scope TEXT, value TEXT, created REAL, accessed REAL, embedding BLOB)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_scope ON responses(scope, created)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(scope, accessed)")
+        self._conn.commit()
+
+    # ---------- 键 ----------
+    @staticmethod
+    def make_scope(model: str, params: Dict[str, Any]) -> str:
+        """模型与参数的哈希，语义匹配只在同一 scope 内进行"""
+        return hashlib.sha256(_canonical({"model": model, "params": params}).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+        payload = _canonical({"model": model, "messages": messages, "params": params})
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ---------- 读 ----------
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """精确匹配查找，先查内存再查 SQLite"""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                created, value = item
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._touch(key, now)
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value_json, created = row
+            if now - created > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            value = json.loads(value_json)
+            self._remember(key, created, value)
+            return value
+
+    def _embed(self, text: str) -> Optional[array.array]:
+        """向量化失败（接口超时、不可用等）时返回 None，语义层按未命中处理，不影响对话请求"""
+        try:
+            return array.array("f", self.embed_fn(text))
+        except Exception as e:
+            logger.warning("向量化失败，跳过语义缓存：%s", e)
+            return None
+
+    def get_similar(self, scope: str, text: str) -> Optional[Dict[str, Any]]:
+        """语义相似查找，未配置 embed_fn 或向量化失败时返回 None"""
+        if self.embed_fn is None:
+            return None
+        query = self._embed(text)
+        if query is None:
+            return None
+        now = time.time()
+        with self._lock:
+            # +created 让 SQLite 走 (scope, accessed) 索引按访问时间倒序取前 max_candidates 条，不必整体排序
+            rows = self._conn.execute(
+                "SELECT key, embedding FROM responses WHERE scope = ? AND +created >= ? AND embedding IS NOT NULL "
+                "ORDER BY accessed DESC LIMIT ?",
+                (scope, now - self.ttl, self.max_candidates),
+            ).fetchall()
+        q = np.frombuffer(query.tobytes(), dtype=np.float32)
+        rows = [(key, blob) for key, blob in rows if len(blob) == q.nbytes]  # 换过向量模型的旧条目维度不同
+        if not rows:
+            return None
+        matrix = np.frombuffer(b"".join(blob for _, blob in rows), dtype=np.float32).reshape(len(rows), -1)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(q)
+        scores = np.divide(matrix @ q, norms, out=np.zeros(len(rows), dtype=np.float32), where=norms > 0)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return self.get(rows[best][0])
+
+    # ---------- 写 ----------
+    def set(self, key: str, value: Dict[str, Any], *, scope: str = "", text: Optional[str] = None) -> None:
+        now = time.time()
+        embedding = None
+        if self.embed_fn is not None and text:
+            vec = self._embed(text)
+            embedding = vec.tobytes() if vec is not None else None
+        with self._lock:
+            self._remember(key, now, value)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, scope, value, created, accessed, embedding) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, scope, json.dumps(value, ensure_ascii=False), now, now, embedding),
+            )
+            # 先写回内存命中的访问时间，淘汰时热门条目才不会被当成最久未用
+            self._flush_touched()
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_db_entries,),
+            )
+            self._conn.commit()
+
+    def _touch(self, key: str, now: float) -> None:
+        """记录内存命中，攒够 touch_interval 秒后一次写回（调用方持有 _lock）"""
+        self._touched[key] = now
+        if now - self._touched_at >= self.touch_interval:
+            self._flush_touched()
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        """把攒下的访问时间写回 SQLite，由调用方提交（调用方持有 _lock）"""
+        if self._touched:
+            self._conn.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                   [(t, key) for key, t in self._touched.items()])
+            self._touched.clear()
+        self._touched_at = time.time()
+
+    def _remember(self, key: str, created: float, value: Dict[str, Any]) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def purge_expired(self) -> int:
+        """清理 SQLite 中已过期的条目，返回删除数量"""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+            return cur.rowcount
+
+
+class CachedChatClient:
+    """在 client.chat.completions.create 前面加一层缓存"""
+
+    def __init__(self, client, cache: ResponseCache):
+        self.client = client
+        self.cache = cache
+
+    def _lookup(self, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]):
+        key = ResponseCache.make_key(model, messages, params)
+        scope = ResponseCache.make_scope(model, params)
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = self.cache.get_similar(scope, messages_text(messages))
+        return key, scope, cached
+
+    def complete(self, model: str, messages: List[Dict[str, Any]], *, use_cache: bool = True, **params) -> str:
+        """非流式调用，返回完整文本"""
+        if use_cache:
+            key, scope, cached = self._lookup(model, messages, params)
+            if cached is not None:
+                return cached["content"]
+
+        res = self.client.chat.completions.create(model=model, messages=messages, stream=False, **params)
+        content = res.choices[0].message.content
+
+        if use_cache and content:
+            self.cache.set(key, {"content": content, "chunks": None}, scope=scope, text=messages_text(messages))
+        return content
+
+    def stream(self, model: str, messages: List[Dict[str, Any]], *, use_cache: bool = True,
+               replay_delay: float = 0.0, **params) -> Iterator[str]:
+        """流式调用，逐段产出文本
+
+        命中缓存时按录制的分片回放（replay_delay 为每片间隔秒数），
+        未命中时边转发边录制，完整结束后写入缓存。
+        """
+        if use_cache:
+            key, scope, cached = self._lookup(model, messages, params)
+            if cached is not None:
+                chunks = cached.get("chunks") or [cached["content"]]
+                for delta in chunks:
+                    yield delta
+                    if replay_delay:
+                        time.sleep(replay_delay)
+                return
+
+        res = self.client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+        chunks: List[str] = []
+        for chunk in res:
+            delta = getattr(chunk.choices[0].delta, "content", None)
+            if delta:
+                chunks.append(delta)
+                yield delta
+
+        # 只有完整结束的流才写入缓存，中途异常不会落盘
+        if use_cache and chunks:
+            self.cache.set(key, {"content": "".join(chunks), "chunks": chunks},
+                           scope=scope, text=messages_text(messages))
@@ -2,25 +2,32 @@
 """
 FastAPI 多功能服务端 (带日志系统)
 包含：
-1. 流式聊天接口 /chat
-2. 非流式聊天接口 /chat_sync
+1. 流式聊天接口 /chat（支持缓存回放）
+2. 非流式聊天接口 /chat_sync（带响应缓存）
 3. 图文问答接口 /chat_image
 4. 通用多媒体生成接口 /gen_media
 5. 剪映工程自动生成接口 /chat_jianying
+6. 草稿流式打包下载接口 /drafts/{draft_name}.zip
 """
 
 import os
 import json
 import time
-import shutil
 import tempfile
 import traceback
-import logging
+from urllib.parse import quote
 from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from openai import OpenAI
+from llmcache import ResponseCache, CachedChatClient
+from draftzip import iter_zip, draft_fingerprint, ZipCache
+from workspace import JobWorkspace, WorkspaceGC
+from downloader import Downloader
+import tracing
+from loghelper import AppLogger
 
 # ========================
 # 全局配置
@@ -37,36 +44,49 @@ JIAN_YING_PATH = r"D:\JianyingPro Drafts"
 TEMP_DOWNLOAD_DIR = os.path.join(tempfile.gettempdir(), "jianying_downloads")
 os.makedirs(TEMP_DOWNLOAD_DIR, exist_ok=True)
 DOWNLOAD_BASE_URL = "http://127.0.0.1:8000/downloads"
+DRAFT_DOWNLOAD_BASE_URL = "http://127.0.0.1:8000/drafts"
+DRAFT_ZIP_CACHE = os.environ.get("DRAFT_ZIP_CACHE", "1") == "1"  # 是否按草稿内容哈希缓存打包结果
+DRAFT_ZIP_CACHE_MAX_BYTES = int(os.environ.get("DRAFT_ZIP_CACHE_MAX_BYTES", 5 * 1024 ** 3))  # ZIP 缓存总大小上限
 
-# ========================
-# 日志系统
-# ========================
-class AppLogger:
-    def __init__(self, moduleName, logfile=None):
-        self._logger = logging.getLogger(moduleName)
-        fmt = "%(asctime)-15s %(levelname)s %(filename)s %(lineno)d %(message)s"
-        formatter = logging.Formatter(fmt)
-        self._logger.handlers.clear()
-
-        if logfile:
-            handler = logging.FileHandler(logfile, encoding="utf-8")
-        else:
-            handler = logging.StreamHandler()
+# 生成失败遗留的暂存草稿由后台线程清理
+WORKSPACE_MAX_AGE = float(os.environ.get("WORKSPACE_MAX_AGE", 6 * 3600))
 
-        handler.setFormatter(formatter)
-        self._logger.addHandler(handler)
-        self._logger.setLevel(logging.INFO)
+# 大模型响应缓存
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", 24 * 3600))
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", 1024))
+LLM_CACHE_SEMANTIC = os.environ.get("LLM_CACHE_SEMANTIC", "0") == "1"  # 是否启用语义相似层
+LLM_CACHE_THRESHOLD = float(os.environ.get("LLM_CACHE_THRESHOLD", 0.95))
+LLM_CACHE_REPLAY_DELAY = float(os.environ.get("LLM_CACHE_REPLAY_DELAY", 0))  # 流式回放每片间隔（秒）
 
-        self.info = self._logger.info
-        self.error = self._logger.error
-        self.warning = self._logger.warning
-        self.debug = self._logger.debug
+# 请求追踪：span 写入 logs/trace.<pid>.log，配置采集器地址时同时按 OTLP/HTTP JSON 上报
+TRACE_COLLECTOR_URL = os.environ.get("TRACE_COLLECTOR_URL")  # 如 http://127.0.0.1:4318/v1/traces
 
+CHAT_MODEL = "GLM-4.5-Flash"
+NO_THINKING = {"thinking": {"type": "disabled"},
+               "chat_template_kwargs": {"enable_thinking": False}}
 
+# ========================
+# 日志系统
+# ========================
 # 初始化日志器
-chat_logger = AppLogger("chat", os.path.join(LOG_DIR, "chat.log"))
-media_logger = AppLogger("media", os.path.join(LOG_DIR, "media.log"))
-jianying_logger = AppLogger("jianying", os.path.join(LOG_DIR, "jianying.log"))
+# 异步写盘（QueueListener）、JSON Lines、按大小/时间轮转、超长内容截断
+LOG_OPTIONS = {
+    "rotate": os.environ.get("LOG_ROTATE", "size"),  # size / time
+    "max_bytes": int(os.environ.get("LOG_MAX_BYTES", 50 * 1024 * 1024)),
+    "backup_count": int(os.environ.get("LOG_BACKUP_COUNT", 10)),
+    "max_message_chars": int(os.environ.get("LOG_MAX_CHARS", 4000)),
+    "sample_rate": float(os.environ.get("LOG_SAMPLE_RATE", 0)),  # 超长消息保留全文的比例
+    "filters": [tracing.TraceIdFilter()],
+    # uvicorn 多 worker 运行，每个进程写自己的日志文件，避免多个进程同时轮转同一个文件
+    "per_process": os.environ.get("LOG_PER_PROCESS", "1") == "1",
+}
+chat_logger = AppLogger("chat", os.path.join(LOG_DIR, "chat.log"), **LOG_OPTIONS)
+media_logger = AppLogger("media", os.path.join(LOG_DIR, "media.log"), **LOG_OPTIONS)
+jianying_logger = AppLogger("jianying", os.path.join(LOG_DIR, "jianying.log"), **LOG_OPTIONS)
+trace_logger = AppLogger("trace", os.path.join(LOG_DIR, "trace.log"), **LOG_OPTIONS)
+
+tracing.configure(collector_url=TRACE_COLLECTOR_URL, service_name="llmserver", log=trace_logger.info)
 
 # ========================
 # FastAPI 初始化
@@ -81,15 +101,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """每个请求一个 trace id（沿用请求头 X-Trace-Id），记录耗时与并发数"""
+    token = tracing.set_trace_id(request.headers.get("X-Trace-Id") or tracing.new_trace_id())
+    tracing.HTTP_IN_FLIGHT.inc()
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        with tracing.span(f"http {request.method}", method=request.method, path=request.url.path) as attrs:
+            response = await call_next(request)
+            status = attrs["status"] = response.status_code
+        response.headers["X-Trace-Id"] = tracing.get_trace_id()
+        return response
+    finally:
+        # 按路由模板统计，避免 /drafts/{draft_name}.zip 之类的路径产生大量标签；
+        # 流式响应只统计到响应头返回为止，完整耗时见对应的 span
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        tracing.HTTP_DURATION.observe(time.perf_counter() - t0, method=request.method, route=route,
+                                      status=status)
+        tracing.HTTP_IN_FLIGHT.dec()
+        tracing.reset_trace_id(token)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的指标（每个 worker 进程各自统计）"""
+    return PlainTextResponse(tracing.render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 client = OpenAI(base_url=BASE_URL, api_key=API_KEY)
 
+
+def _embed_text(text: str):
+    res = client.embeddings.create(model="embedding-3", input=text)
+    return res.data[0].embedding
+
+
+llm_cache = ResponseCache(
+    os.path.join(CACHE_DIR, "llm_cache.sqlite3"),
+    ttl=LLM_CACHE_TTL,
+    max_entries=LLM_CACHE_SIZE,
+    embed_fn=_embed_text if LLM_CACHE_SEMANTIC else None,
+    similarity_threshold=LLM_CACHE_THRESHOLD,
+)
+cached_client = CachedChatClient(client, llm_cache)
+
 # ========================
 # 1. 流式聊天接口
 # ========================
 @app.post("/chat")
 async def chat(request: Request):
     """
-    流式聊天接口
+    流式聊天接口，相同请求命中缓存时按录制分片回放，传 "cache": false 可跳过缓存
     CMD 示例：
     curl -N -X POST "http://127.0.0.1:8000/chat" ^
          -H "Content-Type: application/json" ^
@@ -97,6 +163,7 @@ async def chat(request: Request):
     """
     body = await request.json()
     messages = body.get("messages", [])
+    use_cache = body.get("cache", True)
     chat_logger.info(f"请求消息: {messages}")
 
     if not messages:
@@ -104,26 +171,24 @@ async def chat(request: Request):
 
     def stream_content():
         try:
-            res = client.chat.completions.create(
-                model="GLM-4.5-Flash",
-                messages=messages,
-                stream=True,
-                extra_body={"thinking": {"type": "disabled"},
-                            "chat_template_kwargs": {"enable_thinking": False}},
-            )
-
-            for chunk in res:
-                delta = getattr(chunk.choices[0].delta, "content", None)
-                if delta:
-                    payload = json.dumps({"text": delta}, ensure_ascii=False)
-                    yield f"data: {payload}\n\n"
+            for delta in cached_client.stream(
+                CHAT_MODEL,
+                messages,
+                use_cache=use_cache,
+                replay_delay=LLM_CACHE_REPLAY_DELAY,
+                extra_body=NO_THINKING,
+            ):
+                payload = json.dumps({"text": delta}, ensure_ascii=False)
+                yield f"data: {payload}\n\n"
 
             yield "data: [DONE]\n\n"
         except Exception as e:
+            tracing.record_upstream_error("llm", e)
             chat_logger.error(traceback.format_exc())
             yield f"data: [ERROR] {str(e)}\n\n"
 
-    return StreamingResponse(stream_content(), media_type="text/event-stream")
+    return StreamingResponse(tracing.traced_iter("llm.stream", stream_content(), model=CHAT_MODEL),
+                             media_type="text/event-stream")
 
 
 # ========================
@@ -132,7 +197,7 @@ async def chat(request: Request):
 @app.post("/chat_sync")
 async def chat_sync(request: Request):
     """
-    非流式聊天接口
+    非流式聊天接口，相同请求直接返回缓存结果，传 "cache": false 可跳过缓存
     CMD 示例：
     curl -X POST "http://127.0.0.1:8000/chat_sync" ^
          -H "Content-Type: application/json" ^
@@ -140,23 +205,24 @@ async def chat_sync(request: Request):
     """
     body = await request.json()
     messages = body.get("messages", [])
+    use_cache = body.get("cache", True)
     chat_logger.info(f"非流式消息: {messages}")
 
     if not messages:
         return JSONResponse({"error": "messages不能为空"}, status_code=400)
 
     try:
-        res = client.chat.completions.create(
-            model="GLM-4.5-Flash",
-            messages=messages,
-            stream=False,
-            extra_body={"thinking": {"type": "disabled"},
-                        "chat_template_kwargs": {"enable_thinking": False}},
-        )
-        content = res.choices[0].message.content
+        with tracing.span("llm.complete", model=CHAT_MODEL):
+            content = cached_client.complete(
+                CHAT_MODEL,
+                messages,
+                use_cache=use_cache,
+                extra_body=NO_THINKING,
+            )
         chat_logger.info(f"返回内容: {content}")
         return JSONResponse({"response": content})
     except Exception as e:
+        tracing.record_upstream_error("llm", e)
         chat_logger.error(traceback.format_exc())
         return JSONResponse({"error": str(e)}, status_code=500)
 
@@ -198,10 +264,12 @@ async def chat_image(request: Request):
                     yield f"data: {payload}\n\n"
             yield "data: [DONE]\n\n"
         except Exception as e:
+            tracing.record_upstream_error("vlm", e)
             chat_logger.error(traceback.format_exc())
             yield f"data: [ERROR] {str(e)}\n\n"
 
-    return StreamingResponse(stream_content(), media_type="text/event-stream")
+    return StreamingResponse(tracing.traced_iter("vlm.stream", stream_content(), model="GLM-4V-Flash"),
+                             media_type="text/event-stream")
 
 
 # ========================
@@ -223,9 +291,12 @@ async def gen_media(request: Request):
 
     if not prompt or not media_class:
         return JSONResponse({"error": "prompt 和 class 不能为空"}, status_code=400)
+    kind = str(media_class).lower()
+    if kind not in ("image", "video"):
+        return JSONResponse({"error": "class 必须为 image 或 video"}, status_code=400)
 
     try:
-        if media_class.lower() == "image":
+        if kind == "image":
             completion = client.images.generate(
                 model="Cogview-3-Flash",
                 prompt=prompt,
@@ -235,7 +306,7 @@ async def gen_media(request: Request):
             media_logger.info(f"生成图像: {url}")
             return JSONResponse({"type": "image", "url": url})
 
-        elif media_class.lower() == "video":
+        else:
             from zai import ZhipuAiClient
             zclient = ZhipuAiClient(api_key=API_KEY)
             response = zclient.videos.generations(
@@ -262,15 +333,16 @@ async def gen_media(request: Request):
                     media_logger.info(f"视频生成成功: {url}")
                     return JSONResponse({"type": "video", "url": url})
                 elif status in ("FAILURE", "FAILED"):
+                    tracing.record_upstream_error("video")
                     return JSONResponse({"error": "视频生成失败"}, status_code=500)
                 time.sleep(interval)
                 elapsed += interval
 
+            tracing.record_upstream_error("video")
             return JSONResponse({"error": "超时，视频生成未完成"}, status_code=504)
-        else:
-            return JSONResponse({"error": "class 必须为 image 或 video"}, status_code=400)
 
     except Exception as e:
+        tracing.record_upstream_error(kind, e)
         media_logger.error(traceback.format_exc())
         return JSONResponse({"error": f"生成异常: {str(e)}"}, status_code=500)
 
@@ -279,306 +351,151 @@ async def gen_media(request: Request):
 # 5. 剪映工程生成接口
 # ========================
 import pyJianYingDraft as draft
-from pyJianYingDraft import IntroType, TransitionType, FilterType, MaskType, trange, tim
-import pyttsx3
-from pydub import AudioSegment
+from tts_stage import TTSStage
+from pipeline import Pipeline, PipelineEngine
+import jianying_stages  # noqa: F401  注册流水线阶段
+
+# TTS 进程池，每个 worker 复用一个 pyttsx3 引擎
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", 3))
+FFMPEG_PATH = r".\ffmpeg\bin\ffmpeg.exe"  # 修改为本地 ffmpeg 路径
+tts_stage = TTSStage(max_workers=TTS_WORKERS, converter=FFMPEG_PATH)
+
+
+# 共享下载器（连接池复用、大文件分段并行、断点续传）
+downloader = Downloader()
+
+# 声明式生成流水线
+PIPELINE_DIR = os.path.join(os.path.dirname(__file__), "pipelines")
+DEFAULT_PIPELINE = "three_segments"
+MATERIAL_DIR = os.path.join(os.path.dirname(__file__), "material")  # 公共兜底素材（只读）
+MEDIA_CACHE_DIR = os.path.join(CACHE_DIR, "media")  # 生成的视频/语音，按输入内容缓存
+pipeline_engine = PipelineEngine(os.path.join(CACHE_DIR, "stages"), log=jianying_logger.info)
+# 缓存素材之后可能被清理，不能使用软链接
+DRAFT_PLACEMENT = (draft.PlacementMethod.reflink, draft.PlacementMethod.hardlink, draft.PlacementMethod.copy)
+
+workspace_gc = WorkspaceGC(JIAN_YING_PATH, max_age=WORKSPACE_MAX_AGE, log=jianying_logger.info)
+
+
+@app.on_event("startup")
+def _start_workspace_gc():
+    workspace_gc.start()
+
+
+@app.on_event("shutdown")
+def _shutdown_tts_stage():
+    tts_stage.shutdown()
+    workspace_gc.stop()
+
+
 app.mount("/downloads", StaticFiles(directory=TEMP_DOWNLOAD_DIR), name="downloads")
+zip_cache = (ZipCache(os.path.join(TEMP_DOWNLOAD_DIR, "zip_cache"), max_bytes=DRAFT_ZIP_CACHE_MAX_BYTES)
+             if DRAFT_ZIP_CACHE else None)
+
+
+@app.get("/drafts/{draft_name}.zip")
+async def download_draft(draft_name: str):
+    """
+    流式下载草稿 ZIP，边打包边发送
+    CMD 示例：
+    curl -o demo.zip "http://127.0.0.1:8000/drafts/demo_three_dynamic.zip"
+    """
+    # 只允许草稿根目录下的直接子目录："."、".." 以及隐藏/暂存目录一律拒绝
+    draft_root = os.path.realpath(JIAN_YING_PATH)
+    draft_path = os.path.realpath(os.path.join(draft_root, draft_name))
+    if (draft_name in {".", ".."} or draft_name.startswith(".")
+            or os.path.dirname(draft_path) != draft_root or not os.path.isdir(draft_path)):
+        return JSONResponse({"error": "草稿不存在"}, status_code=404)
+
+    filename = f"{draft_name}.zip"
+    headers = {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"}
+    if zip_cache is None:
+        return StreamingResponse(tracing.traced_iter("draft.zip", iter_zip(draft_path), cache="off"),
+                                 media_type="application/zip", headers=headers)
+
+    key = draft_fingerprint(draft_path)
+    cached = zip_cache.lookup(key)
+    if cached:
+        jianying_logger.info(f"命中 ZIP 缓存: {cached}")
+        return FileResponse(cached, media_type="application/zip", filename=filename)
+    stream = tracing.traced_iter("draft.zip", zip_cache.tee(key, iter_zip(draft_path)), cache="miss")
+    return StreamingResponse(stream, media_type="application/zip", headers=headers)
+
 
 @app.post("/chat_jianying")
 async def chat_jianying(request: Request):
     """
-    剪映工程自动生成接口（固定素材本地化）
+    剪映工程自动生成接口（每个请求独立工作区，可并发）
+    按声明式流水线生成，可选参数：
+    - pipeline: 流水线名称（pipelines/ 下的文件名）或完整描述
+    - segments: 段数，覆盖流水线中的默认值
+    - cache: 为 false 时所有阶段重新执行
+    - variables: 覆盖流水线变量（如 {"project_name": "需求内容"}），草稿目录仍按 project_name 参数命名
     CMD 示例：
     curl -X POST "http://127.0.0.1:8000/chat_jianying" ^
          -H "Content-Type: application/json" ^
-         -d "{\"project_name\":\"demo_three\"}"
+         -d "{\"project_name\":\"demo_three\",\"segments\":5}"
     """
     try:
         body = await request.json()
-        project_name = body.get("project_name", "demo_three")
-        jianying_logger.info(f"生成项目: {project_name}")
-
-        client = OpenAI(base_url=BASE_URL, api_key=API_KEY)
-        # ========== 一、路径设置 ==========
-        draft_root = r"D:\JianyingPro Drafts"
-        draft_name = "demo_three_dynamic"
-        draft_folder = draft.DraftFolder(draft_root)
-        
-        # 素材源文件夹（确保这里有真实视频文件）
-        material_src = os.path.join(os.path.dirname(__file__), "material")
-        assert os.path.exists(material_src), f"未找到素材文件夹: {material_src}"
-        
-        jianying_logger.info(project_name)
-        context=project_name
-        query = f"""
-        请
-        根据 {context}
-        生成
-        三段文本，用于视频示例，每段一句话。
-        要求：
-        1. 输出 JSON 数组。
-        示例输出：
-        [
-            "欢迎使用 pyJianYingDraft！",
-            "这是一个自动生成的视频示例。",
-            "如果对你有帮助，请给个 Star 支持一下！"
-        ]
-        """
-        jianying_logger.info(query)
-        messages = [
-            {"role": "user", "content": query}
-        ]
-        
-        res = client.chat.completions.create(
-            model="GLM-4.5-Flash",
-            messages=messages,
-            stream=False,
-            extra_body={
-                "thinking": {"type": "disabled"},
-                "chat_template_kwargs": {"enable_thinking": False}
-            },
-        )
-        
-        content = res.choices[0].message.content.strip()
-        
-        # 去掉可能的 ```json 或 ``` 代码块标记
-        if content.startswith("```"):
-            content = "\n".join(content.split("\n")[1:])  # 去掉第一行 ```
-        if content.endswith("```"):
-            content = "\n".join(content.split("\n")[:-1])  # 去掉最后一行 ```
-        
-        # 尝试解析 JSON
-        try:
-            texts = json.loads(content)
-        except json.JSONDecodeError:
-            # 如果还不行，则按行拆分有效行
-            lines = [line.strip() for line in content.split("\n") if line.strip() and not line.strip().startswith("[") and not line.strip().startswith("]")]
-            texts = [line.rstrip(",").strip() for line in lines]
-        
-        jianying_logger.info(texts)
-        
-        
-        # ========== 初始化客户端 ==========
-        from zai import ZhipuAiClient
-        import time
-        import requests
-        zclient = ZhipuAiClient(api_key=API_KEY)
-        
-        # ========== 生成视频 ==========
-        for idx, prompt in enumerate(texts, start=1):
-            jianying_logger.info(f"开始生成第 {idx} 个视频，prompt: {prompt}")
-            try:
-                response = zclient.videos.generations(
-                    model="CogVideoX-Flash",
-                    prompt=prompt,
-                    quality="quality",  # 可根据需要修改
-                    with_audio=True,
-                    size="1920x1080",
-                    fps=30,
-                    watermark_enabled=False,
-                )
-        
-                video_id = response.id
-                jianying_logger.info(f"视频任务开始 ID: {video_id}")
-        
-                # 等待生成完成
-                timeout, interval, elapsed = 300, 5, 0
-                video_url = None
-                while elapsed < timeout:
-                    result = zclient.videos.retrieve_videos_result(id=video_id)
-                    status = getattr(result, "task_status", None)
-                    jianying_logger.info(f"任务状态: {status}")
-        
-                    if status == "SUCCESS":
-                        video_url = result.video_result[0].url
-                        jianying_logger.info(f"视频生成成功: {video_url}")
-                        break
-                    elif status in ("FAILURE", "FAILED"):
-                        jianying_logger.info(f"视频生成失败, prompt: {prompt}")
-                        break
-        
-                    time.sleep(interval)
-                    elapsed += interval
-        
-                if video_url:
-                    # 下载视频到 material_src
-                    video_path = os.path.join(material_src, f"video{idx}.mp4")
-                    r = requests.get(video_url, stream=True)
-                    with open(video_path, "wb") as f:
-                        for chunk in r.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                    jianying_logger.info(f"视频保存成功: {video_path}")
-        
-            except Exception as e:
-                jianying_logger.info(f"生成视频出现异常: {e}")
-                
-        # ========== 二、创建草稿 ==========
-        script = draft_folder.create_draft(draft_name, 1920, 1080, allow_replace=True)
-        
-        # 获取草稿路径
-        draft_path = None
-        for attr in ["path", "folder", "draft_path"]:
-            draft_path = getattr(script, attr, None)
-            if draft_path:
-                break
-        if draft_path is None:
-            draft_path = os.path.join(draft_root, draft_name)
-        
-        jianying_logger.info(f"草稿路径: {draft_path}")
-        
-        # 草稿内部素材目录
-        material_dst = os.path.join(draft_path, "material")
-        os.makedirs(material_dst, exist_ok=True)
-        
-        # 拷贝素材
-
-        for filename in os.listdir(material_src):
-            src_file = os.path.join(material_src, filename)
-            dst_file = os.path.join(material_dst, filename)
-            if os.path.isfile(src_file):
-                shutil.copy2(src_file, dst_file)
-        jianying_logger.info(f"✅ 素材已复制到草稿目录: {material_dst}")
-        
-        # 视频素材路径
-        video_files = [
-            os.path.join(material_dst, "video1.mp4"),
-            os.path.join(material_dst, "video2.mp4"),
-            os.path.join(material_dst, "video3.mp4"),
-        ]
-        for vf in video_files:
-            assert os.path.exists(vf), f"视频文件不存在: {vf}"
-        # ========== 四、生成三段音频（TTS） ==========
-        AudioSegment.converter = r".\ffmpeg\bin\ffmpeg.exe"  # 修改为本地 ffmpeg 路径
-        
-        def generate_audio(text: str, filename: str) -> str:
-            wav_file = filename.replace(".mp3", ".wav")
-            engine = pyttsx3.init()
-            engine.save_to_file(text, wav_file)
-            engine.runAndWait()
-            audio = AudioSegment.from_wav(wav_file)
-            audio.export(filename, format="mp3")
-            return filename
-        
-        audio_files = [
-            generate_audio(texts[0], os.path.join(material_dst, "audio1.mp3")),
-            generate_audio(texts[1], os.path.join(material_dst, "audio2.mp3")),
-            generate_audio(texts[2], os.path.join(material_dst, "audio3.mp3")),
-        ]
-        
-        # ========== 五、添加轨道和拼接内容 ==========
-        script.add_track(draft.TrackType.audio).add_track(draft.TrackType.video).add_track(draft.TrackType.text)
-        audio1_path = generate_audio(texts[0], os.path.join(material_dst, "audio1.mp3"))
-        audio2_path = generate_audio(texts[1], os.path.join(material_dst, "audio2.mp3"))
-        audio3_path = generate_audio(texts[2], os.path.join(material_dst, "audio3.mp3"))
-        # 视频素材路径
-        video1_path = os.path.join(material_dst, "video1.mp4")
-        video2_path = os.path.join(material_dst, "video2.mp4")
-        video3_path = os.path.join(material_dst, "video3.mp4")
-        
-        # 视频段
-        video1 = draft.VideoSegment(video1_path, trange("0s", "5s"))
-        video1.add_transition(TransitionType.叠化)
-        video1.add_filter(FilterType.冬漫, intensity=50.0)
-        script.add_segment(video1)
-        
-        video2 = draft.VideoSegment(video2_path, trange(video1.end, tim("5s")))
-        video2.add_background_filling("blur", 0.5)
-        video2.add_mask(MaskType.爱心, center_x=0.5, center_y=0.5, size=0.5, rotation=0.0, feather=0.0, invert=False)
-        video2.add_transition(TransitionType.闪黑)
-        script.add_segment(video2)
-        
-        video3 = draft.VideoSegment(video3_path, trange(video2.end, tim("5s")))
-        script.add_segment(video3)
-        
-        # 音频段
-        audio1 = draft.AudioSegment(audio1_path, trange("0s", "3s"), volume=0.6)
-        audio1.add_fade("1s", "0.5s")
-        script.add_segment(audio1)
-        
-        audio2 = draft.AudioSegment(audio2_path, trange(video1.end, tim("3s")), volume=0.6)
-        script.add_segment(audio2)
-        
-        audio3 = draft.AudioSegment(audio3_path, trange(video2.end, tim("3s")), volume=0.6)
-        script.add_segment(audio3)
-        
-        # 文字段
-        text1 = draft.TextSegment(
-            texts[0],
-            trange("0s", "5s"),
-            font=draft.FontType.文轩体,
-            clip_settings=draft.ClipSettings(transform_y=-0.8)
-        )
-        text1.add_animation(draft.TextIntro.向上滑动, duration=tim("1s"))
-        text1.add_animation(draft.TextOutro.右上弹出, duration=tim("1s"))
-        script.add_segment(text1)
-        
-        text2 = draft.TextSegment(
-            texts[1],
-            trange(video1.end, tim("5s")),
-            font=draft.FontType.文轩体,
-            clip_settings=draft.ClipSettings(transform_y=-0.8)
-        )
-        script.add_segment(text2)
-        
-        text3 = draft.TextSegment(
-            texts[2],
-            trange(video2.end, tim("5s")),
-            font=draft.FontType.文轩体,
-            clip_settings=draft.ClipSettings(transform_y=-0.8)
-        )
-        text3.add_animation(draft.TextLoopAnim.色差故障)
-        script.add_segment(text3)
-        
-        # ========== 六、保存草稿 ==========
-        script.save()
-        jianying_logger.info(f"✅ 草稿已保存: {draft_path}")
-        
-        # ========== 七、修正 JSON 素材路径 ==========
-        draft_json_path = os.path.join(draft_path, "draft_content.json")
-        if os.path.exists(draft_json_path):
-            with open(draft_json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        
-            def fix_path(obj):
-                if isinstance(obj, dict):
-                    for k, v in obj.items():
-                        if k == "path" and isinstance(v, str) and v.strip():
-                            filename = os.path.basename(v)
-                            new_path = os.path.join(material_dst, filename)
-                            obj[k] = new_path.replace("\\", "\\\\")
-                        elif isinstance(v, (dict, list)):
-                            fix_path(v)
-                elif isinstance(obj, list):
-                    for item in obj:
-                        fix_path(item)
-        
-            fix_path(data)
-            with open(draft_json_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-            jianying_logger.info(f"✅ 草稿 JSON 素材路径已更新: {material_dst}")
-        else:
-            jianying_logger.info("⚠️ 未找到 draft_content.json 文件")
-        
-        jianying_logger.info("🎬 全流程执行完毕！")
-
-
-
-
-        # ========== 六、生成 ZIP ==========
-        zip_path = os.path.join(TEMP_DOWNLOAD_DIR, f"{draft_name}.zip")
-        if os.path.exists(zip_path):
-            os.remove(zip_path)
-        shutil.make_archive(zip_path.replace(".zip", ""), "zip", draft_path)
-
-        url = f"{DOWNLOAD_BASE_URL}/{os.path.basename(zip_path)}"
-        jianying_logger.info(f"生成完成: {url}")
-        return JSONResponse({"download_url": url})
-
+        # 生成过程均为阻塞调用，放到线程池执行，多个任务互不阻塞
+        return await run_in_threadpool(_generate_draft, body)
     except Exception as e:
         jianying_logger.error(traceback.format_exc())
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+def _generate_draft(body: dict) -> JSONResponse:
+    """在独立工作区中按流水线生成一份草稿，完成后原子改名为最终草稿"""
+    project_name = body.get("project_name", "demo_three")
+    jianying_logger.info(f"生成项目: {project_name}")
+
+    # 流水线：请求中直接给出描述，或按名称使用 pipelines/ 下的描述文件
+    if isinstance(body.get("pipeline"), dict):
+        pipeline = Pipeline(body["pipeline"])
+    else:
+        pipeline_name = os.path.basename(body.get("pipeline") or DEFAULT_PIPELINE)
+        pipeline = Pipeline.load(os.path.join(PIPELINE_DIR, f"{pipeline_name}.json"))
+
+    variables = {"project_name": project_name}
+    if body.get("segments"):
+        variables["segments"] = int(body["segments"])
+    # 覆盖流水线中的其他变量，如用需求内容作为 project_name 主题
+    if isinstance(body.get("variables"), dict):
+        variables.update(body["variables"])
+
+    draft_folder = draft.DraftFolder(JIAN_YING_PATH, placement=DRAFT_PLACEMENT)
+    with JobWorkspace(JIAN_YING_PATH, project_name) as ws:
+        jianying_logger.info(f"任务 {ws.job_id} 草稿名: {ws.draft_name}")
+        ctx = {
+            "cached_client": cached_client,
+            "chat_model": CHAT_MODEL,
+            "extra_body": NO_THINKING,
+            "use_cache": body.get("cache", True),
+            "api_key": API_KEY,
+            "downloader": downloader,
+            "tts_stage": tts_stage,
+            "media_cache_dir": MEDIA_CACHE_DIR,
+            "fallback_material_dir": MATERIAL_DIR,
+            "draft_folder": draft_folder,
+            "workspace": ws,
+            "log": jianying_logger.info,
+        }
+        outputs = pipeline_engine.run(pipeline, variables, ctx, use_cache=body.get("cache", True))
+        ws.commit()
+        jianying_logger.info(f"✅ 草稿已提交: {ws.final_path}")
+        jianying_logger.info("🎬 全流程执行完毕！")
+
+    # 返回流式下载地址（下载时边打包边发送）
+    url = f"{DRAFT_DOWNLOAD_BASE_URL}/{quote(ws.draft_name)}.zip"
+    jianying_logger.info(f"生成完成: {url}")
+    return JSONResponse({
+        "download_url": url,
+        "draft_name": ws.draft_name,
+        "job_id": ws.job_id,
+        "texts": outputs.get("texts"),
+    })
+
+
 
 # ========================
 # 启动入口
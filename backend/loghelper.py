@@ -1,22 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+日志工具
+包含：
+1. AppLogger：调用线程只把记录放入队列，由 QueueListener 后台线程格式化并写盘
+2. JsonFormatter：每行一个 JSON 对象（time, level, module, line, logger, trace_id, message, exc）
+3. 按大小或按时间轮转；多进程部署时每个进程写自己的文件（文件名带 PID），各自轮转
+4. 超长内容（完整消息列表、大模型输出等）截断，可按比例抽样保留全文
+"""
+
+import os
+import json
+import queue
+import random
+import atexit
 import logging
+import logging.handlers
+from typing import Iterable, Optional
+
+# 默认配置
+MAX_BYTES = 50 * 1024 * 1024
+BACKUP_COUNT = 10
+MAX_MESSAGE_CHARS = 4000
+TEXT_FORMAT = "%(asctime)-15s %(levelname)s %(filename)s %(lineno)d %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON Lines 格式，time 与旧文本格式的 asctime 保持一致，便于 logview 解析"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "module": record.filename,
+            "line": record.lineno,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", None),
+            "message": record.getMessage(),
+        }
+        if getattr(record, "truncated", None):
+            data["truncated"] = record.truncated
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """在调用线程中只做必要的工作：合并消息参数、截断超长内容、格式化异常栈"""
+
+    def __init__(self, log_queue: queue.Queue, max_chars: int, sample_rate: float):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+        self.sample_rate = sample_rate
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        message = record.getMessage()
+        if self.max_chars and len(message) > self.max_chars and random.random() >= self.sample_rate:
+            # 保留首尾，中间省略
+            head = self.max_chars * 3 // 4
+            tail = self.max_chars - head
+            record.truncated = len(message)
+            message = f"{message[:head]} ...<省略 {len(message) - head - tail} 字符>... {message[-tail:]}"
+        record.msg, record.args = message, None
+        if record.exc_info:
+            # 异常对象持有栈帧，不放进队列
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
 class AppLogger:
-    def __init__(self, moduleName, logfile=None):
+    def __init__(self, moduleName, logfile=None, *, rotate: str = "size", max_bytes: int = MAX_BYTES,
+                 backup_count: int = BACKUP_COUNT, when: str = "midnight",
+                 max_message_chars: int = MAX_MESSAGE_CHARS, sample_rate: float = 0.0,
+                 filters: Iterable[logging.Filter] = (), level: int = logging.INFO, per_process: bool = False):
+        """
+        Args:
+            moduleName: logger 名称
+            logfile: 日志文件，为 None 时输出到终端（文本格式）
+            rotate: "size" 按大小轮转，"time" 按时间轮转
+            max_bytes: 按大小轮转时单个文件上限
+            backup_count: 保留的历史文件数
+            when: 按时间轮转的周期，同 TimedRotatingFileHandler
+            max_message_chars: 单条消息最大字符数，0 表示不截断
+            sample_rate: 超长消息保留全文的比例
+            filters: 在调用线程中执行的过滤器（如注入 trace_id）
+            per_process: 文件名加上进程号（chat.log -> chat.<pid>.log）。
+                RotatingFileHandler 不支持多个进程轮转同一个文件，uvicorn 多 worker 时必须开启
+        """
         self._logger = logging.getLogger(moduleName)
-        fmt = "%(asctime)-15s %(levelname)s %(filename)s %(lineno)d %(message)s"
-        formatter = logging.Formatter(fmt)
         self._logger.handlers.clear()  # 清除旧的handler，防止重复输出
 
         if logfile:
-            handler = logging.FileHandler(logfile)
+            if per_process:
+                root, ext = os.path.splitext(logfile)
+                logfile = f"{root}.{os.getpid()}{ext}"
+            self.logfile = logfile
+            if rotate == "time":
+                handler = logging.handlers.TimedRotatingFileHandler(
+                    logfile, when=when, backupCount=backup_count, encoding="utf-8")
+            else:
+                handler = logging.handlers.RotatingFileHandler(
+                    logfile, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(JsonFormatter())
         else:
+            self.logfile = None
             handler = logging.StreamHandler()  # 输出到终端
+            handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        log_queue: queue.Queue = queue.Queue(-1)
+        queue_handler = _QueueHandler(log_queue, max_message_chars, sample_rate)
+        for f in filters:
+            queue_handler.addFilter(f)
+        self._listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self.close)
 
-        handler.setFormatter(formatter)
-        self._logger.addHandler(handler)
-        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(queue_handler)
+        self._logger.setLevel(level)
+        self._logger.propagate = False
 
         self.warning = self._logger.warning
         self.error = self._logger.error
         self.info = self._logger.info
-        self.debug = self._logger.debug
\ No newline at end of file
+        self.debug = self._logger.debug
+
+    def close(self) -> None:
+        """写完队列中剩余的记录并停止后台线程"""
+        listener: Optional[logging.handlers.QueueListener] = self._listener
+        if listener is not None:
+            self._listener = None
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
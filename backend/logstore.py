@@ -0,0 +1,569 @@
+# -*- coding: utf-8 -*-
+"""
+日志增量入库（供 logview.py 使用）
+包含：
+1. 按文件记录已读取的字节偏移，每次只解析新增的完整行
+2. 文件被轮转或截断时（inode / 文件头变化、变小）从头重新读取
+3. SQLite 存储，(文件, 时间)、(文件, 级别, 时间) 索引
+4. 按筛选条件查询，只取需要的窗口；计数在 SQL 中聚合
+5. 向量化解析：整块文本用 Series.str.extract 解析，多行异常栈并入上一条记录
+6. 入库时维护按分钟 / 小时、级别、模块的计数汇总表，图表按窗口自适应分桶
+7. 关键词搜索使用 FTS5 全文索引（trigram 分词，支持中文子串）
+8. TailBuffer：实时跟踪，只取新增记录，内存中用定长环形缓冲区保存
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import calendar
+import threading
+import re
+from io import StringIO
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+READ_CHUNK = 8 * 1024 * 1024
+HEAD_BYTES = 256
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
+
+# 文本日志格式（旧格式，可带 trace id）
+# 2025-10-20 14:54:16,219 INFO server.py 220 [3f2a...] 生成任务: 星球大战, 类型: image
+LINE_PATTERN = re.compile(
+    r"(?P<time>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+)\s+"
+    r"(?P<level>\w+)\s+"
+    r"(?P<module>[\w\.]+)\s+"
+    r"(?P<line>\d+)\s+"
+    r"(?:\[(?P<trace_id>[\w-]+)\]\s+)?"
+    r"(?P<message>.*)"
+)
+COLUMNS = ("ts", "level", "module", "line", "trace_id", "message")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    inode INTEGER,
+    head TEXT,
+    offset INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    mtime REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    ts REAL NOT NULL,
+    level TEXT,
+    module TEXT,
+    line INTEGER,
+    trace_id TEXT,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_records_file_ts ON records(file, ts);
+CREATE INDEX IF NOT EXISTS idx_records_file_level_ts ON records(file, level, ts);
+CREATE TABLE IF NOT EXISTS rollup_minute (
+    file TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    level TEXT NOT NULL,
+    module TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (file, bucket, level, module)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_hour (
+    file TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    level TEXT NOT NULL,
+    module TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (file, bucket, level, module)
+) WITHOUT ROWID;
+"""
+
+# 外部内容 FTS 表：新增记录在入库时按块批量写入索引（逐行触发器慢数倍），删除和修改由触发器同步
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+    message, content='records', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS records_ad AFTER DELETE ON records BEGIN
+    INSERT INTO records_fts(records_fts, rowid, message) VALUES ('delete', old.id, old.message);
+END;
+CREATE TRIGGER IF NOT EXISTS records_au AFTER UPDATE OF message ON records BEGIN
+    INSERT INTO records_fts(records_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    INSERT INTO records_fts(rowid, message) VALUES (new.id, new.message);
+END;
+"""
+
+SCHEMA_VERSION = 2
+ROLLUPS = (("rollup_minute", 60), ("rollup_hour", 3600))
+# 图表可选的分桶大小（秒），按窗口长度选择使点数不超过 MAX_POINTS 的最小值
+BUCKETS = (60, 300, 900, 3600, 6 * 3600, 86400, 7 * 86400)
+MAX_POINTS = 500
+FTS_MIN_CHARS = 3  # trigram 分词下更短的关键词无法走索引
+
+
+def parse_time(value: str) -> Optional[float]:
+    """日志时间转为秒（按本地时间原样计算，不做时区换算）"""
+    try:
+        return calendar.timegm(datetime.strptime(value, TIME_FORMAT).timetuple()) + \
+            int(value.rsplit(",", 1)[1]) / 1000
+    except (ValueError, IndexError):
+        return None
+
+
+def parse_line(line: str) -> Optional[Tuple]:
+    """解析一行日志，JSON Lines 优先，兼容文本格式；无法解析时返回 None"""
+    if line.startswith("{"):
+        try:
+            r = json.loads(line)
+            ts = parse_time(r.get("time", ""))
+            if ts is not None:
+                message = r.get("message", "")
+                if r.get("exc"):
+                    message = f"{message}\n{r['exc']}"
+                return ts, r.get("level"), r.get("module"), r.get("line"), r.get("trace_id"), message
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    match = LINE_PATTERN.match(line)
+    if match:
+        ts = parse_time(match["time"])
+        if ts is not None:
+            return ts, match["level"], match["module"], int(match["line"]), match["trace_id"], match["message"]
+    return None
+
+
+EPOCH = pd.Timestamp(0)
+
+
+def _json_frame(lines: pd.Series) -> pd.DataFrame:
+    """解析 JSON Lines；整块解析失败（有损坏的行）时逐行解析并跳过坏行"""
+    try:
+        records = pd.read_json(StringIO("\n".join(lines)), lines=True, dtype=False, convert_dates=False)
+        records.index = lines.index
+        return records
+    except ValueError:
+        rows = {}
+        for idx, line in lines.items():
+            try:
+                rows[idx] = json.loads(line)
+            except json.JSONDecodeError:
+                pass
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def parse_frame(text: str) -> "tuple[pd.DataFrame, Optional[str]]":
+    """向量化解析一块日志文本
+
+    不是记录开头的行（多行异常栈等）并入前一条记录。返回 (记录, 开头的续行)，
+    续行属于上一块文本的最后一条记录，为 None 表示没有。
+    """
+    lines = pd.Series(text.splitlines(), dtype=object)
+    if lines.empty:
+        return pd.DataFrame(columns=COLUMNS), None
+
+    is_json = lines.str.startswith("{")
+    parsed = lines.str.extract(LINE_PATTERN)
+    if is_json.any():
+        records = _json_frame(lines[is_json])
+        if "exc" in records:
+            exc = records["exc"].fillna("").astype(str)
+            records["message"] = records["message"].astype(str).where(exc == "", records["message"] + "\n" + exc)
+        parsed.loc[is_json, list(records.columns.intersection(parsed.columns))] = \
+            records[records.columns.intersection(parsed.columns)]
+
+    # 逗号换成小数点后按 ISO8601 解析，比按 TIME_FORMAT 的 strptime 快得多
+    ts = pd.to_datetime(parsed["time"].str.replace(",", ".", regex=False), format="ISO8601", errors="coerce")
+    is_head = ts.notna()
+    # 续行按所在记录分组拼接
+    group = is_head.cumsum()
+    cont = lines[~is_head]
+    leading = None
+    if not cont.empty:
+        joined = cont.groupby(group[~is_head]).agg("\n".join)
+        if 0 in joined.index:
+            leading = joined.pop(0)
+        head_group = group[is_head]
+        extra = head_group.map(joined)
+        has_extra = extra.notna()
+        parsed.loc[extra.index[has_extra], "message"] = \
+            parsed.loc[extra.index[has_extra], "message"].astype(str) + "\n" + extra[has_extra]
+
+    parsed = parsed[is_head]
+    df = pd.DataFrame({
+        "ts": (ts[is_head] - EPOCH) / pd.Timedelta(seconds=1),
+        "level": parsed["level"],
+        "module": parsed["module"],
+        "line": pd.to_numeric(parsed["line"], errors="coerce").astype("Int64"),
+        "trace_id": parsed["trace_id"],
+        "message": parsed["message"],
+    })
+    return df, leading
+
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("gbk", errors="ignore")
+
+
+class LogStore:
+    """日志增量入库与查询，实例可在 Streamlit 的多次重跑之间共享"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        try:
+            self._conn.executescript(_FTS_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError:
+            self._fts = False  # SQLite 未编译 FTS5 / trigram 时退回逐行匹配
+        self._migrate()
+        self._lock = threading.Lock()
+        self._resets: Dict[str, int] = {}
+
+    def _migrate(self) -> None:
+        """旧版本库中已有的记录补建汇总表和全文索引"""
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with self._conn:
+            for table, size in ROLLUPS:
+                self._conn.execute(f"DELETE FROM {table}")
+                self._conn.execute(
+                    f"INSERT INTO {table}(file, bucket, level, module, count) "
+                    f"SELECT file, CAST(ts / {size} AS INTEGER) * {size}, coalesce(level, ''), "
+                    f"coalesce(module, ''), count(*) FROM records GROUP BY 1, 2, 3, 4")
+            if self._fts:
+                self._conn.execute("INSERT INTO records_fts(records_fts) VALUES ('rebuild')")
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # ---------- 入库 ----------
+    @staticmethod
+    def _head(path: str) -> str:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read(HEAD_BYTES)).hexdigest()
+
+    @staticmethod
+    def _rotated_sibling(path: str, inode: int) -> Optional[str]:
+        """RotatingFileHandler 轮转后旧文件改名为 path.1、path.2 ...，按 inode 找到上次读取的那个"""
+        directory, name = os.path.split(os.path.abspath(path))
+        for entry in os.scandir(directory):
+            if entry.name.startswith(name + ".") and entry.name[len(name) + 1:].isdigit():
+                if entry.inode() == inode:
+                    return entry.path
+        return None
+
+    def _rollup(self, key: str, df: pd.DataFrame) -> None:
+        level, module = df["level"].fillna(""), df["module"].fillna("")
+        for table, size in ROLLUPS:
+            bucket = (df["ts"] // size * size).astype("int64")
+            counts = df.groupby([bucket, level, module]).size()
+            self._conn.executemany(
+                f"INSERT INTO {table}(file, bucket, level, module, count) VALUES (?, ?, ?, ?, ?) "
+                f"ON CONFLICT(file, bucket, level, module) DO UPDATE SET count = count + excluded.count",
+                [(key, int(b), lv, m, int(c)) for (b, lv, m), c in counts.items()],
+            )
+
+    def _insert(self, key: str, rows: Sequence[Tuple]) -> None:
+        self._conn.executemany(
+            "INSERT INTO records(file, ts, level, module, line, trace_id, message) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(key, *row) for row in rows],
+        )
+
+    def _parse_chunk(self, key: str, text: str) -> int:
+        df, leading = parse_frame(text)
+        if leading is not None:
+            # 块开头的续行属于已入库的最后一条记录
+            self._conn.execute(
+                "UPDATE records SET message = message || ? "
+                "WHERE id = (SELECT max(id) FROM records WHERE file = ?)", ("\n" + leading, key))
+        if not df.empty:
+            self._rollup(key, df)
+            df = df.astype(object).where(df.notna(), None)
+            last_id = self._conn.execute("SELECT coalesce(max(id), 0) FROM records").fetchone()[0]
+            self._insert(key, list(df.itertuples(index=False, name=None)))
+            if self._fts:
+                self._conn.execute("INSERT INTO records_fts(rowid, message) "
+                                   "SELECT id, message FROM records WHERE id > ?", (last_id,))
+        return len(df)
+
+    def ingest(self, path: str, key: Optional[str] = None) -> int:
+        """读取文件新增的部分并入库，返回新增记录数
+
+        Args:
+            path: 日志文件路径
+            key: 记录所属的文件标识，默认为绝对路径
+        """
+        key = key or os.path.abspath(path)
+        st = os.stat(path)
+        head = self._head(path)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT inode, head, offset, size, mtime FROM files WHERE path = ?",
+                                     (key,)).fetchone()
+            offset, added = 0, 0
+            if row:
+                inode, old_head, offset, size, mtime = row
+                if size == st.st_size and mtime == st.st_mtime:
+                    return 0
+                # 轮转（新文件）或被截断：已入库的记录保留，只把读取位置归零；
+                # 轮转时先从改名后的旧文件读完上次之后写入的部分
+                rotated = inode != st.st_ino
+                if rotated or st.st_size < offset or (old_head != head and offset >= HEAD_BYTES):
+                    sibling = self._rotated_sibling(path, inode) if rotated else None
+                    if sibling is not None:
+                        added, _ = self._read_from(key, sibling, offset)
+                    self._resets[key] = self._resets.get(key, 0) + 1
+                    offset = 0
+
+            more, offset = self._read_from(key, path, offset)
+            added += more
+
+            self._conn.execute(
+                "INSERT INTO files(path, inode, head, offset, size, mtime) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET inode=excluded.inode, head=excluded.head, "
+                "offset=excluded.offset, size=excluded.size, mtime=excluded.mtime",
+                (key, st.st_ino, head, offset, st.st_size, st.st_mtime),
+            )
+        return added
+
+    def _read_from(self, key: str, path: str, offset: int) -> Tuple[int, int]:
+        """从 offset 开始读取完整的行并入库，返回 (新增记录数, 新的读取位置)"""
+        added = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while True:
+                data = f.read(READ_CHUNK)
+                if not data:
+                    break
+                # 只处理完整的行，末尾未写完的行留到下次
+                end = data.rfind(b"\n")
+                if end < 0:
+                    if len(data) < READ_CHUNK:
+                        break
+                    end = len(data) - 1  # 超长的单行整块处理
+                added += self._parse_chunk(key, _decode(data[:end + 1]))
+                offset += end + 1
+                f.seek(offset)
+        return added, offset
+
+    # ---------- 查询 ----------
+    def _where(self, key: str, levels: Optional[Iterable[str]] = None, modules: Optional[Iterable[str]] = None,
+               start: Optional[float] = None, end: Optional[float] = None,
+               keyword: Optional[str] = None, *, time_column: str = "ts") -> Tuple[str, List[Any]]:
+        clauses, args = ["file = ?"], [key]
+        for column, values in (("level", levels), ("module", modules)):
+            if values is not None:
+                values = list(values)
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})" if values else "0")
+                args.extend(values)
+        if start is not None:
+            clauses.append(f"{time_column} >= ?")
+            args.append(start)
+        if end is not None:
+            clauses.append(f"{time_column} < ?")
+            args.append(end)
+        if keyword:
+            if self._fts and len(keyword) >= FTS_MIN_CHARS:
+                clauses.append("id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)")
+                args.append('"' + keyword.replace('"', '""') + '"')
+            else:
+                clauses.append("instr(lower(message), lower(?)) > 0")
+                args.append(keyword)
+        return " AND ".join(clauses), args
+
+    def _rollup_where(self, key: str, size: int, start: Optional[float] = None,
+                      end: Optional[float] = None, **filters) -> Tuple[str, List[Any]]:
+        """汇总表的筛选条件，时间按桶对齐"""
+        if start is not None:
+            start = start // size * size
+        return self._where(key, start=start, end=end, time_column="bucket", **filters)
+
+    def _read(self, sql: str, args: Sequence[Any]) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=list(args))
+
+    def distinct(self, key: str, column: str) -> List[str]:
+        """某一列（level / module）的所有取值"""
+        assert column in ("level", "module")
+        with self._lock:
+            rows = self._conn.execute(f"SELECT DISTINCT {column} FROM rollup_hour WHERE file = ? ORDER BY 1",
+                                      (key,)).fetchall()
+        return [r[0] for r in rows if r[0]]
+
+    def time_range(self, key: str) -> Tuple[Optional[float], Optional[float]]:
+        with self._lock:
+            return self._conn.execute("SELECT min(ts), max(ts) FROM records WHERE file = ?", (key,)).fetchone()
+
+    def query(self, key: str, *, limit: int = 5000, offset: int = 0, **filters) -> pd.DataFrame:
+        """按筛选条件取记录，最新的在前"""
+        where, args = self._where(key, **filters)
+        df = self._read(f"SELECT {', '.join(COLUMNS)} FROM records WHERE {where} "
+                        f"ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?", args + [limit, offset])
+        df["time"] = pd.to_datetime(df.pop("ts"), unit="s").dt.round("ms")
+        return df
+
+    def count(self, key: str, **filters) -> int:
+        if filters.get("keyword"):
+            where, args = self._where(key, **filters)
+            sql = f"SELECT count(*) FROM records WHERE {where}"
+        else:
+            where, args = self._rollup_where(key, 60, **filters)
+            sql = f"SELECT coalesce(sum(count), 0) FROM rollup_minute WHERE {where}"
+        with self._lock:
+            return self._conn.execute(sql, args).fetchone()[0]
+
+    def choose_bucket(self, key: str, start: Optional[float] = None, end: Optional[float] = None,
+                      max_points: int = MAX_POINTS) -> int:
+        """按窗口长度选择分桶大小（秒）"""
+        first, last = self.time_range(key)
+        if first is None:
+            return BUCKETS[0]
+        span = min(end if end is not None else last, last) - max(start if start is not None else first, first)
+        for bucket in BUCKETS:
+            if span / bucket <= max_points:
+                return bucket
+        return BUCKETS[-1]
+
+    def count_by_time(self, key: str, bucket: int = 60, **filters) -> pd.DataFrame:
+        """按 bucket 秒分桶计数，返回 time, count；无关键词时从汇总表聚合"""
+        if filters.get("keyword"):
+            where, args = self._where(key, **filters)
+            sql = (f"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, count(*) AS count FROM records "
+                   f"WHERE {where} GROUP BY 1 ORDER BY 1")
+        else:
+            table, size = ROLLUPS[1] if bucket % 3600 == 0 else ROLLUPS[0]
+            where, args = self._rollup_where(key, size, **filters)
+            sql = (f"SELECT bucket / ? * ? AS bucket, sum(count) AS count FROM {table} "
+                   f"WHERE {where} GROUP BY 1 ORDER BY 1")
+        df = self._read(sql, [bucket, bucket] + args)
+        df["time"] = pd.to_datetime(df.pop("bucket"), unit="s")
+        return df
+
+    def count_by(self, key: str, column: str, **filters) -> pd.DataFrame:
+        """按 level / module 分组计数"""
+        assert column in ("level", "module")
+        if filters.get("keyword"):
+            where, args = self._where(key, **filters)
+            sql = f"SELECT {column}, count(*) AS count FROM records WHERE {where} GROUP BY 1 ORDER BY 2 DESC"
+        else:
+            where, args = self._rollup_where(key, 60, **filters)
+            sql = f"SELECT {column}, sum(count) AS count FROM rollup_minute WHERE {where} GROUP BY 1 ORDER BY 2 DESC"
+        return self._read(sql, args)
+
+    # ---------- 实时跟踪 ----------
+    def reset_count(self, key: str) -> int:
+        """文件被轮转 / 截断而重新读取的次数（本进程内）"""
+        return self._resets.get(key, 0)
+
+    def tail(self, key: str, after_id: int = 0, limit: int = 1000) -> pd.DataFrame:
+        """取 id 大于 after_id 的最新 limit 条记录，按 id 升序"""
+        df = self._read(f"SELECT id, {', '.join(COLUMNS)} FROM records WHERE file = ? AND id > ? "
+                        f"ORDER BY id DESC LIMIT ?", [key, after_id, limit])
+        df = df.iloc[::-1].reset_index(drop=True)
+        df["time"] = pd.to_datetime(df.pop("ts"), unit="s").dt.round("ms")
+        return df
+
+    def counts_after(self, key: str, after_id: int, bucket: int = 60,
+                     until_id: Optional[int] = None) -> List[Tuple[int, str, int]]:
+        """id 在 (after_id, until_id] 内的记录按 (时间桶, 级别) 计数，until_id 为 None 表示不设上限"""
+        sql = ("SELECT CAST(ts / ? AS INTEGER) * ?, coalesce(level, ''), count(*) FROM records "
+               "WHERE id > ? AND file = ?")
+        args: List[Any] = [bucket, bucket, after_id, key]
+        if until_id is not None:
+            sql += " AND id <= ?"
+            args.append(until_id)
+        with self._lock:
+            return self._conn.execute(sql + " GROUP BY 1, 2", args).fetchall()
+
+    def counts_since(self, key: str, start: float, bucket: int = 60) -> List[Tuple[int, str, int]]:
+        """从汇总表取 start 之后按 (时间桶, 级别) 的计数，bucket 须为 60 的整数倍"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT bucket / ? * ?, level, sum(count) FROM rollup_minute "
+                "WHERE file = ? AND bucket >= ? GROUP BY 1, 2", (bucket, bucket, key, start)).fetchall()
+
+
+class TailBuffer:
+    """实时跟踪一个日志文件
+
+    每次 poll 只解析文件新增的字节、只从库中取新增的记录；
+    最近的记录与按分钟计数都保存在定长缓冲区中，长时间打开内存也不会增长。
+    """
+
+    def __init__(self, store: LogStore, path: str, key: Optional[str] = None, *,
+                 max_rows: int = 2000, max_buckets: int = 180, bucket: int = 60):
+        """
+        Args:
+            store: 日志库
+            path: 日志文件路径
+            key: 记录所属的文件标识，默认为绝对路径
+            max_rows: 保留的最近记录数
+            max_buckets: 保留的计数时间桶个数
+            bucket: 计数时间桶大小（秒）
+        """
+        self.store = store
+        self.path = path
+        self.key = key or os.path.abspath(path)
+        self.bucket = bucket
+        self.max_buckets = max_buckets
+        self.rows: deque = deque(maxlen=max_rows)
+        self.counts: "OrderedDict[int, Counter]" = OrderedDict()
+        self.last_id = 0
+        self._resets = -1  # 首次 poll 时从库中回填
+
+    def _backfill(self) -> None:
+        self.rows.clear()
+        self.counts.clear()
+        df = self.store.tail(self.key, 0, self.rows.maxlen)
+        self.rows.extend(df.to_dict("records"))
+        # 计数只回填最近 max_buckets 个桶
+        last = self.store.time_range(self.key)[1]
+        if last is not None:
+            start = (last // self.bucket - self.max_buckets + 1) * self.bucket
+            for t, level, count in self.store.counts_since(self.key, start, self.bucket):
+                self.counts.setdefault(t, Counter())[level] += count
+        self.last_id = int(df["id"].iloc[-1]) if len(df) else 0
+
+    def poll(self) -> int:
+        """读取新增内容，返回新增记录数"""
+        self.store.ingest(self.path, self.key)
+        resets = self.store.reset_count(self.key)
+        if resets != self._resets:
+            self._resets = resets
+            self._backfill()
+            return len(self.rows)
+
+        new = self.store.tail(self.key, self.last_id, self.rows.maxlen)
+        if new.empty:
+            return 0
+        # 计数按库中全部新增记录统计，突发写入超过 max_rows 时也不会少算；
+        # 上限取本次 tail 的最大 id，两次查询之间其他进程写入的记录留到下次 poll 再计数
+        new_last_id = int(new["id"].iloc[-1])
+        added = 0
+        for t, level, count in self.store.counts_after(self.key, self.last_id, self.bucket, until_id=new_last_id):
+            self.counts.setdefault(t, Counter())[level] += count
+            added += count
+        self.rows.extend(new.to_dict("records"))
+        self.last_id = new_last_id
+
+        # 丢弃最旧的时间桶
+        if len(self.counts) > self.max_buckets:
+            for t in sorted(self.counts)[:len(self.counts) - self.max_buckets]:
+                del self.counts[t]
+        return added
+
+    def frame(self) -> pd.DataFrame:
+        """最近的记录，最新的在前"""
+        return pd.DataFrame(list(reversed(self.rows)), columns=["id", "time", *COLUMNS[1:]])
+
+    def count_frame(self) -> pd.DataFrame:
+        """按时间桶和级别的计数，列为 time, level, count"""
+        data = [(t, level, n) for t, counter in self.counts.items() for level, n in counter.items()]
+        df = pd.DataFrame(data, columns=["time", "level", "count"]).sort_values("time")
+        df["time"] = pd.to_datetime(df["time"], unit="s")
+        return df
@@ -1,9 +1,11 @@
 # log_viewer.py
+import os
 import re
-import pandas as pd
+import hashlib
+from datetime import datetime, time as dtime, timezone
 import streamlit as st
 import plotly.express as px
-import os
+from logstore import LogStore, TailBuffer
 
 # ----------------------
 # 页面标题
@@ -11,6 +13,22 @@ import os
 st.set_page_config(page_title="日志可视化", layout="wide")
 st.title("🧩 Python 日志可视化工具")
 
+# 日志增量入库：只解析上次读取位置之后新增的内容，筛选在 SQLite 中完成
+STORE_PATH = os.environ.get("LOGVIEW_DB", os.path.join(os.path.dirname(__file__), "cache", "logview.sqlite3"))
+UPLOAD_DIR = os.path.join(os.path.dirname(STORE_PATH), "logview_uploads")
+PAGE_SIZES = [50, 100, 500, 1000]  # 表格分页，每页行数
+TAIL_ROWS = 2000  # 实时跟踪保留的最近记录数
+TAIL_BUCKETS = 180  # 实时跟踪保留的分钟数
+LOG_FILE_PATTERN = re.compile(r"\.(log|txt)(\.\d+)?$")  # 日志文件及其轮转文件
+
+
+@st.cache_resource
+def get_store() -> LogStore:
+    return LogStore(STORE_PATH)
+
+
+store = get_store()
+
 # ----------------------
 # 侧边栏 - 文件选择
 # ----------------------
@@ -21,10 +39,17 @@ uploaded_file = st.sidebar.file_uploader("上传日志文件", type=["log", "txt
 log_file = None
 
 if uploaded_file is not None:
-    log_file = uploaded_file
+    # 上传的文件按内容保存一份，与本地文件走同样的入库流程
+    content = uploaded_file.getvalue()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    log_file = os.path.join(UPLOAD_DIR, f"{hashlib.sha1(content).hexdigest()[:16]}_{uploaded_file.name}")
+    if not os.path.exists(log_file):
+        with open(log_file, "wb") as f:
+            f.write(content)
 else:
     if os.path.exists(log_dir):
-        log_files = [f for f in os.listdir(log_dir) if f.endswith(".log") or f.endswith(".txt")]
+        # 包含轮转出的 xxx.log.1、xxx.log.2 ...，各自按文件路径入库
+        log_files = sorted(f for f in os.listdir(log_dir) if LOG_FILE_PATTERN.search(f))
         if log_files:
             selected_log = st.sidebar.selectbox("或选择现有日志文件", log_files)
             log_file = os.path.join(log_dir, selected_log)
@@ -38,96 +63,138 @@ if not log_file:
     st.stop()
 
 # ----------------------
-# 日志解析正则（适配新日志格式）
-# 示例行：
-# 2025-10-20 14:54:16,219 INFO server.py 220 生成任务: 星球大战, 类型: image
+# 增量读取并解析日志
 # ----------------------
-pattern = re.compile(
-    r"(?P<time>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+)\s+"
-    r"(?P<level>\w+)\s+"
-    r"(?P<module>[\w\.]+)\s+"
-    r"(?P<line>\d+)\s+"
-    r"(?P<message>.*)"
-)
-
-# ----------------------
-# 读取并解析日志
-# ----------------------
-data = []
-
+key = os.path.abspath(log_file)
 try:
-    # 上传文件情况
-    if not isinstance(log_file, str):
-        content = log_file.read()
-        try:
-            text = content.decode("utf-8")
-        except UnicodeDecodeError:
-            text = content.decode("gbk", errors="ignore")
-        lines = text.splitlines()
-    else:
-        with open(log_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-    # 解析日志
-    for line in lines:
-        match = pattern.search(line)
-        if match:
-            data.append(match.groupdict())
-
+    with st.spinner("正在读取新增日志..."):
+        store.ingest(log_file, key)
 except Exception as e:
     st.error(f"读取日志文件失败：{e}")
     st.stop()
 
-if not data:
+first_ts, last_ts = store.time_range(key)
+if first_ts is None:
     st.error("日志解析失败，请检查日志格式！")
     st.stop()
 
 # ----------------------
-# 构建 DataFrame
-# ----------------------
-df = pd.DataFrame(data)
-df['time'] = pd.to_datetime(df['time'], errors='coerce')
-df = df.dropna(subset=['time'])
-df['line'] = df['line'].astype(int)
+# 实时跟踪：按偏移轮询文件，只解析新增内容，局部刷新表格和图表
+# ----------------------
+live = st.sidebar.toggle("实时跟踪", value=False, disabled=uploaded_file is not None)
+if live:
+    interval = st.sidebar.slider("刷新间隔（秒）", 1, 30, 2)
+    tail_levels = st.sidebar.multiselect("日志级别", options=store.distinct(key, "level"),
+                                         default=store.distinct(key, "level"), key="tail_levels")
+    buffers = st.session_state.setdefault("tail_buffers", {})
+    if key not in buffers:
+        buffers.clear()  # 只跟踪当前文件
+        buffers[key] = TailBuffer(store, log_file, key, max_rows=TAIL_ROWS, max_buckets=TAIL_BUCKETS)
+
+    @st.fragment(run_every=interval)
+    def live_view():
+        tail = buffers[key]
+        added = tail.poll()
+        st.caption(f"最近刷新：{datetime.now():%H:%M:%S}，新增 {added} 条；保留最近 {TAIL_ROWS} 条 / {TAIL_BUCKETS} 分钟")
+
+        counts = tail.count_frame()
+        counts = counts[counts["level"].isin(tail_levels)]
+        if not counts.empty:
+            fig = px.line(counts, x="time", y="count", color="level", title="每分钟日志数量",
+                          labels={"count": "数量", "time": "时间"})
+            st.plotly_chart(fig, use_container_width=True)
+
+        df = tail.frame()
+        df = df[df["level"].isin(tail_levels)]
+        st.dataframe(df[["time", "level", "module", "line", "trace_id", "message"]],
+                     use_container_width=True, height=600)
+
+    st.subheader("🔴 实时跟踪")
+    live_view()
+    st.stop()
+
+
+# 入库时间按日志中的本地时间原样换算为秒，这里用 UTC 换回同样的日期
+def _to_date(ts: float):
+    return datetime.fromtimestamp(ts, timezone.utc).date()
+
+
+def _to_ts(day, end: bool = False) -> float:
+    return datetime.combine(day, dtime.max if end else dtime.min, timezone.utc).timestamp()
+
 
 # ----------------------
 # 侧边栏筛选
 # ----------------------
 st.sidebar.header("筛选条件")
 
-levels = st.sidebar.multiselect("日志级别", options=df['level'].unique(), default=list(df['level'].unique()))
-modules = st.sidebar.multiselect("模块", options=df['module'].unique(), default=list(df['module'].unique()))
+all_levels = store.distinct(key, "level")
+all_modules = store.distinct(key, "module")
+levels = st.sidebar.multiselect("日志级别", options=all_levels, default=all_levels)
+modules = st.sidebar.multiselect("模块", options=all_modules, default=all_modules)
 
-start_time = st.sidebar.date_input("开始日期", df['time'].min().date())
-end_time = st.sidebar.date_input("结束日期", df['time'].max().date())
-keyword = st.sidebar.text_input("搜索关键词")
+start_time = st.sidebar.date_input("开始日期", _to_date(first_ts))
+end_time = st.sidebar.date_input("结束日期", _to_date(last_ts))
+keyword = st.sidebar.text_input("搜索关键词", help="全文索引搜索，少于 3 个字时逐行匹配")
 
 # ----------------------
-# 数据过滤
+# 数据过滤（在 SQLite 中完成，只取筛选窗口内的数据）
 # ----------------------
-filtered_df = df[
-    (df['level'].isin(levels)) &
-    (df['module'].isin(modules)) &
-    (df['time'].dt.date >= start_time) &
-    (df['time'].dt.date <= end_time)
-]
+filters = {
+    "levels": levels,
+    "modules": modules,
+    "start": _to_ts(start_time),
+    "end": _to_ts(end_time, end=True),
+    "keyword": keyword or None,
+}
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_summary(key: str, size: int, mtime: float, filter_items: tuple):
+    """汇总结果按 文件大小 + 修改时间 + 筛选条件 缓存，文件没有变化时重跑不再访问数据库"""
+    f = {k: (list(v) if isinstance(v, tuple) else v) for k, v in filter_items}
+    bucket = store.choose_bucket(key, f["start"], f["end"])
+    return (
+        store.count(key, **f),
+        bucket,
+        store.count_by_time(key, bucket, **f),
+        store.count_by(key, "level", **f),
+    )
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_page(key: str, size: int, mtime: float, filter_items: tuple, page: int, page_size: int):
+    f = {k: (list(v) if isinstance(v, tuple) else v) for k, v in filter_items}
+    return store.query(key, limit=page_size, offset=(page - 1) * page_size, **f)
+
 
-if keyword:
-    filtered_df = filtered_df[filtered_df['message'].str.contains(keyword, case=False, na=False)]
+stat = os.stat(log_file)
+cache_key = (key, stat.st_size, stat.st_mtime,
+             tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in filters.items()))
+total, bucket, time_count, level_count = load_summary(*cache_key)
 
 # ----------------------
-# 展示数据表格
+# 展示数据表格（分页，最新的在前）
 # ----------------------
 st.subheader("📋 日志表格")
-st.dataframe(filtered_df, use_container_width=True)
+col1, col2, col3 = st.columns([1, 1, 4])
+page_size = col1.selectbox("每页行数", PAGE_SIZES, index=1)
+pages = max(1, -(-total // page_size))
+page = col2.number_input("页码", min_value=1, max_value=pages, value=1, step=1)
+col3.caption(f"共 {total} 条，{pages} 页")
+page_df = load_page(*cache_key, int(page), page_size)
+st.dataframe(page_df[["time", "level", "module", "line", "trace_id", "message"]], use_container_width=True)
 
 # ----------------------
 # 日志数量随时间变化
 # ----------------------
 st.subheader("📈 日志数量随时间变化")
-if not filtered_df.empty:
-    df_count = filtered_df.set_index('time').resample('T').size()
-    fig = px.line(df_count, title="日志数量随时间变化", labels={"value": "数量", "time": "时间"})
+if total:
+    # 分桶大小随筛选窗口自动调整，点数不超过 500
+    df_count = time_count.set_index("time")["count"]
+    bucket_label = f"{bucket // 86400} 天" if bucket >= 86400 else \
+        f"{bucket // 3600} 小时" if bucket >= 3600 else f"{bucket // 60} 分钟"
+    fig = px.line(df_count, title=f"日志数量随时间变化（每 {bucket_label}）", labels={"value": "数量", "time": "时间"})
     st.plotly_chart(fig, use_container_width=True)
 else:
     st.info("没有符合筛选条件的日志数据")
@@ -136,9 +203,7 @@ else:
 # 日志级别分布
 # ----------------------
 st.subheader("📊 日志级别分布")
-if not filtered_df.empty:
-    level_count = filtered_df['level'].value_counts().reset_index()
-    level_count.columns = ["level", "count"]
+if total:
     fig2 = px.bar(level_count, x="level", y="count", title="日志级别分布", text="count")
     st.plotly_chart(fig2, use_container_width=True)
 else:
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+按内容寻址的素材库
+包含：
+1. 下载的视频按 SHA-256 存放（objects/ab/abcdef....mp4），相同内容只存一份
+2. 按来源 + video_id 建索引，已入库的视频不再重复下载
+3. 入库时用 VideoMaterial 同一套逻辑（probe_video）探测一次，结果写入索引
+4. 返回可直接构造 VideoMaterial 的素材描述
+douyinmcp.py 的下载入库工具使用
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from downloader import CHUNK_SIZE, Downloader
+from pyJianYingDraft import VideoMaterial, VideoProbe, probe_video
+
+_UNSAFE_KEY = re.compile(r"[^0-9A-Za-z_.-]")
+LOCK_STRIPES = 64  # 按 key 哈希分段加锁，锁的数量固定，不随入库视频增长
+
+logger = logging.getLogger(__name__)
+
+
+class MaterialStore:
+    """素材库，实例可在多线程间共享"""
+
+    def __init__(self, root: str, downloader: Optional[Downloader] = None, log: Callable[[str], None] = logger.info):
+        self.root = os.path.abspath(root)
+        self.downloader = downloader or Downloader()
+        self.log = log
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        for sub in ("objects", "index", "tmp"):
+            os.makedirs(os.path.join(self.root, sub), exist_ok=True)
+
+    def _index_path(self, source: str, video_id: str) -> str:
+        return os.path.join(self.root, "index", _UNSAFE_KEY.sub("_", f"{source}_{video_id}") + ".json")
+
+    def _object_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest + ext)
+
+    def _lock(self, key: str) -> threading.Lock:
+        return self._locks[hash(key) % LOCK_STRIPES]
+
+    def lookup(self, video_id: str, source: str = "douyin") -> Optional[Dict[str, Any]]:
+        """已入库且文件仍存在时返回素材描述"""
+        try:
+            with open(self._index_path(source, video_id), "r", encoding="utf-8") as f:
+                descriptor = json.load(f)
+        except (OSError, ValueError):
+            return None
+        path = descriptor.get("path")
+        if not path or not os.path.exists(path) or os.path.getsize(path) != descriptor.get("size"):
+            return None
+        return descriptor
+
+    def ingest(self, video_id: str, url: str, *, title: Optional[str] = None, source: str = "douyin",
+               ext: str = ".mp4") -> Dict[str, Any]:
+        """下载并入库，已入库的 video_id 直接返回
+
+        Returns:
+            素材描述：path, sha256, size, material_type, duration(微秒), width, height 等，
+            cached 表示是否命中已有素材
+        """
+        index_path = self._index_path(source, video_id)
+        with self._lock(index_path):
+            descriptor = self.lookup(video_id, source)
+            if descriptor is not None:
+                return {**descriptor, "cached": True}
+
+            tmp_path = os.path.join(self.root, "tmp", uuid.uuid4().hex + ext)
+            try:
+                stats = self.downloader.download(url, tmp_path)
+                digest = _file_sha256(tmp_path)
+                object_path = self._object_path(digest, ext)
+                if os.path.exists(object_path):
+                    # 不同 video_id 内容相同，复用已有文件
+                    os.remove(tmp_path)
+                else:
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    os.replace(tmp_path, object_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            probe = probe_video(object_path)
+            descriptor = {
+                "source": source,
+                "video_id": video_id,
+                "title": title or video_id,
+                "path": object_path,
+                "sha256": digest,
+                "size": os.path.getsize(object_path),
+                **probe.export_json(),
+                "source_url": url,
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            tmp_index = index_path + ".tmp"
+            with open(tmp_index, "w", encoding="utf-8") as f:
+                json.dump(descriptor, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_index, index_path)
+            self.log(f"素材入库 {source}/{video_id}: {object_path}, {stats.bytes} 字节, {stats.seconds:.2f}s")
+            return {**descriptor, "cached": False}
+
+    @staticmethod
+    def video_material(descriptor: Dict[str, Any], material_name: Optional[str] = None) -> VideoMaterial:
+        """用素材描述构造 VideoMaterial，直接使用已保存的探测结果"""
+        probe = VideoProbe(descriptor["material_type"], descriptor["duration"],
+                           descriptor["width"], descriptor["height"])
+        return VideoMaterial(descriptor["path"], material_name or descriptor.get("title"), probe=probe)
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for buf in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(buf)
+    return h.hexdigest()
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+声明式生成流水线
+包含：
+1. 流水线描述（JSON / YAML）：若干阶段，每个阶段有 id、type、inputs、params
+2. 阶段注册：@stage("类型名") 注册阶段实现
+3. 执行引擎：按 DAG 调度，无依赖关系的阶段并发执行
+4. 阶段输出缓存：按 阶段类型 + 参数 + 输入内容 哈希，输入未变化的阶段直接复用结果
+
+描述示例：
+{
+  "name": "demo",
+  "variables": {"segments": 3},
+  "stages": [
+    {"id": "texts", "type": "prompt_texts", "params": {"count": "${segments}"}},
+    {"id": "audios", "type": "tts", "inputs": {"texts": "texts"}}
+  ]
+}
+params 中的 "${变量}" 会被运行时变量替换，整个值恰好是 "${变量}" 时保留变量原类型。
+"""
+
+import os
+import json
+import time
+import string
+import hashlib
+import uuid
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional
+
+import tracing
+
+
+class PipelineError(Exception):
+    """流水线描述错误或阶段执行失败"""
+
+
+class StageType:
+    """已注册的阶段类型"""
+
+    def __init__(self, name: str, func: Callable, version: str, cache_valid: Optional[Callable[[Any], bool]]):
+        self.name = name
+        self.func = func
+        self.version = version
+        self.cache_valid = cache_valid
+
+
+STAGE_TYPES: Dict[str, StageType] = {}
+
+
+def stage(name: str, *, version: str = "1", cache_valid: Optional[Callable[[Any], bool]] = None):
+    """注册阶段实现，被装饰函数签名为 func(ctx, params, **inputs) -> 输出
+
+    Args:
+        name: 阶段类型名
+        version: 实现版本，修改实现逻辑后递增即可使旧缓存失效
+        cache_valid: 命中缓存时的额外校验（如输出文件是否仍存在）
+    """
+    def decorator(func: Callable) -> Callable:
+        STAGE_TYPES[name] = StageType(name, func, version, cache_valid)
+        return func
+    return decorator
+
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def _substitute(value: Any, variables: Dict[str, Any]) -> Any:
+    """递归替换参数中的 ${变量}"""
+    if isinstance(value, str):
+        if value.startswith("${") and value.endswith("}") and value[2:-1] in variables:
+            return variables[value[2:-1]]
+        return string.Template(value).safe_substitute({k: str(v) for k, v in variables.items()})
+    if isinstance(value, list):
+        return [_substitute(v, variables) for v in value]
+    if isinstance(value, dict):
+        return {k: _substitute(v, variables) for k, v in value.items()}
+    return value
+
+
+class Pipeline:
+    """校验过的流水线描述"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.name: str = spec.get("name", "pipeline")
+        self.variables: Dict[str, Any] = dict(spec.get("variables", {}))
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+        for item in spec.get("stages", []):
+            stage_id = item.get("id")
+            if not stage_id:
+                raise PipelineError("阶段缺少 id")
+            if stage_id in self.stages:
+                raise PipelineError(f"阶段 id 重复: {stage_id}")
+            if item.get("type") not in STAGE_TYPES:
+                raise PipelineError(f"阶段 {stage_id} 的类型未注册: {item.get('type')}")
+            self.stages[stage_id] = {
+                "id": stage_id,
+                "type": item["type"],
+                "inputs": dict(item.get("inputs", {})),
+                "params": dict(item.get("params", {})),
+                "cache": item.get("cache", True),
+            }
+
+        for stage_id, item in self.stages.items():
+            for dep in item["inputs"].values():
+                if dep not in self.stages:
+                    raise PipelineError(f"阶段 {stage_id} 依赖的阶段不存在: {dep}")
+        self.order = self._toposort()
+
+    def _toposort(self) -> List[str]:
+        order, state = [], {}
+
+        def visit(stage_id: str) -> None:
+            if state.get(stage_id) == "done":
+                return
+            if state.get(stage_id) == "visiting":
+                raise PipelineError(f"阶段之间存在循环依赖: {stage_id}")
+            state[stage_id] = "visiting"
+            for dep in self.stages[stage_id]["inputs"].values():
+                visit(dep)
+            state[stage_id] = "done"
+            order.append(stage_id)
+
+        for stage_id in self.stages:
+            visit(stage_id)
+        return order
+
+    def deps(self, stage_id: str) -> List[str]:
+        return list(set(self.stages[stage_id]["inputs"].values()))
+
+    @staticmethod
+    def load(path: str) -> "Pipeline":
+        """从 JSON 或 YAML 文件加载流水线"""
+        with open(path, "r", encoding="utf-8") as f:
+            if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+                try:
+                    import yaml
+                except ImportError:
+                    raise PipelineError("加载 YAML 流水线需要安装 PyYAML")
+                spec = yaml.safe_load(f)
+            else:
+                spec = json.load(f)
+        return Pipeline(spec)
+
+
+class PipelineEngine:
+    """流水线执行引擎"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_workers: int = 4,
+                 log: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            cache_dir: 阶段输出缓存目录，为 None 时不缓存
+            max_workers: 并发执行的阶段数上限
+            log: 日志函数
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.log = log or (lambda msg: None)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # ---------- 缓存 ----------
+    def _cache_key(self, stage_type: StageType, params: Dict[str, Any], inputs: Dict[str, Any]) -> Optional[str]:
+        try:
+            payload = _canonical({"type": stage_type.name, "version": stage_type.version,
+                                  "params": params, "inputs": inputs})
+        except TypeError:
+            return None  # 输入不可序列化则不缓存
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str, stage_type: StageType) -> Any:
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            output = json.load(f)["output"]
+        if stage_type.cache_valid is not None and not stage_type.cache_valid(output):
+            return None
+        return output
+
+    def _cache_set(self, key: str, output: Any) -> None:
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"output": output, "created": time.time()}, f, ensure_ascii=False)
+        except TypeError:
+            os.remove(tmp_path)  # 输出不可序列化则不缓存
+            return
+        os.replace(tmp_path, path)
+
+    # ---------- 执行 ----------
+    def _run_stage(self, pipeline: Pipeline, stage_id: str, outputs: Dict[str, Any],
+                   variables: Dict[str, Any], ctx: Dict[str, Any], use_cache: bool) -> Any:
+        item = pipeline.stages[stage_id]
+        stage_type = STAGE_TYPES[item["type"]]
+        params = _substitute(item["params"], variables)
+        inputs = {name: outputs[dep] for name, dep in item["inputs"].items()}
+
+        with tracing.span(f"stage.{item['type']}", stage_id=stage_id, pipeline=pipeline.name) as attrs:
+            key = None
+            if self.cache_dir and item["cache"] and use_cache:
+                key = self._cache_key(stage_type, params, inputs)
+                if key:
+                    cached = self._cache_get(key, stage_type)
+                    if cached is not None:
+                        attrs["cache"] = "hit"
+                        self.log(f"阶段 {stage_id} 命中缓存")
+                        return cached
+
+            attrs["cache"] = "miss" if key else "off"
+            t0 = time.perf_counter()
+            output = stage_type.func(ctx, params, **inputs)
+            self.log(f"阶段 {stage_id} ({item['type']}) 完成, 耗时 {time.perf_counter() - t0:.2f}s")
+            if key:
+                self._cache_set(key, output)
+            return output
+
+    def run(self, pipeline: Pipeline, variables: Optional[Dict[str, Any]] = None,
+            ctx: Optional[Dict[str, Any]] = None, *, use_cache: bool = True) -> Dict[str, Any]:
+        """执行流水线，返回 {阶段 id: 输出}
+
+        Args:
+            pipeline: 流水线
+            variables: 运行时变量，覆盖描述中的默认值
+            ctx: 传给每个阶段实现的上下文（客户端、工作区等）
+            use_cache: 为 False 时所有阶段都重新执行
+
+        Raises:
+            `PipelineError`: 某个阶段执行失败
+        """
+        variables = {**pipeline.variables, **(variables or {})}
+        ctx = ctx if ctx is not None else {}
+        outputs: Dict[str, Any] = {}
+        pending = list(pipeline.order)
+        running = {}
+
+        with tracing.span(f"pipeline.{pipeline.name}"), ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                # 提交所有依赖已完成的阶段
+                for stage_id in list(pending):
+                    if all(dep in outputs for dep in pipeline.deps(stage_id)):
+                        pending.remove(stage_id)
+                        # 复制上下文，使工作线程中的 span 归属当前请求的 trace
+                        fut = pool.submit(contextvars.copy_context().run, self._run_stage,
+                                          pipeline, stage_id, outputs, variables, ctx, use_cache)
+                        running[fut] = stage_id
+                if not running:
+                    raise PipelineError(f"无法调度的阶段: {pending}")
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    stage_id = running.pop(fut)
+                    try:
+                        outputs[stage_id] = fut.result()
+                    except Exception as e:
+                        for other in running:
+                            other.cancel()
+                        raise PipelineError(f"阶段 {stage_id} 执行失败: {e}") from e
+        return outputs
@@ -1,7 +1,8 @@
 import warnings
 import sys
 
-from .local_materials import CropSettings, VideoMaterial, AudioMaterial
+from .local_materials import CropSettings, VideoMaterial, AudioMaterial, VideoProbe, probe_video
+from .path_rewrite import PathRewrite, RelocateToDir, PrefixRemap
 from .keyframe import KeyframeProperty
 
 from .time_util import Timerange
@@ -22,6 +23,8 @@ from .track import TrackType
 from .template_mode import ShrinkMode, ExtendMode
 from .script_file import ScriptFile
 from .draft_folder import DraftFolder
+from .material_placement import PlacementMethod
+from .preview_renderer import PreviewRenderer
 
 # 仅在Windows系统下导入jianying_controller
 ISWIN = (sys.platform == 'win32')
@@ -208,6 +211,11 @@ __all__ = [
     "CropSettings",
     "VideoMaterial",
     "AudioMaterial",
+    "VideoProbe",
+    "probe_video",
+    "PathRewrite",
+    "RelocateToDir",
+    "PrefixRemap",
     "KeyframeProperty",
     "Timerange",
     "AudioSegment",
@@ -226,6 +234,8 @@ __all__ = [
     "ExtendMode",
     "ScriptFile",
     "DraftFolder",
+    "PlacementMethod",
+    "PreviewRenderer",
     "SEC",
     "tim",
     "trange",
@@ -3,27 +3,33 @@
 import os
 import shutil
 
-from typing import List
+from typing import List, Optional, Sequence
 
 from . import assets
 from .script_file import ScriptFile
+from .material_placement import PlacementMethod, DEFAULT_PLACEMENT, place_file, place_tree
 
 class DraftFolder:
     """管理一个文件夹及其内的一系列草稿"""
 
     folder_path: str
     """根路径"""
+    placement: Sequence[PlacementMethod]
+    """素材放置策略, 按顺序尝试"""
 
-    def __init__(self, folder_path: str):
+    def __init__(self, folder_path: str, *, placement: Sequence[PlacementMethod] = DEFAULT_PLACEMENT):
         """初始化草稿文件夹管理器
 
         Args:
             folder_path (`str`): 包含若干草稿的文件夹, 一般取剪映保存草稿的位置即可
+            placement (`Sequence[PlacementMethod]`, optional): 放置素材及复制草稿时依次尝试的方式,
+                默认为reflink、硬链接、分块复制(软链接需显式加入). 传入`(PlacementMethod.copy,)`即退回普通复制.
 
         Raises:
             `FileNotFoundError`: 路径不存在
         """
         self.folder_path = folder_path
+        self.placement = tuple(placement)
 
         if not os.path.exists(self.folder_path):
             raise FileNotFoundError(f"根文件夹 {self.folder_path} 不存在")
@@ -90,6 +96,38 @@ class DraftFolder:
 
         return script_file
 
+    def place_material(self, draft_name: str, src_path: str, sub_dir: str = "material",
+                       dst_name: Optional[str] = None) -> str:
+        """将一个素材文件按放置策略放入草稿文件夹内
+
+        Args:
+            draft_name (`str`): 草稿名称, 即相应文件夹名称
+            src_path (`str`): 素材文件路径
+            sub_dir (`str`, optional): 草稿内的素材子目录. 默认为"material".
+            dst_name (`str`, optional): 放置后的文件名. 默认与源文件同名.
+
+        Returns:
+            `str`: 放置后的素材路径
+
+        Raises:
+            `FileNotFoundError`: 对应的草稿不存在
+        """
+        draft_path = os.path.join(self.folder_path, draft_name)
+        if not os.path.exists(draft_path):
+            raise FileNotFoundError(f"草稿文件夹 {draft_name} 不存在")
+
+        material_dir = os.path.join(draft_path, sub_dir)
+        os.makedirs(material_dir, exist_ok=True)
+        dst_path = os.path.join(material_dir, dst_name or os.path.basename(src_path))
+        place_file(src_path, dst_path, self.placement)
+        return dst_path
+
+    def place_materials(self, draft_name: str, src_dir: str, sub_dir: str = "material") -> List[str]:
+        """将一个文件夹中的所有素材文件(不含子文件夹)放入草稿文件夹内, 返回放置后的路径列表"""
+        return [self.place_material(draft_name, os.path.join(src_dir, name), sub_dir)
+                for name in sorted(os.listdir(src_dir))
+                if os.path.isfile(os.path.join(src_dir, name))]
+
     def inspect_material(self, draft_name: str) -> None:
         """输出指定名称草稿中的贴纸素材元数据
 
@@ -147,7 +185,7 @@ class DraftFolder:
             raise FileExistsError(f"新草稿 {new_draft_name} 已存在且不允许覆盖")
 
         # 复制草稿文件夹
-        shutil.copytree(template_path, new_draft_path, dirs_exist_ok=allow_replace)
+        place_tree(template_path, new_draft_path, self.placement, dirs_exist_ok=allow_replace)
 
         # 打开草稿
         return self.load_template(new_draft_name)
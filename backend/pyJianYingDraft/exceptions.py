@@ -21,3 +21,5 @@ class AutomationError(Exception):
     """自动化操作失败"""
 class ExportTimeout(Exception):
     """导出超时"""
+class RenderFailed(Exception):
+    """本地预览渲染失败"""
@@ -1,9 +1,13 @@
 import os
 import uuid
+import threading
 import pymediainfo
 
+from collections import OrderedDict
 from typing import Optional, Literal
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+
+from .path_rewrite import PathRewrite
 
 class CropSettings:
     """素材的裁剪设置, 各属性均在0-1之间, 注意素材的坐标原点在左上角"""
@@ -43,6 +47,83 @@ class CropSettings:
             "lower_right_y": self.lower_right_y
         }
 
+class VideoProbe:
+    """视频（或图片）素材文件的探测结果"""
+
+    material_type: Literal["video", "photo"]
+    """素材类型: 视频或图片"""
+    duration: int
+    """素材时长, 单位为微秒"""
+    width: int
+    """素材宽度"""
+    height: int
+    """素材高度"""
+
+    def __init__(self, material_type: Literal["video", "photo"], duration: int, width: int, height: int):
+        self.material_type = material_type
+        self.duration = duration
+        self.width = width
+        self.height = height
+
+    def export_json(self) -> Dict[str, Any]:
+        return {
+            "material_type": self.material_type,
+            "duration": self.duration,
+            "width": self.width,
+            "height": self.height
+        }
+
+_PROBE_CACHE_SIZE = 1024
+_probe_cache: "OrderedDict[Tuple[str, int, int], VideoProbe]" = OrderedDict()
+_probe_lock = threading.Lock()
+
+def probe_video(path: str) -> VideoProbe:
+    """用pymediainfo探测视频（或图片）素材, 结果按 路径+大小+修改时间 缓存
+
+    Raises:
+        `FileNotFoundError`: 素材文件不存在.
+        `ValueError`: 不支持的素材文件类型.
+    """
+    path = os.path.abspath(path)
+    postfix = os.path.splitext(path)[1]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"找不到 {path}")
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _probe_lock:
+        if key in _probe_cache:
+            _probe_cache.move_to_end(key)
+            return _probe_cache[key]
+
+    if not pymediainfo.MediaInfo.can_parse():
+        raise ValueError(f"不支持的视频素材类型 '{postfix}'")
+
+    info: pymediainfo.MediaInfo = \
+        pymediainfo.MediaInfo.parse(path, mediainfo_options={"File_TestContinuousFileNames": "0"})  # type: ignore
+    # 有视频轨道的视为视频素材
+    if len(info.video_tracks):
+        probe = VideoProbe("video", int(info.video_tracks[0].duration * 1e3),  # type: ignore
+                           info.video_tracks[0].width, info.video_tracks[0].height)  # type: ignore
+    # gif文件使用imageio库获取长度
+    elif postfix.lower() == ".gif":
+        import imageio
+        gif = imageio.get_reader(path)
+
+        probe = VideoProbe("video", int(round(gif.get_meta_data()['duration'] * gif.get_length() * 1e3)),
+                           info.image_tracks[0].width, info.image_tracks[0].height)  # type: ignore
+        gif.close()
+    elif len(info.image_tracks):
+        probe = VideoProbe("photo", 10800000000,  # 相当于3h
+                           info.image_tracks[0].width, info.image_tracks[0].height)  # type: ignore
+    else:
+        raise ValueError(f"输入的素材文件 {path} 没有视频轨道或图片轨道")
+
+    with _probe_lock:
+        _probe_cache[key] = probe
+        while len(_probe_cache) > _PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+    return probe
+
 class VideoMaterial:
     """本地视频素材（视频或图片）, 一份素材可以在多个片段中使用"""
 
@@ -64,57 +145,43 @@ class VideoMaterial:
     """素材裁剪设置"""
     material_type: Literal["video", "photo"]
     """素材类型: 视频或图片"""
+    path_rewrite: Optional[PathRewrite]
+    """导出时的路径改写策略, 优先于草稿文件的策略"""
 
-    def __init__(self, path: str, material_name: Optional[str] = None, crop_settings: CropSettings = CropSettings()):
+    def __init__(self, path: str, material_name: Optional[str] = None, crop_settings: CropSettings = CropSettings(),
+                 *, probe: Optional[VideoProbe] = None):
         """从指定位置加载视频（或图片）素材
 
         Args:
             path (`str`): 素材文件路径, 支持mp4, mov, avi等常见视频文件及jpg, jpeg, png等图片文件.
             material_name (`str`, optional): 素材名称, 如果不指定, 默认使用文件名作为素材名称.
             crop_settings (`CropSettings`, optional): 素材裁剪设置, 默认不裁剪.
+            probe (`VideoProbe`, optional): 已有的探测结果, 不指定时调用`probe_video`探测.
 
         Raises:
             `FileNotFoundError`: 素材文件不存在.
             `ValueError`: 不支持的素材文件类型.
         """
         path = os.path.abspath(path)
-        postfix = os.path.splitext(path)[1]
         if not os.path.exists(path):
             raise FileNotFoundError(f"找不到 {path}")
+        if probe is None:
+            probe = probe_video(path)
 
         self.material_name = material_name if material_name else os.path.basename(path)
         self.material_id = uuid.uuid4().hex
         self.path = path
         self.crop_settings = crop_settings
         self.local_material_id = ""
+        self.path_rewrite = None
 
-        if not pymediainfo.MediaInfo.can_parse():
-            raise ValueError(f"不支持的视频素材类型 '{postfix}'")
+        self.material_type = probe.material_type
+        self.duration = probe.duration
+        self.width, self.height = probe.width, probe.height
 
-        info: pymediainfo.MediaInfo = \
-            pymediainfo.MediaInfo.parse(path, mediainfo_options={"File_TestContinuousFileNames": "0"})  # type: ignore
-        # 有视频轨道的视为视频素材
-        if len(info.video_tracks):
-            self.material_type = "video"
-            self.duration = int(info.video_tracks[0].duration * 1e3)  # type: ignore
-            self.width, self.height = info.video_tracks[0].width, info.video_tracks[0].height  # type: ignore
-        # gif文件使用imageio库获取长度
-        elif postfix.lower() == ".gif":
-            import imageio
-            gif = imageio.get_reader(path)
-
-            self.material_type = "video"
-            self.duration = int(round(gif.get_meta_data()['duration'] * gif.get_length() * 1e3))
-            self.width, self.height = info.image_tracks[0].width, info.image_tracks[0].height  # type: ignore
-            gif.close()
-        elif len(info.image_tracks):
-            self.material_type = "photo"
-            self.duration = 10800000000  # 相当于3h
-            self.width, self.height = info.image_tracks[0].width, info.image_tracks[0].height  # type: ignore
-        else:
-            raise ValueError(f"输入的素材文件 {path} 没有视频轨道或图片轨道")
-
-    def export_json(self) -> Dict[str, Any]:
+    def export_json(self, path_rewrite: Optional[PathRewrite] = None) -> Dict[str, Any]:
+        """导出素材json, 素材自身的`path_rewrite`优先于传入的策略"""
+        rewrite = self.path_rewrite or path_rewrite
         video_material_json = {
             "audio_fade": None,
             "category_id": "",
@@ -130,7 +197,7 @@ class VideoMaterial:
             "material_id": self.material_id,
             "material_name": self.material_name,
             "media_path": "",
-            "path": self.path,
+            "path": rewrite(self.path) if rewrite else self.path,
             "type": self.material_type,
             "width": self.width
         }
@@ -148,6 +215,8 @@ class AudioMaterial:
 
     duration: int
     """素材时长, 单位为微秒"""
+    path_rewrite: Optional[PathRewrite]
+    """导出时的路径改写策略, 优先于草稿文件的策略"""
 
     def __init__(self, path: str, material_name: Optional[str] = None):
         """从指定位置加载音频素材, 注意视频文件不应该作为音频素材使用
@@ -167,6 +236,7 @@ class AudioMaterial:
         self.material_name = material_name if material_name else os.path.basename(path)
         self.material_id = uuid.uuid4().hex
         self.path = path
+        self.path_rewrite = None
 
         if not pymediainfo.MediaInfo.can_parse():
             raise ValueError("不支持的音频素材类型 %s" % os.path.splitext(path)[1])
@@ -177,7 +247,9 @@ class AudioMaterial:
             raise ValueError(f"给定的素材文件 {path} 没有音频轨道")
         self.duration = int(info.audio_tracks[0].duration * 1e3)  # type: ignore
 
-    def export_json(self) -> Dict[str, Any]:
+    def export_json(self, path_rewrite: Optional[PathRewrite] = None) -> Dict[str, Any]:
+        """导出素材json, 素材自身的`path_rewrite`优先于传入的策略"""
+        rewrite = self.path_rewrite or path_rewrite
         return {
             "app_id": 0,
             "category_id": "",
@@ -191,7 +263,7 @@ class AudioMaterial:
             "local_material_id": self.material_id,
             "music_id": self.material_id,
             "name": self.material_name,
-            "path": self.path,
+            "path": rewrite(self.path) if rewrite else self.path,
             "source_platform": 0,
             "type": "extract_music",
             "wave_points": []
@@ -0,0 +1,117 @@
+"""素材放置: 依次尝试reflink、硬链接, 最后才退回分块复制; 软链接需显式指定"""
+
+import os
+import sys
+import shutil
+
+from enum import Enum
+from typing import Dict, Sequence, Tuple
+
+class PlacementMethod(Enum):
+    """素材放置方式"""
+
+    reflink = "reflink"
+    """写时复制克隆, 与源文件共享数据块, 修改互不影响"""
+    hardlink = "hardlink"
+    """硬链接, 与源文件为同一份数据, 要求位于同一文件系统"""
+    symlink = "symlink"
+    """软链接, 源文件被删除或替换后会随之失效或改变, 打包或拷贝到其他机器后也无法使用, 不在默认策略中"""
+    copy = "copy"
+    """分块复制"""
+
+DEFAULT_PLACEMENT: Tuple[PlacementMethod, ...] = (
+    PlacementMethod.reflink, PlacementMethod.hardlink, PlacementMethod.copy
+)
+"""默认放置策略, 不含软链接: 草稿目录中的文件都不依赖草稿外的源文件"""
+
+COPY_CHUNK_SIZE = 1024 * 1024
+"""分块复制的块大小"""
+MIN_LINK_SIZE = 1024 * 1024
+"""小于此大小的文件不做硬链接/软链接, 直接复制"""
+ALWAYS_COPY_EXTENSIONS = {".json"}
+"""总是复制的文件类型. 草稿json会被原地改写, 共享数据会同时改坏源文件"""
+
+_FICLONE = 0x40049409  # linux/fs.h
+
+def _reflink(src: str, dst: str) -> None:
+    if sys.platform.startswith("linux"):
+        import fcntl
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            except OSError:
+                fdst.close()
+                os.remove(dst)
+                raise
+    elif sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL("libc.dylib", use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), dst)
+    else:
+        raise OSError("当前平台不支持reflink")
+    shutil.copystat(src, dst)
+
+def _chunked_copy(src: str, dst: str) -> None:
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+    shutil.copystat(src, dst)
+
+def _shareable(src: str) -> bool:
+    """判断文件是否可以与源文件共享同一份数据"""
+    if os.path.splitext(src)[1].lower() in ALWAYS_COPY_EXTENSIONS:
+        return False
+    return os.path.getsize(src) >= MIN_LINK_SIZE
+
+def place_file(src: str, dst: str, strategy: Sequence[PlacementMethod] = DEFAULT_PLACEMENT) -> PlacementMethod:
+    """按策略依次尝试将`src`放置到`dst`, 返回实际使用的方式
+
+    `dst`已存在时会先被删除, 以免链接到旧文件上.
+
+    Args:
+        src (`str`): 源文件路径
+        dst (`str`): 目标文件路径
+        strategy (`Sequence[PlacementMethod]`, optional): 尝试顺序, 默认为reflink、硬链接、复制.
+
+    Raises:
+        `OSError`: 所有方式均失败
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    shareable = _shareable(src)
+    last_error: OSError = OSError(f"没有可用的放置方式: {src}")
+    for method in strategy:
+        try:
+            if method == PlacementMethod.reflink:
+                _reflink(src, dst)
+            elif method == PlacementMethod.hardlink:
+                if not shareable: continue
+                os.link(src, dst)
+            elif method == PlacementMethod.symlink:
+                if not shareable: continue
+                os.symlink(os.path.abspath(src), dst)
+            else:
+                _chunked_copy(src, dst)
+            return method
+        except (OSError, NotImplementedError) as e:
+            last_error = e if isinstance(e, OSError) else OSError(str(e))
+    raise last_error
+
+def place_tree(src_dir: str, dst_dir: str, strategy: Sequence[PlacementMethod] = DEFAULT_PLACEMENT, *,
+               dirs_exist_ok: bool = False) -> Dict[PlacementMethod, int]:
+    """按策略放置整个文件夹, 相当于`shutil.copytree`, 返回各方式使用的次数
+
+    Raises:
+        `FileExistsError`: `dst_dir`已存在且`dirs_exist_ok`为否
+    """
+    os.makedirs(dst_dir, exist_ok=dirs_exist_ok)
+    counts: Dict[PlacementMethod, int] = {method: 0 for method in PlacementMethod}
+    for root, _, files in os.walk(src_dir):
+        target_root = os.path.join(dst_dir, os.path.relpath(root, src_dir))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            method = place_file(os.path.join(root, name), os.path.join(target_root, name), strategy)
+            counts[method] += 1
+    return counts
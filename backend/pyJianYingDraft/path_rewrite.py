@@ -0,0 +1,60 @@
+"""素材路径改写策略, 在导出json时应用, 使草稿只需序列化一次"""
+
+import ntpath
+
+from typing import Dict, Optional
+
+def _sep_of(path: str) -> str:
+    """推断路径使用的分隔符, 以便在Linux上生成Windows路径(或反之)"""
+    return "\\" if "\\" in path and "/" not in path else "/"
+
+class PathRewrite:
+    """素材路径改写策略基类, 子类实现`__call__`"""
+
+    def __call__(self, path: str) -> str:
+        raise NotImplementedError
+
+class RelocateToDir(PathRewrite):
+    """把素材路径改写为指定目录下的同名文件, 一般取草稿内的素材目录"""
+
+    target_dir: str
+    """目标目录"""
+
+    def __init__(self, target_dir: str):
+        """
+        Args:
+            target_dir (`str`): 目标目录, 可以是与当前系统不同风格的路径(如在Linux上生成Windows路径)
+        """
+        self.target_dir = target_dir
+
+    def __call__(self, path: str) -> str:
+        if not path:
+            return path
+        sep = _sep_of(self.target_dir)
+        return self.target_dir.rstrip("\\/") + sep + ntpath.basename(path)
+
+class PrefixRemap(PathRewrite):
+    """按前缀映射改写素材路径, 例如在Linux上生成草稿后映射到Windows盘符"""
+
+    mapping: Dict[str, str]
+    """源前缀 -> 目标前缀"""
+
+    def __init__(self, mapping: Dict[str, str], *, target_sep: Optional[str] = None):
+        """
+        Args:
+            mapping (`Dict[str, str]`): 源前缀到目标前缀的映射, 按最长前缀优先匹配
+            target_sep (`str`, optional): 改写后统一使用的路径分隔符, 默认根据目标前缀推断
+        """
+        self.mapping = dict(sorted(mapping.items(), key=lambda kv: len(kv[0]), reverse=True))
+        self.target_sep = target_sep
+
+    def __call__(self, path: str) -> str:
+        for src, dst in self.mapping.items():
+            if path.startswith(src):
+                rest = path[len(src):]
+                sep = self.target_sep or _sep_of(dst)
+                rest = rest.replace("\\", sep).replace("/", sep)
+                if dst and rest and not dst.endswith(sep) and not rest.startswith(sep):
+                    rest = sep + rest
+                return dst + rest
+        return path
@@ -0,0 +1,393 @@
+"""用ffmpeg在本地渲染草稿的低分辨率预览, 不依赖剪映客户端
+
+遍历`ScriptFile`中的视频/音频/文本轨道, 生成一张ffmpeg滤镜图, 一次编码输出预览MP4.
+支持: 片段时间范围、变速、音量、静音轨道、音频淡入淡出、裁剪、图像调节设置(缩放/位移/旋转/翻转/不透明度)、文本.
+不支持(预览中忽略): 关键帧、动画、转场、特效、滤镜、蒙版、贴纸以及模板模式下导入的轨道.
+"""
+
+import os
+import math
+import shutil
+import tempfile
+import subprocess
+import pymediainfo
+
+from functools import lru_cache
+from typing import Optional, Tuple
+from typing import List, Any
+
+from .exceptions import ExportTimeout, RenderFailed
+from .time_util import SEC
+from .script_file import ScriptFile
+from .segment import ClipSettings
+from .track import TrackType, Track
+from .video_segment import VideoSegment
+from .audio_segment import AudioSegment
+from .text_segment import TextSegment
+
+AUDIO_RATE = 44100
+"""混音采样率"""
+TEXT_SIZE_RATIO = 1 / 160
+"""剪映字号换算为像素的近似比例: 字号 * 画布短边 * 此比例"""
+
+@lru_cache(maxsize=1024)
+def _has_audio(path: str) -> bool:
+    """视频素材是否带有音轨"""
+    info: pymediainfo.MediaInfo = pymediainfo.MediaInfo.parse(path)  # type: ignore
+    return len(info.audio_tracks) > 0
+
+def _sec(us: int) -> str:
+    """微秒转换为ffmpeg使用的秒数"""
+    return "%.6f" % (us / SEC)
+
+def _escape_filter_value(value: str) -> str:
+    """转义滤镜参数值(如文件路径)中的特殊字符"""
+    for ch in ("\\", ":", "'", "[", "]", ",", ";"):
+        value = value.replace(ch, "\\" + ch)
+    return value
+
+def _ass_time(us: int) -> str:
+    cs = max(0, int(round(us / 10000)))
+    return "%d:%02d:%02d.%02d" % (cs // 360000, cs // 6000 % 60, cs // 100 % 60, cs % 100)
+
+def _byte(value: float) -> int:
+    return max(0, min(255, int(round(value * 255))))
+
+def _ass_color(rgb: Tuple[float, float, float]) -> str:
+    """RGB三元组([0, 1]) -> ASS颜色 &HBBGGRR&"""
+    r, g, b = (_byte(c) for c in rgb)
+    return "&H%02X%02X%02X&" % (b, g, r)
+
+def _ass_alpha(alpha: float) -> str:
+    """不透明度([0, 1]) -> ASS透明度 &HAA&, 00为不透明"""
+    return "&H%02X&" % (255 - _byte(alpha))
+
+def _hex_to_rgb(color: str) -> Tuple[float, float, float]:
+    """'#RRGGBB' -> RGB三元组"""
+    color = color.lstrip("#")
+    return tuple(int(color[i:i + 2], 16) / 255 for i in (0, 2, 4))  # type: ignore
+
+def _ass_text(text: str) -> str:
+    """ASS没有转义语法, 花括号和反斜杠替换为全角字符"""
+    text = text.replace("\\", "＼").replace("{", "｛").replace("}", "｝")
+    return text.replace("\r\n", "\n").replace("\n", "\\N")
+
+class PreviewRenderer:
+    """草稿预览渲染器
+
+    用法:
+        renderer = PreviewRenderer(script, height=360)
+        renderer.render("preview.mp4")
+    """
+
+    script: ScriptFile
+    """要渲染的草稿"""
+    width: int
+    """预览宽度, 按草稿画布比例由`height`计算"""
+    height: int
+    """预览高度"""
+    fps: int
+    """预览帧率"""
+    duration: int
+    """预览时长, 单位为微秒"""
+
+    def __init__(self, script: ScriptFile, *, height: int = 360, fps: Optional[int] = None,
+                 ffmpeg: str = "ffmpeg", font_name: str = "Sans", fonts_dir: Optional[str] = None,
+                 crf: int = 30, preset: str = "veryfast"):
+        """
+        Args:
+            script (`ScriptFile`): 要渲染的草稿
+            height (`int`, optional): 预览高度, 宽度按画布比例计算. 默认为360.
+            fps (`int`, optional): 预览帧率, 默认与草稿一致.
+            ffmpeg (`str`, optional): ffmpeg可执行文件. 默认为"ffmpeg".
+            font_name (`str`, optional): 文本使用的字体名称, 剪映字体资源无法在本地使用. 默认为"Sans".
+            fonts_dir (`str`, optional): 额外的字体目录, 渲染中文时可指定包含中文字体的目录.
+            crf (`int`, optional): x264质量参数, 越大文件越小. 默认为30.
+            preset (`str`, optional): x264编码速度预设. 默认为"veryfast".
+        """
+        self.script = script
+        self.height = max(2, height // 2 * 2)
+        self.width = max(2, int(round(script.width * self.height / script.height / 2)) * 2)
+        self.fps = fps or script.fps
+        self.duration = max([script.duration] + [track.end_time for track in script.tracks.values()])
+
+        self.ffmpeg = ffmpeg
+        self.font_name = font_name
+        self.fonts_dir = fonts_dir
+        self.crf = crf
+        self.preset = preset
+
+    def _tracks(self, track_type: TrackType) -> List[Track]:
+        """指定类型的轨道, 按渲染顺序从底层到前景排列"""
+        tracks = [track for track in self.script.tracks.values() if track.track_type == track_type]
+        return sorted(tracks, key=lambda track: track.render_index)
+
+    def _center(self, clip: ClipSettings) -> Tuple[float, float]:
+        """片段中心在预览画面中的像素坐标, 剪映的位移以半个画布为单位且y轴向上"""
+        return (self.width / 2 * (1 + clip.transform_x),
+                self.height / 2 * (1 - clip.transform_y))
+
+    # ========================
+    # 视频
+    # ========================
+    def _video_chain(self, seg: VideoSegment, input_index: int, label: str) -> str:
+        """单个视频片段的滤镜链: 截取 -> 裁剪 -> 适配画布 -> 图像调节 -> 移到目标时间"""
+        clip = seg.clip_settings
+        crop = seg.material_instance.crop_settings
+        filters = []
+
+        if seg.material_instance.material_type == "photo":
+            filters.append("setpts=PTS-STARTPTS+%s/TB" % _sec(seg.start))
+        else:
+            filters.append("setpts=(PTS-STARTPTS)/%s+%s/TB" % (seg.speed.speed, _sec(seg.start)))
+        filters.append("fps=%d" % self.fps)
+
+        x0, y0 = crop.upper_left_x, crop.upper_left_y
+        x1, y1 = crop.lower_right_x, crop.lower_right_y
+        if (x0, y0, x1, y1) != (0.0, 0.0, 1.0, 1.0):
+            filters.append("crop=iw*%s:ih*%s:iw*%s:ih*%s" % (x1 - x0, y1 - y0, x0, y0))
+        # 剪映默认将素材完整放入画布, 之后再应用缩放
+        filters.append("scale=%d:%d:force_original_aspect_ratio=decrease:force_divisible_by=2"
+                       % (self.width, self.height))
+        if (clip.scale_x, clip.scale_y) != (1.0, 1.0):
+            filters.append("scale=trunc(iw*%s/2)*2:trunc(ih*%s/2)*2" % (abs(clip.scale_x), abs(clip.scale_y)))
+        if clip.flip_horizontal:
+            filters.append("hflip")
+        if clip.flip_vertical:
+            filters.append("vflip")
+
+        if clip.rotation % 360 != 0 or clip.alpha < 1.0:
+            filters.append("format=yuva420p")
+        if clip.rotation % 360 != 0:
+            rad = math.radians(clip.rotation)
+            filters.append("rotate=%s:ow=rotw(%s):oh=roth(%s):c=none" % (rad, rad, rad))
+        if clip.alpha < 1.0:
+            filters.append("colorchannelmixer=aa=%s" % max(0.0, clip.alpha))
+
+        return "[%d:v]%s[%s]" % (input_index, ",".join(filters), label)
+
+    # ========================
+    # 音频
+    # ========================
+    def _audio_chain(self, seg: Any, input_index: int, label: str) -> str:
+        """单个音频片段(或视频片段的原声)的滤镜链: 变速 -> 音量 -> 淡入淡出 -> 延迟到目标时间"""
+        filters = ["asetpts=PTS-STARTPTS",
+                   "aformat=sample_rates=%d:channel_layouts=stereo" % AUDIO_RATE]
+        speed = seg.speed.speed
+        if abs(speed - 1.0) > 1e-6:
+            if seg.change_pitch:
+                # 音调随速度变化: 改变采样率后重采样
+                filters.append("asetrate=%d,aresample=%d" % (round(AUDIO_RATE * speed), AUDIO_RATE))
+            else:
+                # atempo单级只支持0.5~100倍
+                while speed < 0.5:
+                    filters.append("atempo=0.5")
+                    speed /= 0.5
+                filters.append("atempo=%s" % speed)
+        if seg.volume != 1.0:
+            filters.append("volume=%s" % seg.volume)
+
+        fade = seg.fade
+        if fade is not None:
+            if fade.in_duration > 0:
+                filters.append("afade=t=in:st=0:d=%s" % _sec(fade.in_duration))
+            if fade.out_duration > 0:
+                filters.append("afade=t=out:st=%s:d=%s"
+                               % (_sec(max(0, seg.duration - fade.out_duration)), _sec(fade.out_duration)))
+        filters.append("atrim=duration=%s" % _sec(seg.duration))
+        filters.append("adelay=%d:all=1" % round(seg.start / 1000))
+        return "[%d:a]%s[%s]" % (input_index, ",".join(filters), label)
+
+    # ========================
+    # 文本
+    # ========================
+    def _ass_event(self, seg: TextSegment, layer: int) -> str:
+        style, clip = seg.style, seg.clip_settings
+        font_size = style.size * min(self.width, self.height) * TEXT_SIZE_RATIO
+        cx, cy = self._center(clip)
+
+        tags = ["\\an5", "\\pos(%.1f,%.1f)" % (cx, cy), "\\fs%.1f" % font_size,
+                "\\1c%s\\1a%s" % (_ass_color(style.color), _ass_alpha(style.alpha * clip.alpha)),
+                "\\q%d" % (0 if style.auto_wrapping else 2)]
+        if style.bold: tags.append("\\b1")
+        if style.italic: tags.append("\\i1")
+        if style.underline: tags.append("\\u1")
+        if (clip.scale_x, clip.scale_y) != (1.0, 1.0):
+            tags.append("\\fscx%.1f\\fscy%.1f" % (clip.scale_x * 100, clip.scale_y * 100))
+        if clip.rotation:
+            tags.append("\\frz%.1f" % -clip.rotation)  # ASS以逆时针为正
+
+        if seg.background is not None:
+            # 使用不透明背景框样式, 框的颜色取自描边颜色
+            bg = seg.background
+            tags.append("\\3c%s\\3a%s" % (_ass_color(_hex_to_rgb(bg.color)), _ass_alpha(bg.alpha * clip.alpha)))
+            tags.append("\\bord%.1f" % (font_size * 0.2))
+        elif seg.border is not None:
+            tags.append("\\3c%s\\3a%s" % (_ass_color(seg.border.color), _ass_alpha(seg.border.alpha * clip.alpha)))
+            # TextBorder.width 已按 宽度/100*0.2 映射
+            tags.append("\\bord%.1f" % (seg.border.width / 0.2 * font_size * 0.15))
+        else:
+            tags.append("\\bord0")
+
+        if seg.shadow is not None:
+            shadow = seg.shadow
+            distance = shadow.distance / 100 * font_size * 0.5
+            angle = math.radians(shadow.angle)
+            tags.append("\\4c%s\\4a%s\\xshad%.1f\\yshad%.1f"
+                        % (_ass_color(shadow.color), _ass_alpha(shadow.alpha * clip.alpha),
+                           distance * math.cos(angle), -distance * math.sin(angle)))
+        else:
+            tags.append("\\shad0")
+
+        return "Dialogue: %d,%s,%s,%s,,0,0,0,,{%s}%s" % (
+            layer, _ass_time(seg.start), _ass_time(seg.end),
+            "Box" if seg.background is not None else "Default", "".join(tags), _ass_text(seg.text))
+
+    def _ass_script(self) -> Optional[str]:
+        """所有文本片段对应的ASS字幕, 没有文本时返回None"""
+        events = []
+        for layer, track in enumerate(self._tracks(TrackType.text)):
+            events.extend(self._ass_event(seg, layer) for seg in track.segments)
+        if not events:
+            return None
+
+        style_fields = "%s,{font},20,&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,{border_style},0,0,5,0,0,0,1"
+        header = [
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            "PlayResX: %d" % self.width,
+            "PlayResY: %d" % self.height,
+            "WrapStyle: 0",
+            "ScaledBorderAndShadow: yes",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+            "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+            "Alignment, MarginL, MarginR, MarginV, Encoding",
+            "Style: " + style_fields.format(font=self.font_name, border_style=1) % "Default",
+            "Style: " + style_fields.format(font=self.font_name, border_style=3) % "Box",
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+        ]
+        return "\n".join(header + events) + "\n"
+
+    # ========================
+    # 组装
+    # ========================
+    def build_command(self, output_path: str, work_dir: str) -> List[str]:
+        """生成ffmpeg命令, 滤镜图和字幕文件写入`work_dir`
+
+        每个片段对应一个输入, 用输入端的`-ss`/`-t`只解码需要的部分
+        """
+        inputs: List[str] = []
+        graph: List[str] = ["color=c=black:s=%dx%d:r=%d:d=%s[base]"
+                            % (self.width, self.height, self.fps, _sec(self.duration)),
+                            "anullsrc=r=%d:cl=stereo,atrim=duration=%s[abase]" % (AUDIO_RATE, _sec(self.duration))]
+        audio_labels = ["abase"]
+        last_video = "base"
+        input_count = 0
+
+        def add_input(path: str, source_start: int, source_duration: int, loop: bool = False) -> int:
+            nonlocal input_count
+            if loop:
+                inputs.extend(["-loop", "1", "-framerate", str(self.fps)])
+            else:
+                inputs.extend(["-ss", _sec(source_start)])
+            inputs.extend(["-t", _sec(source_duration), "-i", path])
+            input_count += 1
+            return input_count - 1
+
+        for track in self._tracks(TrackType.video):
+            for seg in track.segments:
+                if not isinstance(seg, VideoSegment) or seg.start >= self.duration:
+                    continue
+                material = seg.material_instance
+                if material.material_type == "photo":
+                    index = add_input(material.path, 0, seg.duration, loop=True)
+                else:
+                    assert seg.source_timerange is not None
+                    index = add_input(material.path, seg.source_timerange.start, seg.source_timerange.duration)
+
+                label = "v%d_seg" % index
+                graph.append(self._video_chain(seg, index, label))
+                center_x, center_y = self._center(seg.clip_settings)
+                graph.append("[%s][%s]overlay=x=%.1f-w/2:y=%.1f-h/2:eof_action=pass[v%d_out]"
+                             % (last_video, label, center_x, center_y, index))
+                last_video = "v%d_out" % index
+
+                if material.material_type == "video" and not track.mute and seg.volume > 0 \
+                        and _has_audio(material.path):
+                    graph.append(self._audio_chain(seg, index, "a%d" % index))
+                    audio_labels.append("a%d" % index)
+
+        for track in self._tracks(TrackType.audio):
+            if track.mute:
+                continue
+            for seg in track.segments:
+                if not isinstance(seg, AudioSegment) or seg.volume <= 0 or seg.start >= self.duration:
+                    continue
+                assert seg.source_timerange is not None
+                index = add_input(seg.material_instance.path, seg.source_timerange.start, seg.source_timerange.duration)
+                graph.append(self._audio_chain(seg, index, "a%d" % index))
+                audio_labels.append("a%d" % index)
+
+        ass_script = self._ass_script()
+        if ass_script is not None:
+            ass_path = os.path.join(work_dir, "preview.ass")
+            with open(ass_path, "w", encoding="utf-8") as f:
+                f.write(ass_script)
+            ass_filter = "ass=filename=%s" % _escape_filter_value(ass_path)
+            if self.fonts_dir:
+                ass_filter += ":fontsdir=%s" % _escape_filter_value(self.fonts_dir)
+            graph.append("[%s]%s[vout]" % (last_video, ass_filter))
+        else:
+            graph.append("[%s]null[vout]" % last_video)
+
+        # normalize=0: 各片段按自身音量叠加, 不按输入个数衰减
+        graph.append("%samix=inputs=%d:duration=first:normalize=0[aout]"
+                     % ("".join("[%s]" % label for label in audio_labels), len(audio_labels)))
+
+        # 片段较多时滤镜图很长, 写入文件避免超出命令行长度限制
+        graph_path = os.path.join(work_dir, "filtergraph.txt")
+        with open(graph_path, "w", encoding="utf-8") as f:
+            f.write(";\n".join(graph))
+
+        return [self.ffmpeg, "-hide_banner", "-nostdin", "-y", *inputs,
+                "-filter_complex_script", graph_path,
+                "-map", "[vout]", "-map", "[aout]",
+                "-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf), "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-b:a", "96k", "-movflags", "+faststart",
+                "-t", _sec(self.duration), output_path]
+
+    def render(self, output_path: str, *, timeout: Optional[float] = None) -> str:
+        """渲染预览视频
+
+        Args:
+            output_path (`str`): 输出的MP4路径
+            timeout (`float`, optional): 超时时间(秒), 默认不限制
+
+        Returns:
+            输出文件的绝对路径
+
+        Raises:
+            `RenderFailed`: 草稿为空, 找不到ffmpeg或ffmpeg执行失败
+            `ExportTimeout`: 渲染超时
+        """
+        if self.duration <= 0:
+            raise RenderFailed("草稿中没有可渲染的片段")
+        if shutil.which(self.ffmpeg) is None:
+            raise RenderFailed("找不到ffmpeg: %s" % self.ffmpeg)
+
+        output_path = os.path.abspath(output_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix="jy_preview_") as work_dir:
+            cmd = self.build_command(output_path, work_dir)
+            try:
+                proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                raise ExportTimeout("预览渲染超时(%ss)" % timeout)
+        if proc.returncode != 0:
+            stderr = proc.stderr.decode("utf-8", errors="replace").strip().splitlines()
+            raise RenderFailed("ffmpeg退出码 %d: %s" % (proc.returncode, "\n".join(stderr[-20:])))
+        return output_path
@@ -12,6 +12,7 @@ from . import exceptions
 from .template_mode import ImportedTrack, EditableTrack, ImportedMediaTrack, ImportedTextTrack, ShrinkMode, ExtendMode, import_track
 from .time_util import Timerange, tim, srt_tstamp
 from .local_materials import VideoMaterial, AudioMaterial
+from .path_rewrite import PathRewrite
 from .segment import BaseSegment, Speed, ClipSettings
 from .audio_segment import AudioSegment, AudioFade, AudioEffect
 from .video_segment import VideoSegment, StickerSegment, SegmentAnimations, VideoEffect, Transition, Filter, BackgroundFilling
@@ -97,14 +98,14 @@ class ScriptMaterial:
         else:
             raise TypeError("Invalid argument type '%s'" % type(item))
 
-    def export_json(self) -> Dict[str, List[Any]]:
+    def export_json(self, path_rewrite: Optional[PathRewrite] = None) -> Dict[str, List[Any]]:
         return {
             "ai_translates": [],
             "audio_balances": [],
             "audio_effects": [effect.export_json() for effect in self.audio_effects],
             "audio_fades": [fade.export_json() for fade in self.audio_fades],
             "audio_track_indexes": [],
-            "audios": [audio.export_json() for audio in self.audios],
+            "audios": [audio.export_json(path_rewrite) for audio in self.audios],
             "beats": [],
             "canvases": [canvas.export_json() for canvas in self.canvases],
             "chromas": [],
@@ -141,7 +142,7 @@ class ScriptMaterial:
             "transitions": [transition.export_json() for transition in self.transitions],
             "video_effects": [effect.export_json() for effect in self.video_effects],
             "video_trackings": [],
-            "videos": [video.export_json() for video in self.videos],
+            "videos": [video.export_json(path_rewrite) for video in self.videos],
             "vocal_beautifys": [],
             "vocal_separations": []
         }
@@ -173,6 +174,9 @@ class ScriptFile:
     imported_tracks: List[ImportedTrack]
     """导入的轨道信息"""
 
+    path_rewrite: Optional[PathRewrite]
+    """导出时对视频/音频素材路径的改写策略, 素材自身设置的策略优先"""
+
     def __init__(self, width: int, height: int, fps: int = 30):
         """**创建剪映草稿推荐使用`DraftFolder.create_draft()`而非此方法**
 
@@ -194,6 +198,8 @@ class ScriptFile:
         self.imported_materials = {}
         self.imported_tracks = []
 
+        self.path_rewrite = None
+
         with open(assets.get_asset_path('DRAFT_CONTENT_TEMPLATE'), "r", encoding="utf-8") as f:
             self.content = json.load(f)
 
@@ -779,10 +785,13 @@ class ScriptFile:
         self.content["fps"] = self.fps
         self.content["duration"] = self.duration
         self.content["canvas_config"] = {"width": self.width, "height": self.height, "ratio": "original"}
-        self.content["materials"] = self.materials.export_json()
+        self.content["materials"] = self.materials.export_json(self.path_rewrite)
 
         # 合并导入的素材
         for material_type, material_list in self.imported_materials.items():
+            if self.path_rewrite is not None and material_type in ("videos", "audios"):
+                material_list = [dict(mat, path=self.path_rewrite(mat["path"])) if mat.get("path") else mat
+                                 for mat in material_list]
             if material_type not in self.content["materials"]:
                 self.content["materials"][material_type] = material_list
             else:
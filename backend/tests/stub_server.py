@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+测试用本地 HTTP 服务
+包含：
+1. StubServer：在后台线程中运行的 ThreadingHTTPServer，按路径返回预设响应
+2. 支持 Range / 不支持 Range 的文件响应，可模拟传输中途断开
+3. 重定向与错误页响应
+"""
+
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+RANGE_PATTERN = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+class FileRoute:
+    """返回一段固定数据的文件
+
+    Args:
+        data: 文件内容
+        ranges: 是否支持 Range 请求
+        drop_after: 前 drop_times 次 GET 只发送这么多字节后断开连接
+        drop_times: 模拟断开的次数
+    """
+
+    def __init__(self, data: bytes, *, ranges: bool = True, drop_after: Optional[int] = None, drop_times: int = 1):
+        self.data = data
+        self.ranges = ranges
+        self.drop_after = drop_after
+        self.drop_times = drop_times
+        self.range_headers: List[Optional[str]] = []
+        self._lock = threading.Lock()
+
+    def _should_drop(self) -> bool:
+        with self._lock:
+            if self.drop_after is None or self.drop_times <= 0:
+                return False
+            self.drop_times -= 1
+            return True
+
+    def handle(self, handler: "_Handler", head: bool) -> None:
+        range_header = handler.headers.get("Range")
+        if not head:
+            self.range_headers.append(range_header)
+        total = len(self.data)
+        start, end, status = 0, total - 1, 200
+        match = RANGE_PATTERN.fullmatch(range_header or "")
+        if self.ranges and match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), total - 1) if match.group(2) else total - 1
+            status = 206
+        body = self.data[start:end + 1]
+
+        handler.send_response(status)
+        handler.send_header("Content-Length", str(len(body)))
+        if self.ranges:
+            handler.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            handler.send_header("Content-Range", f"bytes {start}-{end}/{total}")
+        handler.end_headers()
+        if head:
+            return
+        if not self._should_drop():
+            handler.wfile.write(body)
+            return
+        # 只发一部分就断开，客户端读到的内容少于 Content-Length
+        handler.wfile.write(body[:self.drop_after])
+        handler.wfile.flush()
+        handler.close_connection = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _dispatch(self, head: bool) -> None:
+        server: "StubServer" = self.server.stub  # type: ignore
+        path = self.path.split("?", 1)[0]
+        server.hits[path] = server.hits.get(path, 0) + 1
+        route = server.routes.get(path)
+        if route is None:
+            self.send_error(404)
+        elif isinstance(route, FileRoute):
+            route.handle(self, head)
+        else:
+            route(self)
+
+    def do_HEAD(self) -> None:
+        self._dispatch(head=True)
+
+    def do_GET(self) -> None:
+        self._dispatch(head=False)
+
+
+class StubServer:
+    """用法：
+
+        with StubServer() as server:
+            server.routes["/a.mp4"] = FileRoute(b"...")
+            requests.get(server.url("/a.mp4"))
+    """
+
+    def __init__(self):
+        self.routes: Dict[str, object] = {}
+        self.hits: Dict[str, int] = {}
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self  # type: ignore
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}{path}"
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def redirect(location: str, status: int = 302) -> Callable[[BaseHTTPRequestHandler], None]:
+    def route(handler: BaseHTTPRequestHandler) -> None:
+        handler.send_response(status)
+        handler.send_header("Location", location)
+        handler.send_header("Content-Length", "0")
+        handler.end_headers()
+    return route
+
+
+def page(body: str, status: int = 200) -> Callable[[BaseHTTPRequestHandler], None]:
+    def route(handler: BaseHTTPRequestHandler) -> None:
+        data = body.encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+    return route
@@ -0,0 +1,121 @@
+import time
+import asyncio
+import unittest
+from importlib.util import find_spec
+
+import httpx
+import requests
+
+from tests.stub_server import StubServer, page, redirect
+
+if find_spec("fastmcp") is not None:
+    from douyinmcp import DouyinProcessor, TTLCache
+
+
+@unittest.skipUnless(find_spec("fastmcp"), "需要 fastmcp")
+class ResolveVideoIdTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.processor = DouyinProcessor(log=lambda _: None)
+
+    def test_follows_redirect_chain(self):
+        self.server.routes["/s/abc"] = redirect("/r/1")
+        self.server.routes["/r/1"] = redirect(self.server.url("/share/video/7301?region=CN"))
+        self.assertEqual(self.processor.resolve_video_id(self.server.url("/s/abc")), "7301")
+        # 跳转地址中已出现 /video/<id>，不再请求分享页本身
+        self.assertEqual(self.server.hits, {"/s/abc": 1, "/r/1": 1})
+
+    def test_error_page_raises_and_is_not_cached(self):
+        self.server.routes["/s/gone"] = page("not found", status=404)
+        share_url = self.server.url("/s/gone")
+        with self.assertRaises(requests.HTTPError):
+            self.processor.resolve_video_id(share_url)
+        self.assertIsNone(self.processor.link_cache.get(share_url))
+
+    def test_page_without_video_id_raises_and_is_not_cached(self):
+        self.server.routes["/s/home"] = redirect("/home")
+        self.server.routes["/home"] = page("<html></html>")
+        share_url = self.server.url("/s/home")
+        with self.assertRaises(ValueError):
+            self.processor.resolve_video_id(share_url)
+        self.assertIsNone(self.processor.link_cache.get(share_url))
+
+        # 之后链接恢复正常时重新解析，而不是返回缓存的错误结果
+        self.server.routes["/s/home"] = redirect("/share/video/42")
+        self.assertEqual(self.processor.resolve_video_id(share_url), "42")
+
+    def test_cache_hit_within_ttl(self):
+        self.server.routes["/s/abc"] = redirect("/share/video/7301")
+        share_url = self.server.url("/s/abc")
+        self.assertEqual(self.processor.resolve_video_id(share_url), "7301")
+        self.assertEqual(self.processor.resolve_video_id(share_url), "7301")
+        self.assertEqual(self.server.hits["/s/abc"], 1)
+
+    def test_cache_expires_after_ttl(self):
+        self.processor.link_cache = TTLCache(ttl=0.05)
+        self.server.routes["/s/abc"] = redirect("/share/video/7301")
+        share_url = self.server.url("/s/abc")
+        self.processor.resolve_video_id(share_url)
+        time.sleep(0.1)
+        self.processor.resolve_video_id(share_url)
+        self.assertEqual(self.server.hits["/s/abc"], 2)
+
+
+@unittest.skipUnless(find_spec("fastmcp"), "需要 fastmcp")
+class AsyncResolveVideoIdTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.processor = DouyinProcessor(log=lambda _: None)
+
+    def _resolve(self, share_url: str) -> str:
+        return asyncio.run(self.processor.aresolve_video_id(share_url))
+
+    def test_follows_redirect_chain(self):
+        self.server.routes["/s/abc"] = redirect("/r/1")
+        self.server.routes["/r/1"] = redirect("/share/video/7301")
+        self.assertEqual(self._resolve(self.server.url("/s/abc")), "7301")
+        self.assertEqual(self.server.hits, {"/s/abc": 1, "/r/1": 1})
+
+    def test_redirect_body_is_not_downloaded(self):
+        def slow_redirect(handler):
+            # 声明了很大的响应体却不发送：只读响应头时立即返回，读取响应体则会一直等到超时
+            handler.send_response(302)
+            handler.send_header("Location", "/share/video/7301")
+            handler.send_header("Content-Length", str(64 * 1024 * 1024))
+            handler.end_headers()
+            handler.close_connection = True
+        self.server.routes["/s/abc"] = slow_redirect
+        started = time.monotonic()
+        self.assertEqual(self._resolve(self.server.url("/s/abc")), "7301")
+        self.assertLess(time.monotonic() - started, 3)
+
+    def test_client_closed_when_loop_changes(self):
+        self.server.routes["/s/abc"] = redirect("/share/video/7301")
+        self.server.routes["/s/def"] = redirect("/share/video/7302")
+        self._resolve(self.server.url("/s/abc"))
+        first = self.processor._aclient
+        self._resolve(self.server.url("/s/def"))
+        self.assertIsNot(self.processor._aclient, first)
+        self.assertTrue(first.is_closed)
+
+    def test_error_page_raises_and_is_not_cached(self):
+        self.server.routes["/s/gone"] = page("not found", status=404)
+        share_url = self.server.url("/s/gone")
+        with self.assertRaises(httpx.HTTPStatusError):
+            self._resolve(share_url)
+        self.assertIsNone(self.processor.link_cache.get(share_url))
+
+    def test_page_without_video_id_raises_and_is_not_cached(self):
+        self.server.routes["/s/home"] = page("<html></html>")
+        share_url = self.server.url("/s/home")
+        with self.assertRaises(ValueError):
+            self._resolve(share_url)
+        self.assertIsNone(self.processor.link_cache.get(share_url))
+
+
+if __name__ == "__main__":
+    unittest.main()
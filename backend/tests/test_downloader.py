@@ -0,0 +1,81 @@
+import os
+import hashlib
+import tempfile
+import unittest
+
+from downloader import Downloader, DownloadError
+from tests.stub_server import FileRoute, StubServer
+
+DATA = os.urandom(3 * 1024 * 1024 + 123)
+
+
+def _downloader(**kwargs) -> Downloader:
+    options = dict(chunk_size=64 * 1024, segment_count=4, parallel_threshold=1024 * 1024, retries=2)
+    options.update(kwargs)
+    return Downloader(**options)
+
+
+class DownloaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dest = os.path.join(self.tmp.name, "out.mp4")
+
+    def _read(self) -> bytes:
+        with open(self.dest, "rb") as f:
+            return f.read()
+
+    def test_parallel_range_download(self):
+        route = self.server.routes["/v.mp4"] = FileRoute(DATA)
+        stats = _downloader().download(self.server.url("/v.mp4"), self.dest, expected_size=len(DATA),
+                                       sha256=hashlib.sha256(DATA).hexdigest())
+        self.assertEqual(self._read(), DATA)
+        self.assertEqual(stats.segments, 4)
+        self.assertEqual(stats.bytes, len(DATA))
+        self.assertEqual(len([h for h in route.range_headers if h and h != "bytes=0-0"]), 4)
+        self.assertFalse(os.path.exists(self.dest + ".part"))
+
+    def test_parallel_segment_retries_after_drop(self):
+        self.server.routes["/v.mp4"] = FileRoute(DATA, drop_after=1000, drop_times=2)
+        stats = _downloader().download(self.server.url("/v.mp4"), self.dest)
+        self.assertEqual(self._read(), DATA)
+        self.assertEqual(stats.retries, 2)
+
+    def test_resume_from_existing_part(self):
+        route = self.server.routes["/v.mp4"] = FileRoute(DATA)
+        with open(self.dest + ".part", "wb") as f:
+            f.write(DATA[:1000])
+        _downloader(segment_count=1).download(self.server.url("/v.mp4"), self.dest)
+        self.assertEqual(self._read(), DATA)
+        self.assertIn("bytes=1000-", route.range_headers)
+
+    def test_non_range_server_restarts_after_drop(self):
+        route = self.server.routes["/v.mp4"] = FileRoute(DATA, ranges=False, drop_after=500 * 1024)
+        # 不支持 Range 时已有的 .part 不能续传
+        with open(self.dest + ".part", "wb") as f:
+            f.write(b"stale")
+        stats = _downloader().download(self.server.url("/v.mp4"), self.dest)
+        self.assertEqual(self._read(), DATA)
+        self.assertEqual(stats.segments, 1)
+        self.assertEqual(stats.retries, 1)
+        self.assertTrue(all(h is None for h in route.range_headers if h != "bytes=0-0"))
+
+    def test_size_mismatch(self):
+        self.server.routes["/v.mp4"] = FileRoute(DATA)
+        with self.assertRaises(DownloadError):
+            _downloader().download(self.server.url("/v.mp4"), self.dest, expected_size=len(DATA) + 1)
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertFalse(os.path.exists(self.dest + ".part"))
+
+    def test_sha256_mismatch(self):
+        self.server.routes["/v.mp4"] = FileRoute(DATA)
+        with self.assertRaises(DownloadError):
+            _downloader().download(self.server.url("/v.mp4"), self.dest, sha256="0" * 64)
+        self.assertFalse(os.path.exists(self.dest))
+
+
+if __name__ == "__main__":
+    unittest.main()
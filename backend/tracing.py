@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+请求级追踪与指标
+包含：
+1. trace id / span：contextvars 传播，每个请求、每个流水线阶段一个 span
+2. TraceIdFilter：把 trace id 注入日志记录
+3. 指标：Counter / Gauge / Histogram，/metrics 输出 Prometheus 文本格式
+4. SpanExporter：后台线程把 span 按 OTLP/HTTP JSON 批量发送到本地采集器（可选）
+"""
+
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib import request as urlrequest
+
+_trace_id: contextvars.ContextVar[str] = contextvars.ContextVar("trace_id", default="-")
+_span_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span_id", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def get_trace_id() -> str:
+    return _trace_id.get()
+
+
+def set_trace_id(trace_id: str) -> contextvars.Token:
+    return _trace_id.set(trace_id)
+
+
+def reset_trace_id(token: contextvars.Token) -> None:
+    _trace_id.reset(token)
+
+
+class TraceIdFilter(logging.Filter):
+    """为日志记录添加 trace_id 字段"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = _trace_id.get()
+        return True
+
+
+# ========================
+# 指标
+# ========================
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in items)
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelKey, List[float]] = {}  # 每个桶的计数 + [sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            data = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, data in self._values.items():
+                for i, bound in enumerate(self.buckets):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(float(bound))))} {data[i]}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {data[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {data[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {data[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+HTTP_DURATION: Histogram = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（到响应头返回为止）"))
+HTTP_IN_FLIGHT: Gauge = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "正在处理的 HTTP 请求数"))
+SPAN_DURATION: Histogram = REGISTRY.register(Histogram(
+    "span_duration_seconds", "各阶段 span 耗时"))
+SPAN_IN_FLIGHT: Gauge = REGISTRY.register(Gauge(
+    "spans_in_flight", "正在执行的 span 数"))
+UPSTREAM_ERRORS: Counter = REGISTRY.register(Counter(
+    "upstream_errors_total", "上游服务（大模型、视频生成、下载）调用失败次数"))
+
+
+def record_upstream_error(service: str, error: Optional[BaseException] = None) -> None:
+    UPSTREAM_ERRORS.inc(service=service, error=type(error).__name__ if error else "unknown")
+
+
+# ========================
+# Span
+# ========================
+class SpanExporter:
+    """后台批量发送 span 到 OTLP/HTTP JSON 采集器，如 http://127.0.0.1:4318/v1/traces"""
+
+    def __init__(self, endpoint: str, service_name: str, *, batch_size: int = 64,
+                 flush_interval: float = 2.0, max_queue: int = 10000):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # 采集器不可用时丢弃，不能阻塞请求
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._send(batch)
+            except Exception:
+                pass
+
+    def _send(self, spans: List[Dict[str, Any]]) -> None:
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [{
+                "traceId": s["trace_id"],
+                "spanId": s["span_id"],
+                "parentSpanId": s["parent_id"] or "",
+                "name": s["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(int(s["start"] * 1e9)),
+                "endTimeUnixNano": str(int((s["start"] + s["duration"]) * 1e9)),
+                "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in s["attrs"].items()],
+                "status": {"code": 2 if s["error"] else 1},
+            } for s in spans]}],
+        }]}
+        req = urlrequest.Request(self.endpoint, data=json.dumps(payload).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"})
+        urlrequest.urlopen(req, timeout=5).close()
+
+
+_exporter: Optional[SpanExporter] = None
+_span_log: Optional[Callable[[str], None]] = None
+
+
+def configure(*, collector_url: Optional[str] = None, service_name: str = "llmserver",
+              log: Optional[Callable[[str], None]] = None) -> None:
+    """配置 span 输出
+
+    Args:
+        collector_url: OTLP/HTTP JSON 采集器地址，为空时不发送
+        service_name: 上报的服务名
+        log: 日志函数，每个 span 结束时输出一行结构化记录
+    """
+    global _exporter, _span_log
+    if collector_url:
+        _exporter = SpanExporter(collector_url, service_name)
+    _span_log = log
+
+
+def _start(name: str, attrs: Dict[str, Any], trace_id: str, parent_id: Optional[str]) -> Dict[str, Any]:
+    SPAN_IN_FLIGHT.inc(span=name)
+    return {"trace_id": trace_id, "span_id": uuid.uuid4().hex[:16], "parent_id": parent_id,
+            "name": name, "attrs": dict(attrs), "start": time.time(), "t0": time.perf_counter(), "error": None}
+
+
+def _finish(record: Dict[str, Any]) -> None:
+    record["duration"] = time.perf_counter() - record["t0"]
+    SPAN_IN_FLIGHT.dec(span=record["name"])
+    SPAN_DURATION.observe(record["duration"], span=record["name"], status="error" if record["error"] else "ok")
+    if _span_log is not None:
+        _span_log("span " + json.dumps(
+            {k: record[k] for k in ("trace_id", "span_id", "parent_id", "name", "duration", "error", "attrs")},
+            ensure_ascii=False, default=str))
+    if _exporter is not None:
+        _exporter.export(record)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """记录一段执行的耗时；没有 trace id 时自动生成一个
+
+    yield 出的 dict 可在执行过程中补充属性
+    """
+    trace_token = _trace_id.set(new_trace_id()) if _trace_id.get() == "-" else None
+    record = _start(name, attrs, _trace_id.get(), _span_id.get())
+    span_token = _span_id.set(record["span_id"])
+    try:
+        yield record["attrs"]
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        _finish(record)
+        _span_id.reset(span_token)
+        if trace_token is not None:
+            _trace_id.reset(trace_token)
+
+
+def traced_iter(name: str, iterable: Iterable, **attrs) -> Iterator:
+    """为流式响应包一层 span，迭代结束（或客户端断开）时才结束计时
+
+    流式响应的每次迭代可能在不同的上下文中执行，这里只在创建时读取 trace id，
+    不修改 contextvars。
+    """
+    trace_id, parent_id = _trace_id.get(), _span_id.get()
+
+    def gen():
+        record = _start(name, attrs, trace_id if trace_id != "-" else new_trace_id(), parent_id)
+        try:
+            yield from iterable
+        except BaseException as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            _finish(record)
+    return gen()
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
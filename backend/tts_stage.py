@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 合成阶段（进程池并行）
+包含：
+1. 每个 worker 进程只初始化一次 pyttsx3 引擎（warm engine）
+2. 相同文本只合成一次
+3. 返回真实音频时长（微秒），供片段时间范围使用
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+# worker 进程内的全局引擎
+_engine = None
+
+
+class TTSResult(NamedTuple):
+    path: str
+    """MP3 文件路径"""
+    duration: int
+    """音频时长, 单位为微秒"""
+
+
+def _init_worker(converter: Optional[str]) -> None:
+    global _engine
+    import pyttsx3
+    from pydub import AudioSegment
+
+    if converter:
+        AudioSegment.converter = converter
+    _engine = pyttsx3.init()
+
+
+def _synthesize(text: str, mp3_path: str) -> int:
+    """在 worker 中合成一句话并转为 MP3，返回时长（微秒）"""
+    global _engine
+    import pyttsx3
+    from pydub import AudioSegment
+
+    if _engine is None:
+        _engine = pyttsx3.init()
+
+    wav_path = os.path.splitext(mp3_path)[0] + ".wav"
+    try:
+        _engine.save_to_file(text, wav_path)
+        _engine.runAndWait()
+    except RuntimeError:
+        # 引擎状态异常时重建一次
+        _engine = pyttsx3.init()
+        _engine.save_to_file(text, wav_path)
+        _engine.runAndWait()
+
+    audio = AudioSegment.from_wav(wav_path)
+    audio.export(mp3_path, format="mp3")
+    os.remove(wav_path)
+    return len(audio) * 1000  # pydub 长度单位为毫秒
+
+
+class TTSStage:
+    """并行 TTS 合成阶段，进程池在首次使用时创建并复用"""
+
+    def __init__(self, max_workers: Optional[int] = None, converter: Optional[str] = None):
+        """
+        Args:
+            max_workers: 进程池大小，默认由 ProcessPoolExecutor 决定
+            converter: pydub 使用的 ffmpeg 路径
+        """
+        self.max_workers = max_workers
+        self.converter = converter
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # 多个生成任务在不同线程中并发调用，创建进程池需要加锁
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.converter,),
+                )
+            return self._pool
+
+    def synthesize(self, texts: List[str], out_dir: str, prefix: str = "audio") -> List[TTSResult]:
+        """并行合成所有文本，结果与 texts 一一对应
+
+        文件名按文本首次出现的序号命名（audio1.mp3, audio2.mp3, ...），
+        重复文本共用同一个文件。
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        futures: Dict[str, tuple] = {}
+        for idx, text in enumerate(texts, start=1):
+            if text in futures:
+                continue
+            mp3_path = os.path.join(out_dir, f"{prefix}{idx}.mp3")
+            futures[text] = (mp3_path, self.pool.submit(_synthesize, text, mp3_path))
+
+        results: Dict[str, TTSResult] = {}
+        for text, (mp3_path, future) in futures.items():
+            results[text] = TTSResult(mp3_path, future.result())
+        return [results[text] for text in texts]
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
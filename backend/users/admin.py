@@ -14,6 +14,7 @@ from .models import EditRequest  # ← 确保这里导入了模型
 @admin.register(EditRequest)
 class EditRequestAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'username', 'content_preview', 'created_at', 'evaluation')
+    list_select_related = ('user',)
     search_fields = ('username', 'content', 'evaluation')
     list_filter = ('created_at',)
     readonly_fields = ('created_at',)
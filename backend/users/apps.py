@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        # 注册信号：分组变化时清除角色缓存，新建连接时设置 SQLite PRAGMA，需求变化时更新统计汇总
+        from . import jobs, roles, rollups, sqlite  # noqa: F401
+        # 接着执行上次进程退出时遗留的草稿任务
+        jobs.start_on_boot()
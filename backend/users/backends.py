@@ -4,9 +4,11 @@ from .models import User
 class EmailBackend(object):
     def authenticate(self, request, **credentials):
         email = credentials.get('email', credentials.get('username'))
+        if not email:
+            return None
         try:
             user = User.objects.get(email=email)
-        except User.DoesNotExist:
+        except (User.DoesNotExist, User.MultipleObjectsReturned):
             pass
         else:
             if user.check_password(credentials["password"]):
@@ -0,0 +1,120 @@
+import os
+import sys
+import datetime
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management import get_commands
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EditRequest
+from .pagination import invalidate_first_pages
+
+# 自动生成草稿的任务队列
+# 队列就是 job_status='queued' 的 EditRequest：提交事务完成后唤醒本进程的后台线程，
+# 线程逐条认领（条件 UPDATE，避免重复执行）并请求 llmserver 的 /chat_jianying，
+# 认领时记录 job_started_at，进程中途退出留下的 running 任务超过 DRAFT_JOB_TIMEOUT 后重新认领；
+# 服务启动时（UsersConfig.ready）唤醒一次，接着执行遗留的任务
+
+_lock = threading.Lock()
+_executor = None
+_active = 0
+
+
+def enqueue_on_commit() -> None:
+    """在提交需求的事务完成后唤醒后台线程"""
+    transaction.on_commit(kick)
+
+
+def kick() -> None:
+    """启动取任务的线程，最多 DRAFT_JOB_WORKERS 个"""
+    global _executor, _active
+    with _lock:
+        if _active >= settings.DRAFT_JOB_WORKERS:
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.DRAFT_JOB_WORKERS,
+                                           thread_name_prefix='draft-job')
+        _active += 1
+    _executor.submit(_drain)
+
+
+def start_on_boot() -> None:
+    """服务进程启动时唤醒一次；migrate、test 等管理命令和 runserver 的自动重载父进程不启动"""
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command in get_commands():
+        if command != 'runserver':
+            return
+        if '--noreload' not in sys.argv and os.environ.get('RUN_MAIN') != 'true':
+            return
+    kick()
+
+
+def _claimable() -> Q:
+    """排队中，或认领后超过 DRAFT_JOB_TIMEOUT 仍未完成（执行的进程已退出）"""
+    stale = timezone.now() - datetime.timedelta(seconds=settings.DRAFT_JOB_TIMEOUT)
+    return Q(job_status=EditRequest.JOB_QUEUED) | (
+        Q(job_status=EditRequest.JOB_RUNNING) & (Q(job_started_at__lt=stale) | Q(job_started_at__isnull=True)))
+
+
+def _claim():
+    """认领最早的可执行任务，返回 (id, 认领时间)，没有时返回 None"""
+    claimable = _claimable()
+    for pk in EditRequest.objects.filter(claimable).order_by('id').values_list('id', flat=True)[:10]:
+        started_at = timezone.now()
+        claimed = EditRequest.objects.filter(claimable, pk=pk).update(
+            job_status=EditRequest.JOB_RUNNING, job_error=None, job_started_at=started_at)
+        if claimed:
+            return pk, started_at
+    return None
+
+
+def _drain() -> None:
+    global _active
+    pending = False
+    try:
+        while True:
+            close_old_connections()
+            claimed = _claim()
+            if claimed is None:
+                break
+            invalidate_first_pages()
+            _run(*claimed)
+            invalidate_first_pages()
+        # 退出前又有新任务排队时重新唤醒；出错退出时不重新唤醒，等下一次提交再试，避免反复起线程
+        pending = EditRequest.objects.filter(_claimable()).exists()
+    except Exception:
+        print(f"草稿任务线程异常：{traceback.format_exc()}")
+    finally:
+        with _lock:
+            _active -= 1
+        connection.close()  # 线程空闲时不占着数据库连接
+    if pending:
+        kick()
+
+
+def _run(pk, started_at) -> None:
+    # 只更新本次认领的结果，超时后已被重新认领的任务以新的执行为准
+    claim = EditRequest.objects.filter(pk=pk, job_status=EditRequest.JOB_RUNNING, job_started_at=started_at)
+    edit_request = EditRequest.objects.only('id', 'content').get(pk=pk)
+    print(f"开始生成草稿：需求 {pk}")
+    try:
+        resp = requests.post(settings.DRAFT_SERVICE_URL, json={
+            'project_name': f'edit_request_{pk}',
+            # 需求内容作为流水线中的主题变量
+            'variables': {'project_name': edit_request.content},
+        }, timeout=settings.DRAFT_JOB_TIMEOUT)
+        data = resp.json()
+        if not resp.ok or not data.get('download_url'):
+            raise RuntimeError(data.get('error') or f'HTTP {resp.status_code}')
+    except Exception as e:
+        claim.update(job_status=EditRequest.JOB_FAILED, job_error=str(e))
+        print(f"草稿生成失败：需求 {pk}，{e}")
+        return
+    claim.update(job_status=EditRequest.JOB_SUCCEEDED, download_url=data['download_url'], job_error=None)
+    print(f"草稿生成完成：需求 {pk}，{data['download_url']}")
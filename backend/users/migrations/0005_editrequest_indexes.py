@@ -0,0 +1,21 @@
+# Generated by Django 3.2.3 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_delete_chatlog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='editrequest',
+            index=models.Index(fields=['created_at', 'id'], name='editrequest_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='editrequest',
+            index=models.Index(fields=['username', 'created_at'], name='editrequest_username_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.3 on 2026-10-19 13:45
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def build_rollups(apps, schema_editor):
+    """按已有数据生成汇总；历史评价没有评价时间，不计入耗时分布"""
+    EditRequest = apps.get_model('users', 'EditRequest')
+    EditRequestRollup = apps.get_model('users', 'EditRequestRollup')
+    counts = Counter()
+    for username, created_at, evaluation in EditRequest.objects.values_list(
+            'username', 'created_at', 'evaluation').iterator(chunk_size=2000):
+        status = 'evaluated' if (evaluation or '').strip() else 'pending'
+        counts[(timezone.localdate(created_at), username, status)] += 1
+    EditRequestRollup.objects.bulk_create(
+        [EditRequestRollup(day=day, username=username, status=status, count=count)
+         for (day, username, status), count in counts.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_email_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EditRequestRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('username', models.CharField(max_length=150)),
+                ('status', models.CharField(choices=[('pending', '待评价'), ('evaluated', '已评价')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EvaluationLatencyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('bucket', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='editrequest',
+            name='evaluated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='evaluationlatencyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'bucket'), name='evaluation_latency_rollup_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='editrequestrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'username', 'status'), name='editrequest_rollup_key'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.3 on 2026-10-19 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_editrequest_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='editrequest',
+            name='download_url',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='editrequest',
+            name='job_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='editrequest',
+            name='job_status',
+            field=models.CharField(blank=True, choices=[('queued', '排队中'), ('running', '生成中'), ('succeeded', '已完成'), ('failed', '失败')], default='', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='editrequest',
+            index=models.Index(fields=['job_status', 'id'], name='editrequest_job_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_editrequest_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='editrequest',
+            name='job_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils.translation import gettext_lazy as _
 
 # python manage.py makemigrations users
 # python manage.py migrate
 class User(AbstractUser):
     nickname = models.CharField(max_length=50, blank=True)
+    # EmailBackend 按邮箱登录，加索引
+    email = models.EmailField(_('email address'), blank=True, db_index=True)
 
     class Meta(AbstractUser.Meta):
         pass
@@ -27,7 +30,64 @@ class EditRequest(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     evaluation = models.TextField(blank=True, null=True)
+    evaluated_at = models.DateTimeField(blank=True, null=True)  # 首次评价时间，由 users/rollups.py 维护
+
+    # 自动生成草稿任务（users/jobs.py），未开启自动生成时为空
+    JOB_QUEUED = 'queued'
+    JOB_RUNNING = 'running'
+    JOB_SUCCEEDED = 'succeeded'
+    JOB_FAILED = 'failed'
+    JOB_STATUS_CHOICES = [
+        (JOB_QUEUED, '排队中'),
+        (JOB_RUNNING, '生成中'),
+        (JOB_SUCCEEDED, '已完成'),
+        (JOB_FAILED, '失败'),
+    ]
+    job_status = models.CharField(max_length=20, choices=JOB_STATUS_CHOICES, blank=True, default='')
+    download_url = models.CharField(max_length=500, blank=True, default='')
+    job_error = models.TextField(blank=True, null=True)
+    job_started_at = models.DateTimeField(blank=True, null=True)  # 认领时间，超时未完成的任务会被重新认领
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='editrequest_created_idx'),
+            models.Index(fields=['username', 'created_at'], name='editrequest_username_idx'),
+            models.Index(fields=['job_status', 'id'], name='editrequest_job_idx'),
+        ]
 
     def __str__(self):
         return f"{self.username} - {self.content[:20]}"
 
+    @property
+    def is_evaluated(self):
+        return bool((self.evaluation or '').strip())
+
+
+# 统计汇总表，由 users/rollups.py 在 EditRequest 保存/删除时增量维护，看板只读这些表
+class EditRequestRollup(models.Model):
+    """按 提交日期 + 用户 + 评价状态 汇总的需求数量"""
+    STATUS_PENDING = 'pending'
+    STATUS_EVALUATED = 'evaluated'
+    STATUS_CHOICES = [(STATUS_PENDING, '待评价'), (STATUS_EVALUATED, '已评价')]
+
+    day = models.DateField()
+    username = models.CharField(max_length=150)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'username', 'status'], name='editrequest_rollup_key'),
+        ]
+
+
+class EvaluationLatencyRollup(models.Model):
+    """按 评价日期 + 耗时分桶 汇总的评价数量，bucket 为该桶耗时上限（秒）"""
+    day = models.DateField()
+    bucket = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'bucket'], name='evaluation_latency_rollup_key'),
+        ]
@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from rest_framework.pagination import CursorPagination
+
+# 剪辑需求列表返回的字段
+EDIT_REQUEST_FIELDS = ("id", "username", "content", "evaluation", "created_at",
+                       "job_status", "download_url", "job_error")
+
+# 允许的排序方式，第二个字段保证顺序稳定
+EDIT_REQUEST_ORDERINGS = {
+    "-created_at": ("-created_at", "-id"),
+    "created_at": ("created_at", "id"),
+    "-id": ("-id",),
+    "id": ("id",),
+}
+
+# 首页缓存秒数。版本号只在本进程内递增，其他 worker 的新增 / 修改最多延迟这么久可见
+FIRST_PAGE_TIMEOUT = 5
+_GENERATION_KEY = "edit_requests:generation"
+
+
+class EditRequestCursorPagination(CursorPagination):
+    """按游标分页，翻页代价与表大小无关"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = EDIT_REQUEST_ORDERINGS["-created_at"]
+
+
+def first_page_cache_key(user_id) -> str:
+    """每个用户一份首页缓存，键中带全局版本号，数据变化后旧缓存自然失效"""
+    generation = cache.get_or_set(_GENERATION_KEY, 1, None)
+    return f"edit_requests:first_page:{generation}:{user_id}"
+
+
+def invalidate_first_pages() -> None:
+    """EditRequest 新增或修改后调用"""
+    try:
+        cache.incr(_GENERATION_KEY)
+    except ValueError:
+        cache.set(_GENERATION_KEY, 1, None)
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+# 分组名称
+EDITOR_GROUP = '剪辑师'
+USER_GROUP = '用户'
+
+# 秒。分组变化时本进程会主动失效，但 LocMem 缓存和信号都只在本进程内，
+# 多个 worker 之间最多相差这么久，所以取得很短，只用来合并同一时段内的重复查询
+ROLE_CACHE_TIMEOUT = 5
+
+User = get_user_model()
+
+
+def _cache_key(user_id) -> str:
+    return f"user_groups:{user_id}"
+
+
+def get_group_names(user) -> frozenset:
+    """用户所属分组名称
+
+    依次使用：对象上的缓存、prefetch_related('groups') 的结果、进程缓存，最后才查库
+    """
+    names = getattr(user, '_group_names', None)
+    if names is not None:
+        return names
+    key = _cache_key(user.pk)
+    prefetched = getattr(user, '_prefetched_objects_cache', {})
+    if 'groups' in prefetched:
+        names = frozenset(g.name for g in prefetched['groups'])
+        cache.set(key, names, ROLE_CACHE_TIMEOUT)
+    else:
+        names = cache.get(key)
+        if names is None:
+            names = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(key, names, ROLE_CACHE_TIMEOUT)
+    user._group_names = names
+    return names
+
+
+def is_editor(user) -> bool:
+    return EDITOR_GROUP in get_group_names(user)
+
+
+def get_role(user) -> str:
+    """editor / user / unknown"""
+    names = get_group_names(user)
+    if EDITOR_GROUP in names:
+        return 'editor'
+    if USER_GROUP in names:
+        return 'user'
+    return 'unknown'
+
+
+def invalidate(user_ids) -> None:
+    cache.delete_many([_cache_key(pk) for pk in user_ids])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        # user.groups.add(...)：instance 是用户
+        invalidate([instance.pk])
+    elif pk_set:
+        # group.user_set.add(...)：pk_set 是用户
+        invalidate(pk_set)
+    elif action == 'pre_clear':
+        # group.user_set.clear() 之后取不到成员，在清空前失效
+        invalidate(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def _group_changed(sender, instance, **kwargs):
+    """分组改名或删除后，成员的角色随之变化"""
+    if instance.pk is not None:
+        invalidate(instance.user_set.values_list('pk', flat=True))
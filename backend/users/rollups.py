@@ -0,0 +1,176 @@
+import datetime
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import EditRequest, EditRequestRollup, EvaluationLatencyRollup
+
+# 评价耗时分桶上限（秒）：1 分钟 … 7 天，最后一个桶收集更长的耗时
+LATENCY_BUCKETS = [60, 300, 900, 1800, 3600, 2 * 3600, 4 * 3600, 8 * 3600, 24 * 3600,
+                   2 * 24 * 3600, 7 * 24 * 3600, 10 ** 9]
+
+
+def latency_bucket(seconds: float) -> int:
+    for bound in LATENCY_BUCKETS:
+        if seconds <= bound:
+            return bound
+    return LATENCY_BUCKETS[-1]
+
+
+def _status(evaluated: bool) -> str:
+    return EditRequestRollup.STATUS_EVALUATED if evaluated else EditRequestRollup.STATUS_PENDING
+
+
+def _request_key(username, created_at, evaluated):
+    return timezone.localdate(created_at), username, _status(evaluated)
+
+
+def _bump(model, keys: dict, delta: int) -> None:
+    """count += delta，没有这一行时插入"""
+    if not delta:
+        return
+    if model.objects.filter(**keys).update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=delta, **keys)
+    except IntegrityError:
+        # 并发插入了同一行
+        model.objects.filter(**keys).update(count=F('count') + delta)
+
+
+def apply(request_deltas: Counter, latency_deltas: Counter = None) -> None:
+    """把累计的增量写入汇总表，每个键一次 UPDATE"""
+    for (day, username, status), delta in request_deltas.items():
+        _bump(EditRequestRollup, {'day': day, 'username': username, 'status': status}, delta)
+    for (day, bucket), delta in (latency_deltas or {}).items():
+        _bump(EvaluationLatencyRollup, {'day': day, 'bucket': bucket}, delta)
+
+
+def _record_evaluation(edit_request, latency_deltas: Counter) -> None:
+    edit_request.evaluated_at = timezone.now()
+    seconds = (edit_request.evaluated_at - edit_request.created_at).total_seconds()
+    latency_deltas[(timezone.localdate(edit_request.evaluated_at), latency_bucket(seconds))] += 1
+
+
+# ========================
+# 批量接口（bulk_create / bulk_update 不触发信号）
+# ========================
+def record_created(edit_requests) -> None:
+    """bulk_create 之后调用"""
+    deltas = Counter(_request_key(r.username, r.created_at, r.is_evaluated) for r in edit_requests)
+    apply(deltas)
+
+
+def set_evaluations(pairs) -> list:
+    """批量评价：pairs 为 [(EditRequest, 评价内容)]
+
+    写入 evaluation，首次评价时设置 evaluated_at 并更新汇总；
+    调用方随后 bulk_update(objs, ['evaluation', 'evaluated_at'])，应在同一事务中
+    """
+    request_deltas, latency_deltas = Counter(), Counter()
+    objs = []
+    for edit_request, evaluation in pairs:
+        was_evaluated = edit_request.is_evaluated
+        edit_request.evaluation = evaluation
+        if edit_request.is_evaluated != was_evaluated:
+            request_deltas[_request_key(edit_request.username, edit_request.created_at, was_evaluated)] -= 1
+            request_deltas[_request_key(edit_request.username, edit_request.created_at, not was_evaluated)] += 1
+            if edit_request.is_evaluated:
+                _record_evaluation(edit_request, latency_deltas)
+            else:
+                edit_request.evaluated_at = None
+        objs.append(edit_request)
+    apply(request_deltas, latency_deltas)
+    return objs
+
+
+# ========================
+# 单条保存 / 删除
+# ========================
+@receiver(pre_save, sender=EditRequest)
+def _before_save(sender, instance, raw=False, **kwargs):
+    instance._rollup_old = None
+    if raw:
+        return
+    if instance.pk is not None:
+        instance._rollup_old = EditRequest.objects.filter(pk=instance.pk).values(
+            'username', 'created_at', 'evaluation').first()
+    was_evaluated = bool(instance._rollup_old and (instance._rollup_old['evaluation'] or '').strip())
+    if not instance.is_evaluated:
+        instance.evaluated_at = None
+    elif not was_evaluated and instance.evaluated_at is None:
+        instance.evaluated_at = timezone.now()
+
+
+@receiver(post_save, sender=EditRequest)
+def _after_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    request_deltas, latency_deltas = Counter(), Counter()
+    old = getattr(instance, '_rollup_old', None)
+    if old is not None:
+        request_deltas[_request_key(old['username'], old['created_at'], (old['evaluation'] or '').strip())] -= 1
+    request_deltas[_request_key(instance.username, instance.created_at, instance.is_evaluated)] += 1
+    was_evaluated = bool(old and (old['evaluation'] or '').strip())
+    if instance.is_evaluated and not was_evaluated and instance.evaluated_at is not None:
+        seconds = (instance.evaluated_at - instance.created_at).total_seconds()
+        latency_deltas[(timezone.localdate(instance.evaluated_at), latency_bucket(seconds))] += 1
+    apply(request_deltas, latency_deltas)
+
+
+@receiver(post_delete, sender=EditRequest)
+def _after_delete(sender, instance, **kwargs):
+    apply(Counter({_request_key(instance.username, instance.created_at, instance.is_evaluated): -1}))
+
+
+# ========================
+# 看板查询（只读汇总表）
+# ========================
+def counts_by_user():
+    """每个用户的需求总数"""
+    return list(EditRequestRollup.objects.values('username').annotate(total=Sum('count'))
+                .filter(total__gt=0).order_by('username').values_list('username', 'total'))
+
+
+def throughput_by_day(days: int = 30):
+    """每天提交数与评价数"""
+    since = timezone.localdate() - datetime.timedelta(days=days - 1)
+    submitted = dict(EditRequestRollup.objects.filter(day__gte=since).values('day')
+                     .annotate(total=Sum('count')).values_list('day', 'total'))
+    evaluated = dict(EvaluationLatencyRollup.objects.filter(day__gte=since).values('day')
+                     .annotate(total=Sum('count')).values_list('day', 'total'))
+    day_list = [since + datetime.timedelta(days=i) for i in range(days)]
+    return day_list, [submitted.get(d, 0) for d in day_list], [evaluated.get(d, 0) for d in day_list]
+
+
+def latency_percentiles(days: int = 30, percentiles=(50, 90, 99)):
+    """按天估算评价耗时分位数（秒），桶内线性插值"""
+    since = timezone.localdate() - datetime.timedelta(days=days - 1)
+    histograms = {}
+    for day, bucket, count in (EvaluationLatencyRollup.objects.filter(day__gte=since, count__gt=0)
+                               .values_list('day', 'bucket', 'count')):
+        histograms.setdefault(day, {})[bucket] = count
+
+    result = []
+    for day in sorted(histograms):
+        hist = histograms[day]
+        total = sum(hist.values())
+        row = {'day': day}
+        for p in percentiles:
+            target, seen, lower = total * p / 100, 0, 0
+            for bound in LATENCY_BUCKETS:
+                count = hist.get(bound, 0)
+                if count and seen + count >= target:
+                    # 最后一个桶没有上限，取下限
+                    upper = lower if bound == LATENCY_BUCKETS[-1] else bound
+                    row[p] = lower + (upper - lower) * (target - seen) / count
+                    break
+                seen += count
+                lower = bound
+        result.append(row)
+    return result
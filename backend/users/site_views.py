@@ -1,12 +1,15 @@
-import sqlite3
-import pandas as pd
+from django.core.cache import cache
 from django_echarts.entities import Copyright, Jumbotron
 from django_echarts.starter import DJESite, SiteOpts
 from pyecharts import options as opts
-from pyecharts.charts import Bar
+from pyecharts.charts import Bar, Line
+
+from . import rollups
 
 __all__ = ['site_obj']
 
+CHART_CACHE_TIMEOUT = 60  # 图表数据缓存秒数
+
 # 创建站点对象
 site_obj = DJESite(
     site_title='剪辑师管理系统设计与实现',
@@ -30,18 +33,13 @@ site_obj.add_widgets(
 
 @site_obj.register_chart(title='用户剪辑数量关系', catalog='用户剪辑数量关系', description='本图描述了评论分布', tags=['内容'])
 def operator_material_chart():
-    conn = sqlite3.connect('db.sqlite3')
-    query = "SELECT username,content  from users_editrequest"
-    df = pd.read_sql_query(query, conn)
-
-    # 统计每个操作员的厂家操作数量
-    operator_counts = df.groupby('username')['content'].count()
-    conn.close()
+    # 统计每个用户的需求数量：读取汇总表，结果短时间缓存
+    operator_counts = cache.get_or_set('chart:user_request_counts', rollups.counts_by_user, CHART_CACHE_TIMEOUT)
 
     bar = (
         Bar()
-        .add_xaxis(operator_counts.index.tolist())
-        .add_yaxis('用户', operator_counts.tolist())
+        .add_xaxis([username for username, _ in operator_counts])
+        .add_yaxis('用户', [count for _, count in operator_counts])
         .set_global_opts(
             title_opts=opts.TitleOpts(title="用户", subtitle="单位：个"),
             visualmap_opts=opts.VisualMapOpts(is_show=True, max_=50, min_=0)
@@ -53,3 +51,34 @@ def operator_material_chart():
         )
     )
     return bar
+
+
+@site_obj.register_chart(title='需求吞吐量', catalog='需求吞吐量', description='最近 30 天每天提交与评价的需求数量', tags=['趋势'])
+def throughput_chart():
+    days, submitted, evaluated = cache.get_or_set('chart:throughput', rollups.throughput_by_day, CHART_CACHE_TIMEOUT)
+
+    line = (
+        Line()
+        .add_xaxis([day.strftime('%m-%d') for day in days])
+        .add_yaxis('提交', submitted)
+        .add_yaxis('评价', evaluated)
+        .set_global_opts(
+            title_opts=opts.TitleOpts(title="需求吞吐量", subtitle="单位：个/天"),
+            tooltip_opts=opts.TooltipOpts(trigger="axis")
+        )
+    )
+    return line
+
+
+@site_obj.register_chart(title='评价耗时分位数', catalog='评价耗时分位数', description='从提交到首次评价的耗时（P50/P90/P99）', tags=['趋势'])
+def evaluation_latency_chart():
+    rows = cache.get_or_set('chart:latency_percentiles', rollups.latency_percentiles, CHART_CACHE_TIMEOUT)
+
+    line = Line().add_xaxis([row['day'].strftime('%m-%d') for row in rows])
+    for p in (50, 90, 99):
+        line.add_yaxis(f'P{p}', [round(row[p] / 60, 1) for row in rows])
+    line.set_global_opts(
+        title_opts=opts.TitleOpts(title="评价耗时", subtitle="单位：分钟"),
+        tooltip_opts=opts.TooltipOpts(trigger="axis")
+    )
+    return line
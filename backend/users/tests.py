@@ -1,3 +1,212 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import jobs, views
+from .models import EditRequest, User
+from .roles import EDITOR_GROUP, USER_GROUP
+
+
+class EditRequestListTests(TestCase):
+    """剪辑需求列表：游标分页、筛选、权限与首页缓存"""
+
+    @classmethod
+    def setUpTestData(cls):
+        editors = Group.objects.create(name=EDITOR_GROUP)
+        users = Group.objects.create(name=USER_GROUP)
+        cls.editor = User.objects.create_user('ed', 'ed@example.com', 'pw')
+        cls.editor.groups.add(editors)
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        cls.bob.groups.add(users)
+        cls.staff = User.objects.create_user('st', 'st@example.com', 'pw', is_staff=True)
+        cls.staff.groups.add(users)
+        for i in range(12):
+            EditRequest.objects.create(username='bob' if i % 2 else 'amy', content=f'需求{i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def _collect(self, url):
+        """沿 next 链接翻完所有页，返回 id 列表"""
+        ids = []
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            ids += [row['id'] for row in resp.json()['results']]
+            url = resp.json()['next']
+        return ids
+
+    def test_anonymous_is_forbidden(self):
+        self.assertEqual(self.client.get('/edit_requests/').status_code, 403)
+        self.assertEqual(self.client.get('/edit_requests/?user=ed').status_code, 403)
+
+    def test_pages_through_next_links(self):
+        self.client.force_login(self.editor)
+        all_ids = list(EditRequest.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(self._collect('/edit_requests/?ordering=id&page_size=5'), all_ids)
+        self.assertEqual(self._collect('/edit_requests/?ordering=-id&page_size=5'), all_ids[::-1])
+        # 创建时间相同的记录按 id 排序，翻页不重复不遗漏
+        self.assertEqual(sorted(self._collect('/edit_requests/?page_size=5')), all_ids)
+
+    def test_next_link_keeps_filters(self):
+        self.client.force_login(self.editor)
+        resp = self.client.get('/edit_requests/?username=bob&ordering=id&page_size=2')
+        query = parse_qs(urlsplit(resp.json()['next']).query)
+        self.assertEqual(query['username'], ['bob'])
+        self.assertNotIn('user', query)
+        ids = self._collect('/edit_requests/?username=bob&ordering=id&page_size=2')
+        self.assertEqual(ids, list(EditRequest.objects.filter(username='bob').order_by('id').values_list(
+            'id', flat=True)))
+
+    def test_bad_filters_return_400(self):
+        self.client.force_login(self.editor)
+        self.assertEqual(self.client.get('/edit_requests/?created_after=not-a-date').status_code, 400)
+        self.assertEqual(self.client.get('/edit_requests/?ordering=content').status_code, 400)
+
+    def test_user_only_sees_own_requests(self):
+        self.client.force_login(self.bob)
+        rows = self.client.get('/edit_requests/').json()['results']
+        self.assertEqual({row['username'] for row in rows}, {'bob'})
+        self.assertEqual(self.client.get('/edit_requests/?user=bob').status_code, 200)
+
+    def test_non_staff_cannot_view_other_user(self):
+        self.client.force_login(self.bob)
+        self.assertEqual(self.client.get('/edit_requests/?user=ed').status_code, 403)
+        self.assertEqual(self.client.get(f'/edit_requests/?user={self.editor.pk}').status_code, 403)
+
+    def test_staff_can_view_other_user(self):
+        self.client.force_login(self.staff)
+        resp = self.client.get('/edit_requests/?user=ed&page_size=5')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()['results']), 5)
+        self.assertEqual(parse_qs(urlsplit(resp.json()['next']).query)['user'], ['ed'])
+        self.assertEqual(self.client.get('/edit_requests/?user=nobody').status_code, 404)
+
+    def test_login_returns_cached_first_page(self):
+        resp = self.client.post('/login/', {'username': 'ed', 'password': 'pw'}, content_type='application/json')
+        self.assertEqual(len(resp.json()['edit_requests']), 12)
+        self.assertIsNone(resp.json()['edit_requests_next'])
+
+        # 新增需求后首页缓存失效
+        self.client.post('/edit_action/', {'user': 'bob', 'content': '新需求'}, content_type='application/json')
+        first = self.client.get('/edit_requests/').json()['results'][0]
+        self.assertEqual(first['content'], '新需求')
+
+    def test_index_with_cold_cache(self):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.editor)
+        resp = views.index(request)
+        self.assertEqual(resp.status_code, 200)
+
+
+class BulkEndpointTests(TestCase):
+    """批量提交需求与批量评价"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = User.objects.create_user('ed', 'ed@example.com', 'pw')
+        cls.editor.groups.add(Group.objects.create(name=EDITOR_GROUP))
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        cls.bob.groups.add(Group.objects.create(name=USER_GROUP))
+
+    def test_bulk_create_returns_ids(self):
+        EditRequest.objects.create(username='amy', content='已有')
+        items = [{'user': 'bob', 'content': f'需求{i}'} for i in range(5)]
+        items += [{'user': str(self.bob.pk), 'content': '按 id'}, {'user': 'ghost', 'content': '未注册'},
+                  {'user': '', 'content': '缺 user'}, {'user': 'bob', 'content': '  '}, 'junk']
+        resp = self.client.post('/edit_action/bulk/', {'items': items}, content_type='application/json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual((resp.json()['created'], resp.json()['failed']), (7, 3))
+
+        results = resp.json()['results']
+        for result, item in zip(results[:7], items):
+            self.assertEqual(result['status'], 'success')
+            row = EditRequest.objects.get(id=result['id'])
+            self.assertEqual(row.content, item['content'])
+        self.assertEqual(EditRequest.objects.get(id=results[5]['id']).user, self.bob)
+        self.assertEqual(results[6]['username'], 'ghost')
+        for result in results[7:]:
+            self.assertEqual(result['status'], 'error')
+            self.assertNotIn('id', result)
+
+    def test_bulk_create_rejects_empty_items(self):
+        resp = self.client.post('/edit_action/bulk/', {'items': []}, content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_bulk_evaluation(self):
+        ids = [EditRequest.objects.create(username='bob', content=f'需求{i}').id for i in range(3)]
+        items = [{'id': pk, 'evaluation': '好'} for pk in ids]
+        items += [{'id': ids[0], 'evaluation': '重复'}, {'id': 999999, 'evaluation': '不存在'}, {'id': 'a'}]
+        resp = self.client.post('/update_evaluation/bulk/', {'username': 'ed', 'items': items},
+                                content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([r['status'] for r in resp.json()['results']], ['success'] * 3 + ['error'] * 3)
+        self.assertEqual(EditRequest.objects.filter(evaluation='好').count(), 3)
+        self.assertTrue(all(EditRequest.objects.get(id=pk).evaluated_at for pk in ids))
+
+    def test_bulk_evaluation_requires_editor(self):
+        pk = EditRequest.objects.create(username='bob', content='需求').id
+        resp = self.client.post('/update_evaluation/bulk/', {'username': 'bob', 'items': [{'id': pk, 'evaluation': '好'}]},
+                                content_type='application/json')
+        self.assertEqual(resp.status_code, 403)
+        self.assertIsNone(EditRequest.objects.get(id=pk).evaluation)
+
+
+@override_settings(DRAFT_JOB_TIMEOUT=60)
+class DraftJobTests(TestCase):
+    """自动生成草稿的任务认领与执行"""
+
+    def _job(self, status, started_ago=None):
+        started_at = timezone.now() - datetime.timedelta(seconds=started_ago) if started_ago is not None else None
+        return EditRequest.objects.create(username='bob', content='需求', job_status=status, job_started_at=started_at)
+
+    def test_claim_order_and_stale_jobs(self):
+        fresh = self._job(EditRequest.JOB_RUNNING, started_ago=10)
+        stale = self._job(EditRequest.JOB_RUNNING, started_ago=120)
+        legacy = self._job(EditRequest.JOB_RUNNING)
+        queued = self._job(EditRequest.JOB_QUEUED)
+        self._job(EditRequest.JOB_SUCCEEDED, started_ago=120)
+
+        claimed = [jobs._claim()[0] for _ in range(3)]
+        self.assertEqual(claimed, [stale.id, legacy.id, queued.id])
+        self.assertIsNone(jobs._claim())
+        self.assertEqual(EditRequest.objects.get(id=fresh.id).job_status, EditRequest.JOB_RUNNING)
+        queued.refresh_from_db()
+        self.assertEqual(queued.job_status, EditRequest.JOB_RUNNING)
+        self.assertIsNotNone(queued.job_started_at)
+
+    def test_run_records_result(self):
+        self._job(EditRequest.JOB_QUEUED)
+        pk, started_at = jobs._claim()
+        response = mock.Mock(ok=True, status_code=200)
+        response.json.return_value = {'download_url': 'http://x/a.zip'}
+        with mock.patch.object(jobs.requests, 'post', return_value=response):
+            jobs._run(pk, started_at)
+        job = EditRequest.objects.get(id=pk)
+        self.assertEqual((job.job_status, job.download_url), (EditRequest.JOB_SUCCEEDED, 'http://x/a.zip'))
+
+    def test_superseded_run_does_not_overwrite(self):
+        job = self._job(EditRequest.JOB_RUNNING, started_ago=120)
+        old_started_at = job.job_started_at
+        jobs._claim()  # 超时后被重新认领
+        with mock.patch.object(jobs.requests, 'post', side_effect=RuntimeError('timeout')):
+            jobs._run(job.id, old_started_at)
+        self.assertEqual(EditRequest.objects.get(id=job.id).job_status, EditRequest.JOB_RUNNING)
+
+    def test_drain_does_not_rekick_after_error(self):
+        self._job(EditRequest.JOB_QUEUED)
+        jobs._active += 1
+        with mock.patch.object(jobs, '_claim', side_effect=RuntimeError('db error')), \
+                mock.patch.object(jobs, 'kick') as kick, \
+                mock.patch.object(jobs, 'close_old_connections'), \
+                mock.patch.object(jobs, 'connection') as connection:
+            jobs._drain()
+        kick.assert_not_called()
+        connection.close.assert_called_once()
+        self.assertEqual(jobs._active, 0)
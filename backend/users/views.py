@@ -1,3 +1,5 @@
+import datetime
+
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from .forms import RegisterForm, EditRequestForm
@@ -10,6 +12,17 @@ from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.http import JsonResponse
 from django.contrib.auth import authenticate, login, logout
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Q
+from django.contrib.auth.models import Group
+from django.utils import timezone
+from django.urls import reverse
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import urlencode
+from . import jobs, roles, rollups
+from .pagination import (EDIT_REQUEST_FIELDS, EDIT_REQUEST_ORDERINGS, FIRST_PAGE_TIMEOUT,
+                         EditRequestCursorPagination, first_page_cache_key, invalidate_first_pages)
 
 
 from rest_framework import status
@@ -42,20 +55,19 @@ def login_view(request):
 
     login(request, user)
 
-    groups = list(user.groups.values_list('name', flat=True))  # 获取分组列表
+    role = roles.get_role(user)  # 按用户缓存，分组变化时失效
 
-    if '剪辑师' in groups:
-        # 修正字段
-        edit_requests = EditRequest.objects.all().values(
-            "id", "username", "content", "evaluation", "created_at"
-        )
+    if role == 'editor':
+        # 只返回第一页，后续通过 edit_requests_next 翻页
+        page = first_edit_request_page(request, user, is_editor=True)
         data = {
             'message': '登录成功',
             'username': user.username,
             'role': 'editor',
-            'edit_requests': list(edit_requests)
+            'edit_requests': page['results'],
+            'edit_requests_next': page['next']
         }
-    elif '用户' in groups:
+    elif role == 'user':
         data = {
             'message': '登录成功',
             'username': user.username,
@@ -83,11 +95,18 @@ def logout_view(request):
 
 
 User = get_user_model()
+
+
+def _flag(value):
+    return value is True or str(value).lower() in ('1', 'true', 'yes')
+
+
 @api_view(['POST'])
 def edit_action(request):
-    """提交剪辑需求接口，只需传 user 和 content"""
+    """提交剪辑需求接口，只需传 user 和 content，auto_generate 为 true 时提交后在后台自动生成草稿"""
     user_param = request.data.get('user')      # 必填
     content = request.data.get('content', '').strip()  # 必填
+    auto_generate = _flag(request.data.get('auto_generate'))
 
     if not user_param:
         return Response({'error': 'user 不能为空'}, status=status.HTTP_400_BAD_REQUEST)
@@ -112,39 +131,135 @@ def edit_action(request):
     edit_request = EditRequest.objects.create(
         user=user_obj,   # 可以为 None
         username=username,
-        content=content
+        content=content,
+        job_status=EditRequest.JOB_QUEUED if auto_generate else ''
     )
+    if auto_generate:
+        jobs.enqueue_on_commit()
 
+    invalidate_first_pages()
     print(f"用户 {username} 提交了剪辑需求：{content}")
 
     return Response({
         'message': '剪辑需求提交成功',
         'username': username,
         'content': content,
-        'user': user_param
+        'user': user_param,
+        'id': edit_request.id,
+        'job_status': edit_request.job_status
     }, status=status.HTTP_201_CREATED)
 
+MAX_BULK_ITEMS = 10000  # 批量接口单次最多条数
+BULK_BATCH_SIZE = 500
+
+
+def _bulk_items(request):
+    items = request.data.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError('items 必须是非空列表')
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValueError(f'items 最多 {MAX_BULK_ITEMS} 条')
+    return items
+
+
+def _assign_bulk_ids(objs):
+    """SQLite 上 bulk_create 不回填主键，在同一事务中按插入顺序补上
+
+    事务写入后一直持有数据库写锁，本次插入的 id 连续且是表中最大的一段
+    """
+    last_id = EditRequest.objects.aggregate(last_id=Max('id'))['last_id']
+    for pk, obj in zip(range(last_id - len(objs) + 1, last_id + 1), objs):
+        obj.pk = pk
+
+
+@api_view(['POST'])
+def edit_action_bulk(request):
+    """
+    批量提交剪辑需求
+    输入：
+        - items: [{"user": 用户 id 或用户名, "content": 需求内容, "auto_generate": 可选}, ...]
+        - auto_generate: 可选，各条未指定时的默认值
+    输出：
+        - results: 与 items 一一对应，每条带 status，失败时带 error
+    用户一次查询解析，所有有效行在同一事务中 bulk_create
+    """
+    try:
+        items = _bulk_items(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    default_generate = _flag(request.data.get('auto_generate'))
+    results, rows = [], []
+    for index, item in enumerate(items):
+        user_param = item.get('user') if isinstance(item, dict) else None
+        content = str(item.get('content') or '').strip() if isinstance(item, dict) else ''
+        if not user_param:
+            results.append({'index': index, 'status': 'error', 'error': 'user 不能为空'})
+        elif not content:
+            results.append({'index': index, 'status': 'error', 'error': 'content 不能为空'})
+        else:
+            results.append({'index': index, 'status': 'success', 'user': user_param})
+            rows.append((index, str(user_param), content, _flag(item.get('auto_generate', default_generate))))
+
+    # 按 id 或用户名一次查出所有用户，找不到的用户与单条接口一样只记录 username
+    ids = {int(u) for _, u, _, _ in rows if u.isdigit()}
+    names = {u for _, u, _, _ in rows if not u.isdigit()}
+    users = User.objects.filter(Q(id__in=ids) | Q(username__in=names)).only('id', 'username')
+    by_id = {u.id: u for u in users}
+    by_name = {u.username: u for u in by_id.values()}
+
+    objs = []
+    for index, user_param, content, auto_generate in rows:
+        user_obj = by_id.get(int(user_param)) if user_param.isdigit() else by_name.get(user_param)
+        username = user_obj.username if user_obj else user_param
+        job_status = EditRequest.JOB_QUEUED if auto_generate else ''
+        objs.append(EditRequest(user=user_obj, username=username, content=content, job_status=job_status))
+        results[index].update(username=username, job_status=job_status)
+
+    with transaction.atomic():
+        EditRequest.objects.bulk_create(objs, batch_size=BULK_BATCH_SIZE)
+        if objs and objs[0].pk is None:
+            _assign_bulk_ids(objs)
+        rollups.record_created(objs)  # bulk_create 不触发信号，手动更新统计汇总
+        if any(obj.job_status for obj in objs):
+            jobs.enqueue_on_commit()
+    for (index, _, _, _), obj in zip(rows, objs):
+        results[index]['id'] = obj.pk
+    if objs:
+        invalidate_first_pages()
+
+    created = len(objs)
+    print(f"批量提交剪辑需求：成功 {created} 条，失败 {len(items) - created} 条")
+    return Response({
+        'message': '批量提交完成',
+        'created': created,
+        'failed': len(items) - created,
+        'results': results
+    }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+
 # 可配置的内容
 USER_CONTENT = {
     "需求提交": "这里是需求提交内容"
 }
 
+@api_view(['GET'])
 def index(request):
     user = request.user
     if not user.is_authenticated:
         return JsonResponse({"error": "未登录或无权限"}, status=403)
 
-    is_user = user.groups.filter(name='用户').exists()
-    is_editor = user.groups.filter(name='剪辑师').exists()
+    role = roles.get_role(user)
     # 返回 JSON 数据
-    if is_editor:
-        # 返回表内容
-        edit_requests = EditRequest.objects.all().values("id", "title", "content", "evaluation")
+    if role == 'editor':
+        # 返回第一页
+        page = first_edit_request_page(request, user, is_editor=True)
         data = {
             "role": "editor",
-            "edit_requests": list(edit_requests)
+            "edit_requests": page['results'],
+            "edit_requests_next": page['next']
         }
-    elif is_user:
+    elif role == 'user':
         data = {
             "role": "user",
             "content": USER_CONTENT
@@ -181,8 +296,7 @@ def update_evaluation(request):
         return Response({"error": "用户不存在"}, status=404)
 
     # 判断是否剪辑师
-    groups = list(user.groups.values_list('name', flat=True))
-    if '剪辑师' not in groups:
+    if not roles.is_editor(user):
         return Response({"error": "没有权限，必须是剪辑师"}, status=403)
 
     # 更新 EditRequest
@@ -192,6 +306,7 @@ def update_evaluation(request):
         edit_request.save()
     except EditRequest.DoesNotExist:
         return Response({"error": "EditRequest 不存在"}, status=404)
+    invalidate_first_pages()
 
     # 返回更新后的数据
     data = {
@@ -204,3 +319,175 @@ def update_evaluation(request):
     return Response({"message": "更新成功", "edit_request": data})
 
 
+# ========================
+# 剪辑需求列表（游标分页）
+# ========================
+LIST_FILTER_PARAMS = ('username', 'evaluated', 'created_after', 'created_before', 'q', 'ordering',
+                      'cursor', 'page_size')
+
+
+def _parse_time(value, end=False):
+    """支持 ISO 时间或日期，日期作为结束时间时取当天结束"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"时间格式错误: {value}")
+        parsed = datetime.datetime.combine(day, datetime.time.max if end else datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _edit_request_queryset(user, is_editor, params):
+    """剪辑师可以看到全部需求，普通用户只能看到自己的"""
+    queryset = EditRequest.objects.all()
+    if not is_editor:
+        queryset = queryset.filter(username=user.username)
+    elif params.get('username'):
+        queryset = queryset.filter(username=params['username'])
+
+    evaluated = params.get('evaluated')
+    if evaluated in ('true', '1'):
+        queryset = queryset.exclude(evaluation__isnull=True).exclude(evaluation='')
+    elif evaluated in ('false', '0'):
+        queryset = queryset.filter(Q(evaluation__isnull=True) | Q(evaluation=''))
+    if params.get('created_after'):
+        queryset = queryset.filter(created_at__gte=_parse_time(params['created_after']))
+    if params.get('created_before'):
+        queryset = queryset.filter(created_at__lte=_parse_time(params['created_before'], end=True))
+    if params.get('q'):
+        queryset = queryset.filter(content__icontains=params['q'])
+    return queryset.values(*EDIT_REQUEST_FIELDS)
+
+
+def _paginate_edit_requests(request, user, is_editor, params):
+    ordering = params.get('ordering') or '-created_at'
+    if ordering not in EDIT_REQUEST_ORDERINGS:
+        raise ValueError(f"ordering 只能是 {', '.join(EDIT_REQUEST_ORDERINGS)}")
+    paginator = EditRequestCursorPagination()
+    paginator.ordering = EDIT_REQUEST_ORDERINGS[ordering]
+    results = paginator.paginate_queryset(_edit_request_queryset(user, is_editor, params), request)
+    # 翻页链接统一指向列表接口，管理员代查其他用户时带上 user
+    query = {k: v for k, v in params.items() if k in LIST_FILTER_PARAMS and k != 'cursor' and v}
+    if user.pk != request.user.pk:
+        query = {'user': user.username, **query}
+    paginator.base_url = request.build_absolute_uri(reverse('edit_requests') + '?' + urlencode(query))
+    return {'next': paginator.get_next_link(), 'previous': paginator.get_previous_link(), 'results': results}
+
+
+def first_edit_request_page(request, user, is_editor):
+    """默认条件下的第一页，按用户缓存，EditRequest 变化时失效"""
+    key = first_page_cache_key(user.pk)
+    page = cache.get(key)
+    if page is None:
+        page = _paginate_edit_requests(request, user, is_editor, {})
+        cache.set(key, page, FIRST_PAGE_TIMEOUT)
+    return page
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def edit_requests(request):
+    """
+    剪辑需求列表，需要登录
+    查询参数：
+        - user: 查看指定用户（id 或用户名）的列表，仅管理员（is_staff）可用
+        - username: 按提交人筛选（仅剪辑师）
+        - evaluated: true / false，是否已评价
+        - created_after / created_before: ISO 时间或日期
+        - q: 内容关键字
+        - ordering: -created_at（默认） / created_at / -id / id
+        - cursor / page_size: 游标与每页条数
+    输出：
+        - next / previous: 翻页链接
+        - results: 剪辑需求列表
+    """
+    user = request.user
+    user_param = request.query_params.get('user')
+    if user_param and user_param not in (str(user.pk), user.username):
+        if not user.is_staff:
+            return Response({"error": "无权限查看其他用户的需求"}, status=403)
+        try:
+            if str(user_param).isdigit():
+                user = User.objects.get(id=int(user_param))
+            else:
+                user = User.objects.get(username=user_param)
+        except User.DoesNotExist:
+            return Response({"error": "用户不存在"}, status=404)
+
+    role = roles.get_role(user)
+    is_editor = role == 'editor'
+    if role == 'unknown':
+        return Response({"error": "无权限"}, status=403)
+
+    params = request.query_params
+    try:
+        if not any(params.get(k) for k in LIST_FILTER_PARAMS):
+            page = first_edit_request_page(request, user, is_editor)
+        else:
+            page = _paginate_edit_requests(request, user, is_editor, params.dict())
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response(page)
+
+
+@api_view(['POST'])
+def update_evaluation_bulk(request):
+    """
+    剪辑师批量更新 EditRequest 的 evaluation
+    输入：
+        - username: 剪辑师用户名
+        - items: [{"id": EditRequest 的 id, "evaluation": 评价内容}, ...]
+    输出：
+        - results: 与 items 一一对应，每条带 status，失败时带 error
+    用户与分组一次查询，需求一次查询，所有有效行在同一事务中 bulk_update
+    """
+    username = request.data.get('username')
+    if not username:
+        return Response({"error": "username 必填"}, status=400)
+    try:
+        items = _bulk_items(request)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    editor_group = Group.objects.filter(user=OuterRef('pk'), name=roles.EDITOR_GROUP)
+    user = User.objects.filter(username=username).annotate(is_editor=Exists(editor_group)).first()
+    if user is None:
+        return Response({"error": "用户不存在"}, status=404)
+    if not user.is_editor:
+        return Response({"error": "没有权限，必须是剪辑师"}, status=403)
+
+    results, updates = [], {}
+    for index, item in enumerate(items):
+        req_id = item.get('id') if isinstance(item, dict) else None
+        evaluation = str(item.get('evaluation') or '').strip() if isinstance(item, dict) else ''
+        if not str(req_id or '').isdigit() or evaluation == '':
+            results.append({'index': index, 'status': 'error', 'error': 'id 和 evaluation 必填'})
+        elif int(req_id) in updates:
+            results.append({'index': index, 'id': int(req_id), 'status': 'error', 'error': 'id 重复'})
+        else:
+            results.append({'index': index, 'id': int(req_id), 'status': 'success'})
+            updates[int(req_id)] = (index, evaluation)
+
+    with transaction.atomic():
+        found = EditRequest.objects.in_bulk(list(updates))
+        pairs = []
+        for req_id, (index, evaluation) in updates.items():
+            edit_request = found.get(req_id)
+            if edit_request is None:
+                results[index].update(status='error', error='EditRequest 不存在')
+                continue
+            pairs.append((edit_request, evaluation))
+        # bulk_update 不触发信号，由 set_evaluations 设置评价时间并更新统计汇总
+        objs = rollups.set_evaluations(pairs)
+        EditRequest.objects.bulk_update(objs, ['evaluation', 'evaluated_at'], batch_size=BULK_BATCH_SIZE)
+    if objs:
+        invalidate_first_pages()
+
+    return Response({
+        "message": "批量更新完成",
+        "updated": len(objs),
+        "failed": len(items) - len(objs),
+        "results": results
+    }, status=200 if objs else 400)
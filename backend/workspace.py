@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+草稿生成任务的独立工作区
+包含：
+1. JobWorkspace：每个请求唯一的草稿名，草稿在暂存目录中生成，完成后原子改名
+2. WorkspaceGC：后台线程定期清理遗留的暂存草稿
+"""
+
+import os
+import re
+import time
+import uuid
+import shutil
+import threading
+from typing import Callable, Optional
+
+STAGING_PREFIX = ".staging_"
+
+
+def safe_name(name: str, max_len: int = 40) -> str:
+    """把项目名转换为可用作文件夹名的字符串"""
+    name = re.sub(r'[\\/:*?"<>|\s]+', "_", name).strip("._")
+    return name[:max_len] or "draft"
+
+
+class JobWorkspace:
+    """一次草稿生成任务的工作区
+
+    - 草稿先在 `draft_root/.staging_<草稿名>` 中生成，`commit()` 时原子改名为最终草稿名
+    - 生成的视频/语音按内容缓存在各任务共享的目录中（见 jianying_stages.py），拼装时复制进草稿
+    - 作为上下文管理器使用时，异常退出会自动清理暂存草稿
+    """
+
+    def __init__(self, draft_root: str, project_name: str):
+        self.job_id = uuid.uuid4().hex
+        self.draft_root = draft_root
+        self.draft_name = f"{safe_name(project_name)}_{time.strftime('%Y%m%d%H%M%S')}_{self.job_id[:8]}"
+        self.staging_name = STAGING_PREFIX + self.draft_name
+        self.committed = False
+
+    @property
+    def staging_path(self) -> str:
+        return os.path.join(self.draft_root, self.staging_name)
+
+    @property
+    def final_path(self) -> str:
+        return os.path.join(self.draft_root, self.draft_name)
+
+    def __enter__(self) -> "JobWorkspace":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if not self.committed:
+            self.discard()
+
+    def commit(self) -> str:
+        """把暂存草稿原子改名为最终草稿，返回最终路径"""
+        os.replace(self.staging_path, self.final_path)
+        self.committed = True
+        return self.final_path
+
+    def discard(self) -> None:
+        shutil.rmtree(self.staging_path, ignore_errors=True)
+
+
+class WorkspaceGC:
+    """后台清理超时未完成的暂存草稿"""
+
+    def __init__(self, draft_root: str, *, max_age: float = 6 * 3600,
+                 interval: float = 600, log: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            draft_root: 草稿根目录
+            max_age: 超过该时长（秒）未修改的暂存草稿视为遗留
+            interval: 扫描间隔（秒）
+            log: 日志函数
+        """
+        self.draft_root = draft_root
+        self.max_age = max_age
+        self.interval = interval
+        self.log = log or (lambda msg: None)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stale(self, path: str, now: float) -> bool:
+        try:
+            return now - os.path.getmtime(path) > self.max_age
+        except OSError:
+            return False
+
+    def collect(self) -> int:
+        """执行一次清理，返回删除的目录数"""
+        now = time.time()
+        removed = 0
+        candidates = []
+        if os.path.isdir(self.draft_root):
+            candidates += [os.path.join(self.draft_root, d) for d in os.listdir(self.draft_root)
+                           if d.startswith(STAGING_PREFIX)]
+        for path in candidates:
+            if os.path.isdir(path) and self._stale(path, now):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+                self.log(f"清理遗留工作区: {path}")
+        return removed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.collect()
+            except Exception as e:
+                self.log(f"工作区清理异常: {e}")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="workspace-gc", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
@@ -10,6 +10,9 @@ interface UserInfo {
     content: string;
     evaluation: string;
     created_at: string;
+    job_status?: '' | 'queued' | 'running' | 'succeeded' | 'failed'; // 自动生成草稿的任务状态
+    download_url?: string;
+    job_error?: string | null;
   }>;
   content?: {
     '需求提交'?: string;
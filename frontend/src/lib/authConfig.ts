@@ -30,6 +30,12 @@ export const authApiConfig = {
     method: 'POST',
     timeoutMs: 600000, // 10分钟
   },
+  // 剪辑需求列表（游标分页），登录接口只返回第一页，翻页使用返回的 next 链接
+  editRequests: {
+    url: 'http://127.0.0.1:8000/edit_requests/',
+    method: 'GET',
+    timeoutMs: 600000, // 10分钟
+  },
 };
 
 // 用户角色定义
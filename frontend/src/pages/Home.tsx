@@ -231,6 +231,19 @@ export default function Home() {
                                           <p className="text-sm font-medium text-gray-500 dark:text-gray-400 mb-1">内容：</p>
                                           <p className="text-sm text-gray-800 dark:text-white whitespace-pre-wrap">{request.content}</p>
                                       </div>
+                                      {request.job_status && (
+                                        <div className="mb-3">
+                                            <p className="text-sm font-medium text-gray-500 dark:text-gray-400 mb-1">草稿：</p>
+                                            {request.job_status === 'succeeded' && request.download_url ? (
+                                              <a href={request.download_url} target="_blank" rel="noreferrer"
+                                                 className="text-sm text-purple-600 dark:text-purple-400 hover:underline">下载草稿</a>
+                                            ) : (
+                                              <p className="text-sm text-gray-800 dark:text-white">
+                                                  {{queued: '排队中', running: '生成中', failed: `生成失败：${request.job_error || ''}`}[request.job_status as string] || request.job_status}
+                                              </p>
+                                            )}
+                                        </div>
+                                      )}
                                       <div>
                                           <p className="text-sm font-medium text-gray-500 dark:text-gray-400 mb-1">评价：</p>
                                           {editingRequest === request.id ? (